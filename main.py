@@ -4,18 +4,57 @@ from contextlib import asynccontextmanager
 
 from src.config import settings
 from src.database import init_database
-from src.routes import auth_router, personality_router, astro_router, audio_router, vibe_router, image_router, roadmap_router
+from src.database.pool import db_pool
+from src.database.profile_cache import profile_cache
+from src.utils.auth import token_cache, shutdown_password_executor
+from src.database.async_db import shutdown as shutdown_db_executor
+from src.routes import auth_router, personality_router, astro_router, audio_router, vibe_router, image_router, roadmap_router, jobs_router
+from src.routes.job_handlers import JOB_HANDLERS
+from src.agent.core.llm_client import llm_registry
+from src.agent.core.response_cache import response_cache
+from src.utils.fusion_brain import close_http_client as close_fusion_brain_client
+from src.utils.fusion_brain_jobs import fusion_brain_jobs
+from src.utils.elevenlabs import close_http_client as close_elevenlabs_client
+from src.utils.media_store import media_store
+from src.utils.media_gc import media_retention
+from src.utils.job_worker import JobWorker
+from src.utils.prefetch import prefetcher
 
 import uvicorn
 
+# Обычно задачи очереди выполняет отдельный процесс (worker.py)
+job_worker = JobWorker(
+    JOB_HANDLERS,
+    concurrency=settings.JOB_WORKER_CONCURRENCY,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    poll_interval=settings.JOB_POLL_INTERVAL,
+)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print("🚀 Запуск приложения...")
     init_database()
+    await llm_registry.startup()
+    await fusion_brain_jobs.start()
+    if settings.MEDIA_GC_ENABLED:
+        await media_retention.start()
+    if settings.JOBS_RUN_IN_APP:
+        await job_worker.start()
     print("✅ Приложение готово к работе!")
     print("✅ перейдите на http://127.0.0.1:8000/")
     yield
     print("🛑 Остановка приложения...")
+    await job_worker.stop()
+    await prefetcher.aclose()
+    await response_cache.aclose()
+    await fusion_brain_jobs.stop()
+    await media_retention.stop()
+    await close_fusion_brain_client()
+    await close_elevenlabs_client()
+    shutdown_password_executor()
+    shutdown_db_executor()
+    db_pool.close()
+    await llm_registry.aclose()
 
 
 app = FastAPI(
@@ -40,6 +79,7 @@ app.include_router(vibe_router)
 app.include_router(audio_router)
 app.include_router(image_router)
 app.include_router(roadmap_router)
+app.include_router(jobs_router)
 
 
 @app.get("/")
@@ -59,5 +99,21 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "llm_pool": llm_registry.stats(),
+        "llm_cache": response_cache.stats(),
+        "prefetch": prefetcher.stats(),
+        "fusion_brain_jobs": fusion_brain_jobs.stats(),
+        "media_store": media_store.stats(),
+        "media_retention": media_retention.stats(),
+        "job_worker": job_worker.stats(),
+        "db_pool": db_pool.stats(),
+        "profile_cache": profile_cache.stats(),
+        "token_cache": token_cache.stats(),
+    }
+
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
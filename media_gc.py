@@ -0,0 +1,62 @@
+"""
+Разовая очистка сгенерированных медиа по квотам (то же, что делает фоновый
+сборщик в приложении, см. src/utils/media_gc.py)
+
+Выполняет проходы, пока очередной проход не закончится без работы и обход
+директорий не будет завершен.
+
+Использование:
+    python media_gc.py
+    python media_gc.py --dry-run                    # только посчитать
+    python media_gc.py --user-quota-mb 200 --total-quota-mb 10240
+"""
+import argparse
+import logging
+
+from src.config import settings
+from src.database import init_database
+from src.utils.media_gc import MediaRetention, MB
+
+logger = logging.getLogger("media_gc")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evict generated media over quota and clean up orphans")
+    parser.add_argument("--user-quota-mb", type=int, default=settings.MEDIA_QUOTA_USER_MB)
+    parser.add_argument("--total-quota-mb", type=int, default=settings.MEDIA_QUOTA_TOTAL_MB)
+    parser.add_argument("--min-age", type=float, default=settings.MEDIA_GC_MIN_AGE,
+                        help="Не удалять файлы, использованные за последние N секунд")
+    parser.add_argument("--max-passes", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="Один проход без удаления - только посчитать")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    init_database()
+
+    retention = MediaRetention(
+        settings.MEDIA_STORE_DIR,
+        user_quota_bytes=args.user_quota_mb * MB,
+        total_quota_bytes=args.total_quota_mb * MB,
+        batch_size=settings.MEDIA_GC_BATCH,
+        min_age=args.min_age,
+        orphan_grace=settings.MEDIA_GC_ORPHAN_GRACE,
+        dry_run=args.dry_run,
+    )
+
+    for _ in range(args.max_passes):
+        result = retention.run_pass()
+        # В dry-run ничего не удаляется, повторные проходы нашли бы то же самое
+        if args.dry_run or (not any(result.values()) and retention.sweep_complete):
+            break
+
+    stats = retention.stats()
+    logger.info(
+        f"✅ {stats['passes']} passes: evicted {stats['evicted_files']} files "
+        f"({stats['evicted_bytes'] / MB:.1f} MB), removed {stats['missing_rows_removed']} rows without files "
+        f"and {stats['temp_files_removed']} temporary files, cataloged {stats['orphans_adopted']} orphans"
+    )
+
+
+if __name__ == "__main__":
+    main()
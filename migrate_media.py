@@ -0,0 +1,126 @@
+"""
+Перенос ранее сгенерированных медиа в контентно-адресуемое хранилище
+
+До хранилища файлы окружений назывались по ID генерации
+(img_<username>_<timestamp>_<n>.jpg), а промпты лежали рядом в
+data/ambients/results/ambients_<generation_id>.json. По этим JSON скрипт
+восстанавливает ключ каждого файла и кладет его в data/media/<kind>/ab/cd/.
+Одинаковые промпты сводятся к одному файлу.
+
+По умолчанию файл в хранилище создается жесткой ссылкой (или копией, если
+ссылки не поддерживаются), поэтому старые URL продолжают работать. С --move
+старые файлы удаляются.
+
+Перенесенные файлы и JSON окружений записываются в каталог медиа (таблица media),
+владелец определяется по имени пользователя в ID генерации. Ссылки JSON на его
+медиа записываются в media_refs, чтобы сборщик (media_gc) их не удалял.
+
+Файлы без сохраненного промпта (/vibe/generate-ambient-media, data/audio)
+восстановить по ключу нельзя - они остаются на месте и отдаются оттуда.
+
+Использование:
+    python migrate_media.py
+    python migrate_media.py --dry-run
+    python migrate_media.py --move
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+from src.database import init_database
+from src.database.db import get_user_by_username
+from src.database.media_db import record_media, add_media_refs
+from src.utils.media_store import media_store
+from src.utils.media_gc import RESULT_MEDIA_FIELDS, result_media_refs
+
+logger = logging.getLogger("migrate_media")
+
+AMBIENTS_DIR = Path("data") / "ambients"
+RESULTS_DIR = AMBIENTS_DIR / "results"
+
+
+def place(legacy_path: Path, target: Path, move: bool) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if move:
+        os.replace(legacy_path, target)
+        return
+    try:
+        os.link(legacy_path, target)
+    except OSError:
+        shutil.copy2(legacy_path, target)
+
+
+def owner_of(generation_id: str) -> Optional[str]:
+    """ID генерации - <username>_<YYYYmmdd>_<HHMMSS>"""
+    user = get_user_by_username(generation_id.rsplit("_", 2)[0])
+    return user["id"] if user else None
+
+
+def migrate(move: bool, dry_run: bool) -> Dict[str, int]:
+    counts = {"migrated": 0, "duplicates": 0, "missing": 0}
+
+    for result_path in sorted(RESULTS_DIR.glob("ambients_*.json")):
+        generation_id = result_path.stem[len("ambients_"):]
+        try:
+            with open(result_path, encoding="utf-8") as f:
+                ambients = json.load(f).get("ambients", [])
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Skipping {result_path.name}: {str(e)}")
+            continue
+
+        owner_id = owner_of(generation_id)
+        if not dry_run:
+            record_media("results", result_path, owner_id=owner_id, provider="llm")
+            add_media_refs("results", result_path.name, result_media_refs(result_path))
+
+        for i, ambient in enumerate(ambients):
+            for field, (prefix, ext, kind, make_key) in RESULT_MEDIA_FIELDS.items():
+                prompt = ambient.get(field)
+                if not prompt:
+                    continue
+
+                legacy_path = AMBIENTS_DIR / kind / f"{prefix}_{generation_id}_{i+1}.{ext}"
+                if not legacy_path.is_file():
+                    counts["missing"] += 1
+                    continue
+
+                target = media_store.path_for(kind, make_key(prompt), ext)
+                if target.is_file():
+                    # Такой промпт уже в хранилище - старая копия лишняя
+                    counts["duplicates"] += 1
+                    if move and not dry_run:
+                        legacy_path.unlink()
+                    continue
+
+                counts["migrated"] += 1
+                if not dry_run:
+                    place(legacy_path, target, move)
+                    record_media(kind, target, owner_id=owner_id)
+
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate generated media into the content-addressed store")
+    parser.add_argument("--move", action="store_true",
+                        help="Удалять старые файлы (старые URL перестанут работать)")
+    parser.add_argument("--dry-run", action="store_true", help="Только посчитать")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    init_database()
+
+    counts = migrate(move=args.move, dry_run=args.dry_run)
+    logger.info(
+        f"✅ Migrated {counts['migrated']} files, {counts['duplicates']} duplicates, "
+        f"{counts['missing']} referenced files not found"
+    )
+
+
+if __name__ == "__main__":
+    main()
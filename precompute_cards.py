@@ -0,0 +1,148 @@
+"""
+Предгенерация наборов карточек профессий для /vibe/generate
+
+Вход ProfessionCardsAgent полностью определяется статическими таблицами
+PERSONALITY_TYPES (32 кода) и ZODIAC_SIGNS (12 знаков), поэтому всех корзин
+немного: код × знак, только код, только знак. Скрипт генерирует для каждой
+корзины несколько вариантов и сохраняет их в profession_card_sets.
+
+Использование:
+    python precompute_cards.py                      # все корзины, CARD_SET_VARIANTS вариантов
+    python precompute_cards.py --variants 5 --concurrency 8
+    python precompute_cards.py --codes INTJ-A ENTP-T --signs Овен
+    python precompute_cards.py --prune              # удалить варианты устаревших входов
+"""
+import argparse
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from src.config import settings
+from src.database import init_database
+from src.database.card_sets_db import count_card_sets, save_card_set, delete_stale_card_sets
+from src.utils.personality_test import PERSONALITY_TYPES
+from src.utils.astrology import ZODIAC_SIGNS
+from src.utils.agent_context import build_personality_data, build_astrology_data
+from src.agent.core.profession_cards_agent import ProfessionCardsAgent
+from src.agent.core.llm_client import llm_registry
+
+logger = logging.getLogger("precompute_cards")
+
+
+def personality_result_for(code: str) -> Dict[str, Any]:
+    """Результат теста личности для кода - как его сохраняет calculate_personality_type"""
+    info = PERSONALITY_TYPES[code]
+    return {
+        "code": code,
+        "personality_type": info["name"],
+        "description": info["description"],
+        "full_description": info["full_description"],
+        "strengths": info["strengths"],
+        "weaknesses": info["weaknesses"],
+        "career_advice": info["career_advice"],
+        "careers": info["careers"],
+    }
+
+
+def astro_profile_for(sign: str) -> Dict[str, Any]:
+    """Астрологический профиль для знака - как его сохраняет create_astro_profile"""
+    data = ZODIAC_SIGNS[sign]
+    return {
+        "zodiac_sign": sign,
+        "zodiac_element": data["element"],
+        "zodiac_quality": data["quality"],
+        "personality_traits": data["traits"],
+        "career_recommendations": ", ".join(data["careers"]),
+        "strengths": data["strengths"],
+        "challenges": data["challenges"],
+        "compatibility_signs": data["compatible"],
+    }
+
+
+def build_buckets(codes: List[str], signs: List[str]) -> List[Tuple[Optional[str], Optional[str]]]:
+    buckets: List[Tuple[Optional[str], Optional[str]]] = [(code, sign) for code in codes for sign in signs]
+    buckets += [(code, None) for code in codes]
+    buckets += [(None, sign) for sign in signs]
+    return buckets
+
+
+def make_agent(code: Optional[str], sign: Optional[str]) -> ProfessionCardsAgent:
+    # Параметры должны совпадать с /vibe/generate, иначе отпечаток входа не совпадет
+    return ProfessionCardsAgent(
+        personality_data=build_personality_data(personality_result_for(code)) if code else None,
+        astrology_data=build_astrology_data(astro_profile_for(sign)) if sign else None,
+        temperature=0.4,
+        max_tokens=8192,
+    )
+
+
+async def precompute_bucket(
+    code: Optional[str],
+    sign: Optional[str],
+    variants: int,
+    semaphore: asyncio.Semaphore,
+) -> int:
+    agent = make_agent(code, sign)
+    input_hash = agent.input_fingerprint()
+    missing = variants - count_card_sets(input_hash)
+    created = 0
+
+    for _ in range(max(missing, 0)):
+        async with semaphore:
+            try:
+                cards = await agent.generate_profession_cards()
+            except Exception as e:
+                logger.error(f"❌ {code or '-'} × {sign or '-'}: {str(e)}")
+                continue
+        if save_card_set(code, sign, input_hash, cards, max_variants=variants):
+            created += 1
+
+    if created:
+        logger.info(f"✅ {code or '-'} × {sign or '-'}: +{created} variants")
+    return created
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompute profession card sets")
+    parser.add_argument("--variants", type=int, default=settings.CARD_SET_VARIANTS,
+                        help="Количество вариантов на корзину")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Одновременных запросов к LLM")
+    parser.add_argument("--codes", nargs="*", default=None, help="Коды личности (по умолчанию все)")
+    parser.add_argument("--signs", nargs="*", default=None, help="Знаки зодиака (по умолчанию все)")
+    parser.add_argument("--prune", action="store_true",
+                        help="Удалить варианты, вход которых больше не встречается")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    codes = args.codes if args.codes is not None else list(PERSONALITY_TYPES)
+    signs = args.signs if args.signs is not None else list(ZODIAC_SIGNS)
+    unknown = [c for c in codes if c not in PERSONALITY_TYPES] + [s for s in signs if s not in ZODIAC_SIGNS]
+    if unknown:
+        parser.error(f"Неизвестные коды/знаки: {', '.join(unknown)}")
+
+    init_database()
+    await llm_registry.startup()
+    try:
+        if args.prune:
+            all_buckets = build_buckets(list(PERSONALITY_TYPES), list(ZODIAC_SIGNS))
+            valid = [make_agent(code, sign).input_fingerprint() for code, sign in all_buckets]
+            removed = delete_stale_card_sets(valid)
+            logger.info(f"🧹 Removed card sets for {removed} stale inputs")
+
+        buckets = build_buckets(codes, signs)
+        logger.info(f"🚀 Precomputing {args.variants} variants for {len(buckets)} buckets")
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        created = await asyncio.gather(*[
+            precompute_bucket(code, sign, args.variants, semaphore)
+            for code, sign in buckets
+        ])
+        logger.info(f"✅ Done: {sum(created)} new card sets")
+    finally:
+        await llm_registry.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,13 +4,13 @@ import uuid
 from datetime import datetime
 from typing import Optional, AsyncGenerator
 
-import json
-
 import httpx
 from openai import AsyncOpenAI
 
 from src.agent.settings import get_config
 from src.agent.core.prompts import PromptLoader
+from src.agent.core.llm_client import get_llm_client
+from src.agent.core.json_stream import repair_json
 
 logging.basicConfig(
     level=logging.INFO,
@@ -36,6 +36,7 @@ class CareerNavigatorAgent:
         top_p: float = 0.9,
         presence_penalty: float = 0.0,
         frequency_penalty: float = 0.0,
+        openai_client: Optional[AsyncOpenAI] = None,
     ):
         self.id = f"{self.name}_{uuid.uuid4()}"
         self.logger = logging.getLogger(self.id)
@@ -48,9 +49,8 @@ class CareerNavigatorAgent:
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
 
-        client_kwargs = {"base_url": config.base_url.strip(), "api_key": config.api_key}
-
-        self.openai_client = AsyncOpenAI(**client_kwargs)
+        # Общий пул соединений вместо отдельного клиента на каждый запрос
+        self.openai_client = openai_client or get_llm_client()
 
     async def createCareer(self) -> str:
         """Generate you individual career."""
@@ -87,56 +87,6 @@ class CareerNavigatorAgent:
             self.logger.error(f"❌ Generation failed: {str(e)}")
             raise
 
-    def fix_truncated_json(self, truncated_str):
-        s = truncated_str.strip()
-        
-        if s.endswith(','):
-            s = s[:-1]
-        
-        if s.count('{') > s.count('}'):
-            last_open = s.rfind('{')
-            last_close_after = s.find('}', last_open)
-            if last_close_after == -1:
-                s = s[:last_open].rstrip()
-                if s.endswith(','):
-                    s = s[:-1]
-        
-        if s.count('[') > s.count(']'):
-            s += ']'
-        
-        try:
-            return s
-        except json.JSONDecodeError as e:
-            brace_count = 0
-            in_string = False
-            escaped = False
-            valid_up_to = 0
-            
-            for i, char in enumerate(s):
-                if not escaped:
-                    if char == '"':
-                        in_string = not in_string
-                    elif not in_string:
-                        if char == '{':
-                            brace_count += 1
-                        elif char == '}':
-                            brace_count -= 1
-                if char == '\\' and not escaped:
-                    escaped = True
-                else:
-                    escaped = False
-
-                if not in_string and brace_count == 0 and s[i:i+1] in [',', ']', '}']:
-                    valid_up_to = i + 1
-
-            if valid_up_to > 0:
-                candidate = s[:valid_up_to]
-                if candidate.count('[') > candidate.count(']'):
-                    candidate = candidate.rstrip().rstrip(',')
-                    candidate += ']'
-                try:
-                    return candidate
-                except:
-                    pass
-
-            return ""
\ No newline at end of file
+    def fix_truncated_json(self, truncated_str: str) -> str:
+        """Repair truncated or malformed JSON in the model response"""
+        return repair_json(truncated_str)
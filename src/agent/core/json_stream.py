@@ -0,0 +1,377 @@
+# json_stream.py
+"""
+Tolerant streaming JSON parser for LLM responses
+
+Один проход O(n) по ответу модели вместо набора str.replace / count / split
+в каждом агенте. Парсер:
+- пропускает markdown-обертку (```json ... ```) и текст до/после JSON
+- экранирует недопустимые escape-последовательности (\\x -> \\\\x) и сырые
+  управляющие символы внутри строк (перенос строки -> \\n)
+- убирает висячие запятые (`[1, 2,]`, `{"a": 1,}`)
+- закрывает обрезанную структуру: незаконченная строка-значение закрывается,
+  незаконченный элемент массива отбрасывается, незаконченный ключ удаляется
+- умеет принимать дельты токенов и отдавать каждое завершенное значение
+  по заданным путям сразу, как только оно закрылось
+
+Использование (целиком):
+    data = loads_tolerant(response_content)
+
+Использование (стриминг):
+    parser = JSONStreamParser(emit_paths=[("overview",), ("stages", WILDCARD)])
+    async for delta in deltas:
+        for path, value in parser.feed(delta):
+            ...  # ("overview",) -> {...}, ("stages", 0) -> {...}
+    data = json.loads(parser.close())
+"""
+import json
+import re
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+
+# Маска пути, совпадающая с любым ключом объекта или индексом массива
+WILDCARD = "*"
+
+_ROOT_START = re.compile(r"[\[{]")
+_STRING_RUN = re.compile(r'[^"\\\x00-\x1f]+')
+# Пробельные символы - везде \s (str.isspace): модели вставляют и неразрывные
+# пробелы, и \f; между токенами они отбрасываются
+_WHITESPACE = re.compile(r"\s+")
+_LITERAL_RUN = re.compile(r'[^\s,:\[\]{}"]+')
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?")
+
+_LITERAL_DELIMITERS = frozenset(',:[]{}"')
+_VALID_ESCAPES = frozenset('"\\/bfnrt')
+_HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+# Python-литералы, которые модели иногда выдают вместо JSON
+_LITERAL_FIXES = {"True": "true", "False": "false", "None": "null"}
+
+
+class _Frame:
+    """Open object or array on the parser stack"""
+
+    __slots__ = ("kind", "start", "safe", "member", "expect_key", "dirty")
+
+    def __init__(self, kind: str, start: int, safe: int):
+        self.kind = kind
+        # Индекс фрагмента, с которого начинается контейнер в выходном буфере
+        self.start = start
+        # Длина буфера после последнего завершенного элемента (точка безопасного отката)
+        self.safe = safe
+        # Текущий ключ объекта или индекс элемента массива
+        self.member: Any = 0 if kind == "[" else None
+        self.expect_key = kind == "{"
+        # Начат элемент (ключ или запятая), но значение еще не завершено
+        self.dirty = False
+
+
+class JSONStreamParser:
+    """
+    Incremental tolerant JSON parser.
+
+    feed() consumes arbitrary text deltas and returns (path, value) pairs for
+    every completed value whose path matches one of emit_paths. close() repairs
+    whatever has been consumed so far and returns valid JSON text.
+    """
+
+    def __init__(self, emit_paths: Optional[Iterable[Sequence[Any]]] = None):
+        self._emit_paths = [tuple(p) for p in (emit_paths or ())]
+        self._emit_depths = {len(p) for p in self._emit_paths}
+
+        # Выходной буфер: фрагменты исправленного JSON
+        self._out: List[str] = []
+        self._stack: List[_Frame] = []
+        self._events: List[Tuple[Tuple[Any, ...], Any]] = []
+
+        self._started = False
+        self._done = False
+        self._closed_text: Optional[str] = None
+
+        self._in_string = False
+        self._string_is_key = False
+        self._string_start = 0
+        self._key_parts: List[str] = []
+        self._escape_pending = False
+        self._unicode_pending: Optional[str] = None
+
+        self._literal: Optional[List[str]] = None
+        self._literal_start = 0
+
+    @property
+    def done(self) -> bool:
+        """Top-level value has been closed"""
+        return self._done
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[Any, ...], Any]]:
+        """Consume a text delta, return completed values matching emit_paths"""
+        self._events = []
+        text = chunk
+        i = 0
+        n = len(text)
+
+        while i < n and not self._done:
+            if not self._started:
+                m = _ROOT_START.search(text, i)
+                if m is None:
+                    break
+                i = m.start()
+                self._started = True
+
+            if self._in_string:
+                i = self._scan_string(text, i, n)
+                continue
+
+            ch = text[i]
+
+            is_space = ch.isspace()
+
+            if self._literal is not None:
+                if not is_space and ch not in _LITERAL_DELIMITERS:
+                    m = _LITERAL_RUN.match(text, i)
+                    if m is None:
+                        i += 1
+                        continue
+                    self._literal.append(m.group())
+                    self._out.append(m.group())
+                    i = m.end()
+                    continue
+                self._end_literal()
+
+            if is_space:
+                m = _WHITESPACE.match(text, i)
+                i = m.end() if m is not None else i + 1
+                continue
+
+            i += 1
+            if ch == '"':
+                self._start_string()
+            elif ch == "{" or ch == "[":
+                self._open(ch)
+            elif ch == "}" or ch == "]":
+                self._close()
+            elif ch == ",":
+                self._comma()
+            elif ch == ":":
+                self._out.append(":")
+            else:
+                m = _LITERAL_RUN.match(text, i - 1)
+                if m is None:
+                    # Символ, который не может начинать значение - пропускаем
+                    continue
+                self._literal_start = len(self._out)
+                self._literal = [m.group()]
+                self._out.append(m.group())
+                i = m.end()
+
+        return self._events
+
+    def close(self) -> str:
+        """Finish parsing and return the repaired JSON text ("" if no JSON was found)"""
+        if self._closed_text is not None:
+            return self._closed_text
+
+        self._events = []
+        if self._started and not self._done:
+            self._finalize_truncated()
+
+        self._closed_text = "".join(self._out)
+        return self._closed_text
+
+    # --- strings -----------------------------------------------------------
+
+    def _start_string(self) -> None:
+        frame = self._stack[-1] if self._stack else None
+        self._in_string = True
+        self._string_start = len(self._out)
+        self._string_is_key = frame is not None and frame.kind == "{" and frame.expect_key
+        if frame is not None:
+            frame.dirty = True
+        if self._string_is_key:
+            frame.expect_key = False
+            self._key_parts = []
+        self._out.append('"')
+
+    def _emit_string_piece(self, piece: str) -> None:
+        self._out.append(piece)
+        if self._string_is_key:
+            self._key_parts.append(piece)
+
+    def _scan_string(self, text: str, i: int, n: int) -> int:
+        while i < n:
+            if self._unicode_pending is not None:
+                ch = text[i]
+                if ch in _HEX_DIGITS:
+                    self._unicode_pending += ch
+                    i += 1
+                    if len(self._unicode_pending) == 4:
+                        self._emit_string_piece("\\u" + self._unicode_pending)
+                        self._unicode_pending = None
+                else:
+                    # \u без четырех hex-цифр - экранируем обратный слеш
+                    self._emit_string_piece("\\\\u" + self._unicode_pending)
+                    self._unicode_pending = None
+                continue
+
+            if self._escape_pending:
+                ch = text[i]
+                i += 1
+                self._escape_pending = False
+                if ch == "u":
+                    self._unicode_pending = ""
+                elif ch in _VALID_ESCAPES:
+                    self._emit_string_piece("\\" + ch)
+                elif ch in _CONTROL_ESCAPES:
+                    self._emit_string_piece("\\\\" + _CONTROL_ESCAPES[ch])
+                else:
+                    self._emit_string_piece("\\\\" + ch)
+                continue
+
+            m = _STRING_RUN.match(text, i)
+            if m is not None:
+                self._emit_string_piece(m.group())
+                i = m.end()
+                continue
+
+            ch = text[i]
+            i += 1
+            if ch == '"':
+                self._out.append('"')
+                self._in_string = False
+                self._end_string()
+                return i
+            if ch == "\\":
+                self._escape_pending = True
+            else:
+                self._emit_string_piece(_CONTROL_ESCAPES.get(ch) or "\\u%04x" % ord(ch))
+
+        return i
+
+    def _end_string(self) -> None:
+        if self._string_is_key:
+            self._string_is_key = False
+            self._stack[-1].member = json.loads('"' + "".join(self._key_parts) + '"')
+            self._key_parts = []
+        else:
+            self._value_done(self._string_start)
+
+    # --- literals ----------------------------------------------------------
+
+    def _end_literal(self) -> None:
+        literal = "".join(self._literal)
+        self._literal = None
+        fixed = _LITERAL_FIXES.get(literal)
+        if fixed is not None:
+            del self._out[self._literal_start:]
+            self._out.append(fixed)
+        self._value_done(self._literal_start)
+
+    def _literal_is_complete(self) -> bool:
+        literal = "".join(self._literal)
+        if literal in ("true", "false", "null") or literal in _LITERAL_FIXES:
+            return True
+        return _NUMBER.fullmatch(literal) is not None
+
+    # --- containers --------------------------------------------------------
+
+    def _open(self, kind: str) -> None:
+        if self._stack:
+            self._stack[-1].dirty = True
+        start = len(self._out)
+        self._out.append(kind)
+        self._stack.append(_Frame(kind, start, len(self._out)))
+
+    def _close(self) -> None:
+        if not self._stack:
+            return
+        frame = self._stack.pop()
+        if frame.dirty:
+            # Висячая запятая или ключ без значения
+            del self._out[frame.safe:]
+        self._out.append("}" if frame.kind == "{" else "]")
+
+        if not self._stack:
+            self._done = True
+            return
+        self._value_done(frame.start)
+
+    def _comma(self) -> None:
+        frame = self._stack[-1] if self._stack else None
+        if frame is None or (frame.dirty and self._out[-1] == ","):
+            return
+        self._out.append(",")
+        frame.dirty = True
+        if frame.kind == "[":
+            frame.member += 1
+        else:
+            frame.expect_key = True
+
+    def _value_done(self, start: int) -> None:
+        """A value starting at out[start] has just completed inside the top frame"""
+        frame = self._stack[-1]
+        frame.safe = len(self._out)
+        frame.dirty = False
+
+        if len(self._stack) in self._emit_depths:
+            path = tuple(f.member for f in self._stack)
+            if self._matches(path):
+                self._events.append((path, json.loads("".join(self._out[start:]))))
+
+    def _matches(self, path: Tuple[Any, ...]) -> bool:
+        for pattern in self._emit_paths:
+            if len(pattern) == len(path) and all(
+                p == WILDCARD or p == v for p, v in zip(pattern, path)
+            ):
+                return True
+        return False
+
+    # --- truncation --------------------------------------------------------
+
+    def _finalize_truncated(self) -> None:
+        if self._in_string:
+            self._in_string = False
+            self._escape_pending = False
+            self._unicode_pending = None
+            frame = self._stack[-1]
+            if self._string_is_key or frame.kind == "[":
+                # Обрезанный ключ или элемент массива удаляем
+                self._string_is_key = False
+                self._key_parts = []
+                del self._out[frame.safe:]
+                frame.dirty = False
+            else:
+                self._out.append('"')
+                self._end_string()
+        elif self._literal is not None:
+            if self._literal_is_complete():
+                self._end_literal()
+            else:
+                self._literal = None
+                del self._out[self._stack[-1].safe:]
+                self._stack[-1].dirty = False
+
+        while self._stack:
+            frame = self._stack[-1]
+            parent = self._stack[-2] if len(self._stack) > 1 else None
+            if parent is not None and parent.kind == "[":
+                # Незаконченный элемент массива отбрасываем целиком
+                self._stack.pop()
+                del self._out[parent.safe:]
+                parent.dirty = False
+                continue
+            self._close()
+
+
+def repair_json(text: str) -> str:
+    """
+    Repair an LLM response into valid JSON text in a single pass.
+
+    Returns the stripped input unchanged if it contains no JSON object or array.
+    """
+    parser = JSONStreamParser()
+    parser.feed(text)
+    repaired = parser.close()
+    return repaired if repaired else text.strip()
+
+
+def loads_tolerant(text: str) -> Any:
+    """json.loads() over repair_json(); raises json.JSONDecodeError if nothing usable remains"""
+    return json.loads(repair_json(text))
@@ -0,0 +1,127 @@
+# llm_client.py
+"""
+LLMClientRegistry - общий пул соединений к LLM API для всех агентов
+
+Раньше каждый агент создавал собственный AsyncOpenAI в __init__, то есть новый
+пул соединений и новый TLS handshake на каждый запрос. Реестр держит один
+httpx.AsyncClient с keep-alive и настраиваемыми лимитами пула, а агенты
+получают из него общий AsyncOpenAI.
+
+Жизненный цикл управляется из lifespan в main.py:
+    await llm_registry.startup()
+    ...
+    await llm_registry.aclose()
+
+Вне приложения (тестовые скрипты агентов) клиент создается лениво при первом
+обращении к get_client().
+
+Метрики (GET /metrics):
+- requests_total        - количество HTTP запросов к LLM API
+- connections_opened    - количество установленных TCP соединений
+- tls_handshakes        - количество выполненных TLS handshake
+- reuse_rate            - доля запросов, обслуженных уже открытым соединением
+- pool_connections      - текущий размер пула
+- pool_idle_connections - простаивающие keep-alive соединения
+"""
+import logging
+from typing import Optional, Dict, Any
+
+import httpx
+from openai import AsyncOpenAI
+
+from src.agent.settings import get_config
+
+logger = logging.getLogger(__name__)
+
+config = get_config()
+
+
+class LLMClientRegistry:
+    """Process-wide registry of the pooled LLM client shared by all agents"""
+
+    def __init__(self):
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._openai_client: Optional[AsyncOpenAI] = None
+
+        self.requests_total = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+    def _create_clients(self) -> None:
+        limits = httpx.Limits(
+            max_connections=config.llm_max_connections,
+            max_keepalive_connections=config.llm_max_keepalive_connections,
+            keepalive_expiry=config.llm_keepalive_expiry,
+        )
+        self._http_client = httpx.AsyncClient(
+            limits=limits,
+            timeout=httpx.Timeout(config.llm_timeout, connect=config.llm_connect_timeout),
+            event_hooks={"request": [self._on_request]},
+        )
+        self._openai_client = AsyncOpenAI(
+            base_url=config.base_url.strip(),
+            api_key=config.api_key,
+            http_client=self._http_client,
+        )
+        logger.info(
+            f"LLM client pool created: max_connections={limits.max_connections}, "
+            f"max_keepalive={limits.max_keepalive_connections}, keepalive_expiry={limits.keepalive_expiry}s"
+        )
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        """Count requests and attach a trace hook to observe new connections"""
+        self.requests_total += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+        elif event_name == "connection.start_tls.complete":
+            self.tls_handshakes += 1
+
+    def get_client(self) -> AsyncOpenAI:
+        """Return the shared AsyncOpenAI client, creating the pool on first use"""
+        if self._openai_client is None or self._http_client is None or self._http_client.is_closed:
+            self._create_clients()
+        return self._openai_client
+
+    async def startup(self) -> None:
+        self.get_client()
+
+    async def aclose(self) -> None:
+        if self._openai_client is not None:
+            await self._openai_client.close()
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._openai_client = None
+        self._http_client = None
+
+    def _pool_connections(self) -> list:
+        # httpx не предоставляет публичного API для состояния пула
+        transport = getattr(self._http_client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        return list(getattr(pool, "connections", []) or [])
+
+    def stats(self) -> Dict[str, Any]:
+        connections = self._pool_connections() if self._http_client is not None else []
+        reused = max(self.requests_total - self.connections_opened, 0)
+        return {
+            "active": self._http_client is not None and not self._http_client.is_closed,
+            "max_connections": config.llm_max_connections,
+            "max_keepalive_connections": config.llm_max_keepalive_connections,
+            "keepalive_expiry": config.llm_keepalive_expiry,
+            "pool_connections": len(connections),
+            "pool_idle_connections": sum(1 for c in connections if c.is_idle()),
+            "requests_total": self.requests_total,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "reuse_rate": round(reused / self.requests_total, 4) if self.requests_total else 0.0,
+        }
+
+
+llm_registry = LLMClientRegistry()
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """Shared pooled AsyncOpenAI client for agents"""
+    return llm_registry.get_client()
@@ -44,6 +44,8 @@ from openai import AsyncOpenAI
 
 from src.agent.settings import get_config
 from src.agent.core.prompts import PromptLoader
+from src.agent.core.llm_client import get_llm_client
+from src.agent.core.json_stream import repair_json
 
 logging.basicConfig(
     level=logging.INFO,
@@ -72,6 +74,7 @@ class ProfessionAmbientsAgent:
         top_p: float = 0.9,
         presence_penalty: float = 0.0,
         frequency_penalty: float = 0.0,
+        openai_client: Optional[AsyncOpenAI] = None,
     ):
         self.id = f"{self.name}_{uuid.uuid4()}"
         self.logger = logging.getLogger(self.id)
@@ -88,8 +91,8 @@ class ProfessionAmbientsAgent:
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
 
-        client_kwargs = {"base_url": config.base_url.strip(), "api_key": config.api_key}
-        self.openai_client = AsyncOpenAI(**client_kwargs)
+        # Общий пул соединений вместо отдельного клиента на каждый запрос
+        self.openai_client = openai_client or get_llm_client()
 
     def _prepare_prompt_context(self) -> Dict[str, str]:
         """Prepare context for prompt template"""
@@ -158,7 +161,7 @@ class ProfessionAmbientsAgent:
             self.logger.debug(f"Raw response preview: {response_content[:500]}...")
             
             # Clean and parse JSON
-            cleaned_json = self._clean_json_response(response_content)
+            cleaned_json = repair_json(response_content)
             ambients_data = json.loads(cleaned_json)
             
             # Validate response structure
@@ -184,45 +187,3 @@ class ProfessionAmbientsAgent:
             import traceback
             self.logger.error(traceback.format_exc())
             raise
-
-    def _clean_json_response(self, response: str) -> str:
-        """Clean response to extract valid JSON"""
-        # Remove markdown code blocks if present
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0]
-        elif "```" in response:
-            response = response.split("```")[1].split("```")[0]
-        
-        # Strip whitespace
-        response = response.strip()
-        
-        # Find first { (start of JSON)
-        json_start = response.find('{')
-        if json_start > 0:
-            response = response[json_start:]
-        
-        # Find last } (end of JSON)
-        json_end = response.rfind('}')
-        if json_end > 0:
-            response = response[:json_end + 1]
-        
-        # Fix common issues
-        return self._fix_json_issues(response)
-
-    def _fix_json_issues(self, json_str: str) -> str:
-        """Fix common JSON issues"""
-        s = json_str.strip()
-        
-        # Remove trailing comma before closing brace/bracket
-        s = s.replace(',}', '}').replace(',]', ']')
-        
-        # Fix unclosed objects
-        if s.count('{') > s.count('}'):
-            s += '}' * (s.count('{') - s.count('}'))
-        
-        # Fix unclosed arrays
-        if s.count('[') > s.count(']'):
-            s += ']' * (s.count('[') - s.count(']'))
-        
-        return s
-
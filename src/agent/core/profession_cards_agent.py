@@ -9,6 +9,9 @@ from openai import AsyncOpenAI
 
 from src.agent.settings import get_config
 from src.agent.core.prompts import PromptLoader
+from src.agent.core.llm_client import get_llm_client
+from src.agent.core.json_stream import repair_json
+from src.agent.core.response_cache import response_cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -35,6 +38,7 @@ class ProfessionCardsAgent:
         top_p: float = 0.9,
         presence_penalty: float = 0.0,
         frequency_penalty: float = 0.0,
+        openai_client: Optional[AsyncOpenAI] = None,
     ):
         self.id = f"{self.name}_{uuid.uuid4()}"
         self.logger = logging.getLogger(self.id)
@@ -49,8 +53,8 @@ class ProfessionCardsAgent:
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
 
-        client_kwargs = {"base_url": config.base_url.strip(), "api_key": config.api_key}
-        self.openai_client = AsyncOpenAI(**client_kwargs)
+        # Общий пул соединений вместо отдельного клиента на каждый запрос
+        self.openai_client = openai_client or get_llm_client()
 
     def _prepare_input_text(self) -> str:
         """Prepare combined input from personality and astrology data"""
@@ -69,6 +73,22 @@ class ProfessionCardsAgent:
         
         return "\n".join(input_parts)
 
+    def input_fingerprint(self) -> str:
+        """Stable hash of everything that determines the generated cards (prompt, input, model, params)"""
+        return response_cache.make_key(
+            self.name,
+            prompt_files=["profession_cards_prompt.txt"],
+            inputs={"input_text": self._prepare_input_text()},
+            model=self.model,
+            params={
+                "max_tokens": self.max_tokens,
+                "temperature": self.temperature,
+                "top_p": self.top_p,
+                "presence_penalty": self.presence_penalty,
+                "frequency_penalty": self.frequency_penalty,
+            },
+        )
+
     async def generate_profession_cards(self) -> List[Dict[str, Any]]:
         """Generate personalized profession recommendation cards"""
         self.logger.info("🚀 Starting profession cards generation")
@@ -101,7 +121,7 @@ class ProfessionCardsAgent:
             self.logger.debug(f"Raw response: {response_content}")
             
             # Clean and parse JSON
-            cleaned_json = self._clean_json_response(response_content)
+            cleaned_json = repair_json(response_content)
             profession_cards = json.loads(cleaned_json)
             
             # Validate response
@@ -117,45 +137,3 @@ class ProfessionCardsAgent:
         except Exception as e:
             self.logger.error(f"❌ Generation failed: {str(e)}")
             raise
-
-    def _clean_json_response(self, response: str) -> str:
-        """Clean response to extract valid JSON"""
-        # Remove markdown code blocks if present
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0]
-        elif "```" in response:
-            response = response.split("```")[1].split("```")[0]
-        
-        # Strip whitespace
-        response = response.strip()
-        
-        # Fix truncated JSON
-        return self._fix_truncated_json(response)
-
-    def _fix_truncated_json(self, truncated_str: str) -> str:
-        """Fix common JSON truncation issues"""
-        s = truncated_str.strip()
-        
-        # Remove trailing comma
-        if s.endswith(','):
-            s = s[:-1]
-        
-        # Fix unclosed objects
-        if s.count('{') > s.count('}'):
-            last_open = s.rfind('{')
-            last_close_after = s.find('}', last_open)
-            if last_close_after == -1:
-                s = s[:last_open].rstrip()
-                if s.endswith(','):
-                    s = s[:-1]
-        
-        # Fix unclosed arrays
-        if s.count('[') > s.count(']'):
-            s += ']'
-        
-        # Fix unclosed objects at the end
-        while s.count('{') > s.count('}'):
-            s += '}'
-        
-        return s
-
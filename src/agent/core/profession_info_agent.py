@@ -85,6 +85,9 @@ ProfessionInfoAgent - агент для генерации детальной и
     )
     result = await agent.generate_info()
 
+Ответы кэшируются (см. response_cache.py), если агент указан в LLM_CACHE_AGENTS
+или передан use_cache=True.
+
 API Endpoint: POST /vibe/profession-info
 """
 import logging
@@ -96,6 +99,9 @@ from openai import AsyncOpenAI
 
 from src.agent.settings import get_config
 from src.agent.core.prompts import PromptLoader
+from src.agent.core.llm_client import get_llm_client
+from src.agent.core.json_stream import repair_json
+from src.agent.core.response_cache import response_cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -124,6 +130,8 @@ class ProfessionInfoAgent:
         top_p: float = 0.9,
         presence_penalty: float = 0.0,
         frequency_penalty: float = 0.0,
+        openai_client: Optional[AsyncOpenAI] = None,
+        use_cache: Optional[bool] = None,
     ):
         self.id = f"{self.name}_{uuid.uuid4()}"
         self.logger = logging.getLogger(self.id)
@@ -140,8 +148,9 @@ class ProfessionInfoAgent:
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
 
-        client_kwargs = {"base_url": config.base_url.strip(), "api_key": config.api_key}
-        self.openai_client = AsyncOpenAI(**client_kwargs)
+        # Общий пул соединений вместо отдельного клиента на каждый запрос
+        self.openai_client = openai_client or get_llm_client()
+        self.use_cache = response_cache.is_enabled_for(self.name) if use_cache is None else use_cache
 
     def _prepare_prompt_context(self) -> Dict[str, str]:
         """Prepare context for prompt template"""
@@ -164,7 +173,26 @@ class ProfessionInfoAgent:
         }
 
     async def generate_info(self) -> Dict[str, Any]:
-        """Generate detailed profession information"""
+        """Generate detailed profession information (served from the response cache when enabled)"""
+        if not self.use_cache:
+            return await self._generate_info_uncached()
+
+        key = response_cache.make_key(
+            self.name,
+            prompt_files=["profession_info_prompt.txt"],
+            inputs=self._prepare_prompt_context(),
+            model=self.model,
+            params={
+                "max_tokens": self.max_tokens,
+                "temperature": self.temperature,
+                "top_p": self.top_p,
+                "presence_penalty": self.presence_penalty,
+                "frequency_penalty": self.frequency_penalty,
+            },
+        )
+        return await response_cache.get_or_compute(self.name, key, self._generate_info_uncached)
+
+    async def _generate_info_uncached(self) -> Dict[str, Any]:
         self.logger.info(f"🚀 Generating detailed info for profession: {self.profession_title}")
 
         # Load prompt template
@@ -195,7 +223,7 @@ class ProfessionInfoAgent:
             self.logger.debug(f"Raw response length: {len(response_content)}")
             
             # Clean and parse JSON
-            cleaned_json = self._clean_json_response(response_content)
+            cleaned_json = repair_json(response_content)
             info_data = json.loads(cleaned_json)
             
             # Validate response structure
@@ -218,46 +246,3 @@ class ProfessionInfoAgent:
             import traceback
             self.logger.error(traceback.format_exc())
             raise
-
-    def _clean_json_response(self, response: str) -> str:
-        """Clean response to extract valid JSON"""
-        # Remove markdown code blocks if present
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0]
-        elif "```" in response:
-            response = response.split("```")[1].split("```")[0]
-        
-        # Strip whitespace
-        response = response.strip()
-        
-        # Find first { (start of JSON)
-        json_start = response.find('{')
-        if json_start > 0:
-            response = response[json_start:]
-        
-        # Find last } (end of JSON)
-        json_end = response.rfind('}')
-        if json_end > 0:
-            response = response[:json_end + 1]
-        
-        # Fix common issues
-        return self._fix_json_issues(response)
-
-    def _fix_json_issues(self, json_str: str) -> str:
-        """Fix common JSON issues"""
-        s = json_str.strip()
-        
-        # Remove trailing comma before closing brace/bracket
-        s = s.replace(',}', '}').replace(',]', ']')
-        
-        # Fix unclosed objects
-        if s.count('{') > s.count('}'):
-            s += '}' * (s.count('{') - s.count('}'))
-        
-        # Fix unclosed arrays
-        if s.count('[') > s.count(']'):
-            s += ']' * (s.count('[') - s.count(']'))
-        
-        return s
-
-
@@ -2,12 +2,14 @@
 import logging
 import uuid
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
 
 from openai import AsyncOpenAI
 
 from src.agent.settings import get_config
 from src.agent.core.prompts import PromptLoader
+from src.agent.core.llm_client import get_llm_client
+from src.agent.core.json_stream import JSONStreamParser, WILDCARD, repair_json
 
 logging.basicConfig(
     level=logging.INFO,
@@ -36,6 +38,7 @@ class ProfessionRoadmapAgent:
         top_p: float = 0.9,
         presence_penalty: float = 0.0,
         frequency_penalty: float = 0.0,
+        openai_client: Optional[AsyncOpenAI] = None,
     ):
         self.id = f"{self.name}_{uuid.uuid4()}"
         self.logger = logging.getLogger(self.id)
@@ -52,8 +55,8 @@ class ProfessionRoadmapAgent:
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
 
-        client_kwargs = {"base_url": config.base_url.strip(), "api_key": config.api_key}
-        self.openai_client = AsyncOpenAI(**client_kwargs)
+        # Общий пул соединений вместо отдельного клиента на каждый запрос
+        self.openai_client = openai_client or get_llm_client()
 
     def _prepare_input_text(self) -> str:
         """Prepare combined input from profession, personality and astrology data"""
@@ -78,128 +81,138 @@ class ProfessionRoadmapAgent:
         
         return "\n".join(input_parts)
 
+    def _completion_params(self) -> Dict[str, Any]:
+        """Build chat completion request parameters"""
+        system_prompt = PromptLoader.get_prompt("profession_roadmap_prompt.txt")
+        input_text = self._prepare_input_text()
+
+        return {
+            "extra_headers": {
+                "HTTP-Referer": config.http_referer,
+                "X-Title": config.x_title,
+            },
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {
+                    "role": "user",
+                    "content": input_text,
+                },
+            ],
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "presence_penalty": self.presence_penalty,
+            "frequency_penalty": self.frequency_penalty,
+        }
+
     async def generate_roadmap(self) -> Dict[str, Any]:
         """Generate comprehensive career roadmap"""
         self.logger.info(f"🚀 Starting roadmap generation for: {self.profession_title}")
 
-        system_prompt = PromptLoader.get_prompt("profession_roadmap_prompt.txt")
-        input_text = self._prepare_input_text()
-
         try:
-            completion = await self.openai_client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": config.http_referer,
-                    "X-Title": config.x_title,
-                },
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {
-                        "role": "user",
-                        "content": input_text,
-                    },
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature,
-                top_p=self.top_p,
-                presence_penalty=self.presence_penalty,
-                frequency_penalty=self.frequency_penalty,
-            )
+            completion = await self.openai_client.chat.completions.create(**self._completion_params())
             
             response_content = completion.choices[0].message.content.strip()
             self.logger.debug(f"Raw response length: {len(response_content)} chars")
             
-            # Clean and parse JSON
-            cleaned_json = self._clean_json_response(response_content)
-            roadmap_data = json.loads(cleaned_json)
-            
-            # Validate response structure
-            if not isinstance(roadmap_data, dict):
-                raise ValueError("Response is not a dictionary")
-            
-            required_fields = ["profession", "overview", "stages"]
-            for field in required_fields:
-                if field not in roadmap_data:
-                    raise ValueError(f"Missing required field: {field}")
-            
-            # 🚨 CRITICAL: Ensure interviewQuestions exist in every stage
-            roadmap_data = self._ensure_interview_questions(roadmap_data)
+            roadmap_data = self._parse_roadmap(response_content)
             
             self.logger.info(f"✅ Generated roadmap with {len(roadmap_data.get('stages', []))} stages")
             return roadmap_data
 
-        except json.JSONDecodeError as e:
-            self.logger.error(f"❌ JSON parsing failed: {str(e)}")
-            self.logger.error(f"Failed content preview: {response_content[:500]}...")
-            raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
         except Exception as e:
             self.logger.error(f"❌ Generation failed: {str(e)}")
             raise
 
-    def _clean_json_response(self, response: str) -> str:
-        """Clean response to extract valid JSON"""
-        # Remove markdown code blocks if present
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0]
-        elif "```" in response:
-            response = response.split("```")[1].split("```")[0]
-        
-        # Strip whitespace
-        response = response.strip()
-        
-        # Fix common text issues that break JSON
-        # Replace problematic patterns before JSON parsing
-        response = self._sanitize_text_content(response)
-        
-        # Fix truncated JSON
-        return self._fix_truncated_json(response)
-    
-    def _sanitize_text_content(self, text: str) -> str:
-        """Sanitize text content to avoid JSON parsing issues"""
-        import re
-        
-        # Fix unescaped newlines within strings
-        text = text.replace('\r\n', ' ').replace('\r', ' ')
-        
-        # More aggressive backslash fixing
-        # First, temporarily mark valid escape sequences
-        text = text.replace(r'\"', '\x00QUOTE\x00')
-        text = text.replace(r'\\', '\x00BACKSLASH\x00')
-        text = text.replace(r'\/', '\x00SLASH\x00')
-        text = text.replace(r'\n', '\x00NEWLINE\x00')
-        text = text.replace(r'\t', '\x00TAB\x00')
-        text = text.replace(r'\r', '\x00RETURN\x00')
-        text = text.replace(r'\b', '\x00BACKSPACE\x00')
-        text = text.replace(r'\f', '\x00FORMFEED\x00')
+    async def stream_roadmap(self) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Generate roadmap with a streamed completion.
+
+        Yields ("overview", {...}) as soon as the overview is parsed, then ("stage", {...})
+        for every stage as soon as it closes, and finally ("roadmap", {...}) with the
+        complete validated roadmap.
+        """
+        self.logger.info(f"🚀 Starting streamed roadmap generation for: {self.profession_title}")
+
+        stream = await self.openai_client.chat.completions.create(
+            **self._completion_params(),
+            stream=True,
+        )
+
+        parser = JSONStreamParser(emit_paths=[("profession",), ("overview",), ("stages", WILDCARD)])
+        parts: List[str] = []
+        profession = self.profession_title
+
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            parts.append(delta)
+
+            for path, value in parser.feed(delta):
+                if path == ("profession",):
+                    profession = value
+                elif path == ("overview",):
+                    yield "overview", {"profession": profession, "overview": value}
+                elif isinstance(value, dict):
+                    stage_index = path[1] + 1
+                    self._ensure_stage_interview_questions(value, stage_index)
+                    yield "stage", {"index": stage_index, "stage": value}
+
+        response_content = "".join(parts).strip()
+        self.logger.debug(f"Raw streamed response length: {len(response_content)} chars")
+
+        # Парсер уже прошел весь ответ - повторно текст не сканируем
+        roadmap_data = self._parse_roadmap(response_content, cleaned_json=parser.close())
+        self.logger.info(f"✅ Streamed roadmap with {len(roadmap_data.get('stages', []))} stages")
+        yield "roadmap", roadmap_data
+
+    def _parse_roadmap(self, response_content: str, cleaned_json: Optional[str] = None) -> Dict[str, Any]:
+        """Parse and validate the complete roadmap JSON"""
+        try:
+            # Clean and parse JSON
+            if not cleaned_json:
+                cleaned_json = repair_json(response_content)
+            roadmap_data = json.loads(cleaned_json)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"❌ JSON parsing failed: {str(e)}")
+            self.logger.error(f"Failed content preview: {response_content[:500]}...")
+            raise ValueError(f"Failed to parse AI response as JSON: {str(e)}")
         
-        # Now escape all remaining backslashes
-        text = text.replace('\\', '\\\\')
+        # Validate response structure
+        if not isinstance(roadmap_data, dict):
+            raise ValueError("Response is not a dictionary")
         
-        # Restore valid escape sequences
-        text = text.replace('\x00QUOTE\x00', r'\"')
-        text = text.replace('\x00BACKSLASH\x00', r'\\')
-        text = text.replace('\x00SLASH\x00', r'\/')
-        text = text.replace('\x00NEWLINE\x00', r'\n')
-        text = text.replace('\x00TAB\x00', r'\t')
-        text = text.replace('\x00RETURN\x00', r'\r')
-        text = text.replace('\x00BACKSPACE\x00', r'\b')
-        text = text.replace('\x00FORMFEED\x00', r'\f')
+        required_fields = ["profession", "overview", "stages"]
+        for field in required_fields:
+            if field not in roadmap_data:
+                raise ValueError(f"Missing required field: {field}")
         
-        return text
-    
+        # 🚨 CRITICAL: Ensure interviewQuestions exist in every stage
+        return self._ensure_interview_questions(roadmap_data)
+
     def _ensure_interview_questions(self, roadmap_data: Dict[str, Any]) -> Dict[str, Any]:
         """Ensure every stage has interviewQuestions field (add fallback if missing)"""
         stages = roadmap_data.get('stages', [])
         
         for i, stage in enumerate(stages):
-            if 'interviewQuestions' not in stage or not stage['interviewQuestions']:
-                level = stage.get('level', 'UNKNOWN')
-                self.logger.warning(f"⚠️ Stage {i+1} ({level}) missing interviewQuestions - adding fallback")
-                
-                # Add fallback questions based on level
-                stage['interviewQuestions'] = self._get_fallback_questions(level, stage.get('title', ''))
+            self._ensure_stage_interview_questions(stage, i + 1)
         
         return roadmap_data
+
+    def _ensure_stage_interview_questions(self, stage: Dict[str, Any], number: int) -> Dict[str, Any]:
+        """Add fallback interviewQuestions to a single stage if missing"""
+        if 'interviewQuestions' not in stage or not stage['interviewQuestions']:
+            level = stage.get('level', 'UNKNOWN')
+            self.logger.warning(f"⚠️ Stage {number} ({level}) missing interviewQuestions - adding fallback")
+            
+            # Add fallback questions based on level
+            stage['interviewQuestions'] = self._get_fallback_questions(level, stage.get('title', ''))
+        
+        return stage
     
     def _get_fallback_questions(self, level: str, stage_title: str) -> list:
         """Generate fallback interview questions if AI didn't provide them"""
@@ -262,24 +275,3 @@ class ProfessionRoadmapAgent:
         
         # Return fallback questions for the level
         return fallback_questions.get(level, fallback_questions['BEGINNER'])[:5]
-
-    def _fix_truncated_json(self, truncated_str: str) -> str:
-        """Fix common JSON truncation issues"""
-        s = truncated_str.strip()
-        
-        # Remove trailing comma
-        if s.endswith(','):
-            s = s[:-1]
-        
-        # Fix unclosed arrays
-        if s.count('[') > s.count(']'):
-            diff = s.count('[') - s.count(']')
-            s += ']' * diff
-        
-        # Fix unclosed objects
-        if s.count('{') > s.count('}'):
-            diff = s.count('{') - s.count('}')
-            s += '}' * diff
-        
-        return s
-
@@ -9,6 +9,9 @@ from typing import Optional, List, Dict, Any
 from openai import AsyncOpenAI
 from src.agent.settings import get_config
 from src.agent.core.prompts import PromptLoader
+from src.agent.core.llm_client import get_llm_client
+from src.agent.core.json_stream import repair_json
+from src.agent.core.response_cache import response_cache, UncacheableResult
 
 logging.basicConfig(
     level=logging.INFO,
@@ -32,6 +35,8 @@ class ProfessionValidatorAgent:
         max_tokens: Optional[int] = 2048,
         temperature: float = 0.3,
         top_p: float = 0.9,
+        openai_client: Optional[AsyncOpenAI] = None,
+        use_cache: Optional[bool] = None,
     ):
         self.id = f"{self.name}_{uuid.uuid4()}"
         self.logger = logging.getLogger(self.id)
@@ -43,8 +48,10 @@ class ProfessionValidatorAgent:
         self.temperature = temperature 
         self.top_p = top_p
 
-        client_kwargs = {"base_url": config.base_url.strip(), "api_key": config.api_key}
-        self.openai_client = AsyncOpenAI(**client_kwargs)
+        # Общий пул соединений вместо отдельного клиента на каждый запрос
+        self.openai_client = openai_client or get_llm_client()
+        self.use_cache = response_cache.is_enabled_for(self.name) if use_cache is None else use_cache
+        self.used_fallback = False
 
     async def validate_profession(self) -> Dict[str, Any]:
         """
@@ -53,6 +60,26 @@ class ProfessionValidatorAgent:
         """
         self.logger.info(f"🔍 Validating profession: {self.profession_title}")
 
+        if not self.use_cache:
+            return await self._validate_uncached()
+
+        key = response_cache.make_key(
+            self.name,
+            prompt_files=["profession_validator_prompt.txt"],
+            inputs={"profession_title": self.profession_title},
+            model=self.model,
+            params={
+                "max_tokens": self.max_tokens,
+                "temperature": self.temperature,
+                "top_p": self.top_p,
+            },
+        )
+        result = await response_cache.get_or_compute(self.name, key, self._validate_for_cache)
+        # Ключ нормализован, а в ответе возвращаем запрос в том виде, как его ввел пользователь
+        result["query"] = self.profession_title
+        return result
+
+    async def _validate_uncached(self) -> Dict[str, Any]:
         # Step 1: Search HH.ru API
         hh_results = await self._search_hh_api()
         
@@ -61,6 +88,15 @@ class ProfessionValidatorAgent:
         
         return validation_result
 
+    async def _validate_for_cache(self) -> Dict[str, Any]:
+        hh_results = await self._search_hh_api()
+        validation_result = await self._analyze_with_ai(hh_results)
+
+        # Ответ по недоступному HH.ru или fallback без AI не кэшируем
+        if not hh_results.get("success") or self.used_fallback:
+            raise UncacheableResult(validation_result)
+        return validation_result
+
     async def _search_hh_api(self) -> Dict[str, Any]:
         """Search HH.ru API for vacancies matching the profession"""
         try:
@@ -189,7 +225,7 @@ class ProfessionValidatorAgent:
             self.logger.debug(f"AI response: {response_content}")
             
             # Clean and parse JSON
-            cleaned_json = self._clean_json_response(response_content)
+            cleaned_json = repair_json(response_content)
             result = json.loads(cleaned_json)
             
             # Add HH.ru data to result
@@ -207,18 +243,9 @@ class ProfessionValidatorAgent:
             self.logger.error(f"❌ AI analysis failed: {str(e)}")
             return self._create_fallback_response(hh_results)
 
-    def _clean_json_response(self, response: str) -> str:
-        """Clean response to extract valid JSON"""
-        # Remove markdown code blocks if present
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0]
-        elif "```" in response:
-            response = response.split("```")[1].split("```")[0]
-        
-        return response.strip()
-
     def _create_fallback_response(self, hh_results: Dict[str, Any]) -> Dict[str, Any]:
         """Create fallback validation response based on HH.ru results count"""
+        self.used_fallback = True
         total_found = hh_results.get("total_found", 0)
         
         if total_found == 0:
@@ -256,4 +283,3 @@ class ProfessionValidatorAgent:
                 "hh_total_found": total_found,
                 "query": self.profession_title,
             }
-
@@ -8,6 +8,9 @@ from openai import AsyncOpenAI
 
 from src.agent.settings import get_config
 from src.agent.core.prompts import PromptLoader
+from src.agent.core.llm_client import get_llm_client
+from src.agent.core.json_stream import repair_json
+from src.agent.core.response_cache import response_cache
 
 logging.basicConfig(
     level=logging.INFO,
@@ -35,6 +38,8 @@ class ProfessionVibeAgent:
         top_p: float = 0.9,
         presence_penalty: float = 0.0,
         frequency_penalty: float = 0.0,
+        openai_client: Optional[AsyncOpenAI] = None,
+        use_cache: Optional[bool] = None,
     ):
         self.id = f"{self.name}_{uuid.uuid4()}"
         self.logger = logging.getLogger(self.id)
@@ -50,8 +55,9 @@ class ProfessionVibeAgent:
         self.presence_penalty = presence_penalty
         self.frequency_penalty = frequency_penalty
 
-        client_kwargs = {"base_url": config.base_url.strip(), "api_key": config.api_key}
-        self.openai_client = AsyncOpenAI(**client_kwargs)
+        # Общий пул соединений вместо отдельного клиента на каждый запрос
+        self.openai_client = openai_client or get_llm_client()
+        self.use_cache = response_cache.is_enabled_for(self.name) if use_cache is None else use_cache
 
     def _prepare_prompt_context(self) -> Dict[str, str]:
         """Prepare context for prompt template"""
@@ -70,7 +76,28 @@ class ProfessionVibeAgent:
         }
 
     async def generate_questions(self) -> Dict[str, Any]:
-        """Generate clarifying questions about the profession"""
+        """Generate clarifying questions about the profession (served from the response cache when enabled)"""
+        if not self.use_cache:
+            return await self._generate_questions_uncached()
+
+        # В промпт попадают только код личности и знак зодиака, поэтому ответ
+        # общий для всех пользователей с одинаковой парой
+        key = response_cache.make_key(
+            self.name,
+            prompt_files=["profession_vibe_prompt.txt"],
+            inputs=self._prepare_prompt_context(),
+            model=self.model,
+            params={
+                "max_tokens": self.max_tokens,
+                "temperature": self.temperature,
+                "top_p": self.top_p,
+                "presence_penalty": self.presence_penalty,
+                "frequency_penalty": self.frequency_penalty,
+            },
+        )
+        return await response_cache.get_or_compute(self.name, key, self._generate_questions_uncached)
+
+    async def _generate_questions_uncached(self) -> Dict[str, Any]:
         self.logger.info(f"🚀 Generating questions for profession: {self.profession_title}")
 
         # Load prompt template
@@ -111,7 +138,7 @@ class ProfessionVibeAgent:
             self.logger.debug(f"Raw response: {response_content[:500]}...")
             
             # Clean and parse JSON
-            cleaned_json = self._clean_json_response(response_content)
+            cleaned_json = repair_json(response_content)
             self.logger.debug(f"Cleaned JSON: {cleaned_json[:500]}...")
             questions_data = json.loads(cleaned_json)
             
@@ -134,37 +161,3 @@ class ProfessionVibeAgent:
             import traceback
             self.logger.error(traceback.format_exc())
             raise
-
-    def _clean_json_response(self, response: str) -> str:
-        """Clean response to extract valid JSON"""
-        # Remove markdown code blocks if present
-        if "```json" in response:
-            response = response.split("```json")[1].split("```")[0]
-        elif "```" in response:
-            response = response.split("```")[1].split("```")[0]
-        
-        # Strip whitespace
-        response = response.strip()
-        
-        # Find first { or [ (start of JSON)
-        json_start = -1
-        for i, char in enumerate(response):
-            if char in ['{', '[']:
-                json_start = i
-                break
-        
-        if json_start > 0:
-            response = response[json_start:]
-        
-        # Find last } or ] (end of JSON)
-        json_end = -1
-        for i in range(len(response) - 1, -1, -1):
-            if response[i] in ['}', ']']:
-                json_end = i
-                break
-        
-        if json_end > 0:
-            response = response[:json_end + 1]
-        
-        return response.strip()
-
@@ -0,0 +1,359 @@
+# response_cache.py
+"""
+ResponseCache - персистентный кэш ответов LLM агентов
+
+Одни и те же популярные запросы ("Программист", "Дизайнер") раньше каждый раз
+шли в LLM. Кэш хранит распарсенные ответы в SQLite по ключу-хэшу от:
+- имени агента
+- содержимого файлов промптов (изменился промпт - изменился ключ)
+- нормализованного пользовательского ввода (регистр и пробелы не важны)
+- модели и параметров сэмплинга
+
+Политика:
+- ttl            - запись свежая, отдается без обращения к LLM
+- ttl + stale_ttl - запись устарела: отдается сразу, а в фоне запускается
+                    обновление (stale-while-revalidate)
+- старше         - промах, ответ генерируется заново
+- max_entries    - при переполнении вытесняются давно не читанные записи (LRU)
+
+Кэш включается для агента через LLM_CACHE_AGENTS или параметр use_cache
+конструктора агента. Работа с SQLite выполняется в потоке (asyncio.to_thread),
+чтобы не блокировать event loop.
+
+Использование в агенте:
+    key = response_cache.make_key(self.name, prompt_files=[...], inputs={...},
+                                  model=self.model, params={...})
+    return await response_cache.get_or_compute(self.name, key, self._generate_uncached)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from src.agent.settings import get_config
+from src.agent.core.prompts import PromptLoader
+
+logger = logging.getLogger(__name__)
+
+config = get_config()
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class UncacheableResult(Exception):
+    """Raised by a compute function to return a value without storing it (e.g. a fallback response)"""
+
+    def __init__(self, value: Any):
+        super().__init__("result is not cacheable")
+        self.value = value
+
+
+def _normalize(value: Any) -> Any:
+    """Normalize user input so that trivial differences map to the same key"""
+    if isinstance(value, str):
+        return _WHITESPACE.sub(" ", value).strip().casefold()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+class ResponseCache:
+    """SQLite-backed content-addressed cache for agent responses"""
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float,
+        stale_ttl: float,
+        max_entries: int,
+        enabled_agents: Iterable[str] = (),
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.enabled_agents = {a.strip() for a in enabled_agents if a.strip()}
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._entries = 0
+
+        # Фоновые обновления устаревших записей и вычисления "в полете"
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+        self._metrics: Dict[str, Dict[str, int]] = {}
+
+    # --- ключи ------------------------------------------------------------
+
+    def is_enabled_for(self, agent_name: str) -> bool:
+        return agent_name in self.enabled_agents
+
+    @staticmethod
+    def make_key(
+        agent_name: str,
+        prompt_files: Iterable[str] = (),
+        inputs: Optional[Dict[str, Any]] = None,
+        model: str = "",
+        params: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Build the cache key from prompt contents, normalized input, model and sampling params"""
+        # Берем шаблон без подстановки даты, иначе ключ менялся бы каждую секунду
+        prompts = {name: PromptLoader._load_prompt_file(name) for name in prompt_files}
+        material = {
+            "agent": agent_name,
+            "prompts": prompts,
+            "inputs": _normalize(inputs or {}),
+            "model": model,
+            "params": params or {},
+        }
+        raw = json.dumps(material, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # --- хранилище --------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_response_cache (
+                    key TEXT PRIMARY KEY,
+                    agent TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_llm_response_cache_accessed
+                ON llm_response_cache(accessed_at)
+            """)
+            conn.commit()
+            self._entries = conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def _read(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, created_at FROM llm_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE llm_response_cache SET accessed_at = ? WHERE key = ?", (time.time(), key)
+                )
+                conn.commit()
+            return row
+
+    def _write(self, key: str, agent_name: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                """
+                INSERT OR IGNORE INTO llm_response_cache (key, agent, value, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (key, agent_name, value, now, now),
+            )
+            if cursor.rowcount:
+                self._entries += 1
+            else:
+                conn.execute(
+                    """
+                    UPDATE llm_response_cache SET value = ?, created_at = ?, accessed_at = ?
+                    WHERE key = ?
+                    """,
+                    (value, now, now, key),
+                )
+            if self._entries > self.max_entries:
+                self._evict(conn, now)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        # Сначала окончательно протухшие записи, затем давно не читанные
+        conn.execute(
+            "DELETE FROM llm_response_cache WHERE created_at < ?",
+            (now - self.ttl - self.stale_ttl,),
+        )
+        self._entries = conn.execute("SELECT COUNT(*) FROM llm_response_cache").fetchone()[0]
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                """
+                DELETE FROM llm_response_cache WHERE key IN (
+                    SELECT key FROM llm_response_cache ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+            self._entries -= overflow
+        logger.info(f"LLM response cache evicted down to {self._entries} entries")
+
+    def _close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --- метрики ----------------------------------------------------------
+
+    def _count(self, agent_name: str, metric: str) -> None:
+        counters = self._metrics.setdefault(
+            agent_name, {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+        )
+        counters[metric] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        agents = {}
+        for agent_name, counters in self._metrics.items():
+            lookups = counters["hits"] + counters["stale_hits"] + counters["misses"]
+            served = counters["hits"] + counters["stale_hits"]
+            agents[agent_name] = {
+                **counters,
+                "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            }
+        return {
+            "enabled_agents": sorted(self.enabled_agents),
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "agents": agents,
+        }
+
+    # --- основной API -----------------------------------------------------
+
+    async def get_or_compute(
+        self,
+        agent_name: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Return the cached value for key or compute and store it.
+
+        compute may raise UncacheableResult(value) to return a value that must not be cached.
+        """
+        try:
+            row = await asyncio.to_thread(self._read, key)
+        except sqlite3.Error as e:
+            # Кэш не должен ломать генерацию
+            logger.error(f"LLM response cache read failed: {str(e)}")
+            self._count(agent_name, "errors")
+            row = None
+
+        if row is not None:
+            value, created_at = row
+            age = time.time() - created_at
+            if age <= self.ttl:
+                self._count(agent_name, "hits")
+                return json.loads(value)
+            if age <= self.ttl + self.stale_ttl:
+                self._count(agent_name, "stale_hits")
+                self._schedule_refresh(agent_name, key, compute)
+                return json.loads(value)
+
+        self._count(agent_name, "misses")
+
+        # Одинаковые одновременные промахи ждут одно вычисление
+        pending = self._inflight.get(key)
+        if pending is not None:
+            try:
+                return json.loads(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Запрос-владелец отменен (клиент отключился) - считаем сами
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._compute_and_store(agent_name, key, compute)
+        except UncacheableResult as e:
+            future.set_result(json.dumps(e.value, ensure_ascii=False))
+            return e.value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получат ожидающие, если они есть
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            return json.loads(value)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    async def _compute_and_store(
+        self,
+        agent_name: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> str:
+        result = await compute()
+        value = json.dumps(result, ensure_ascii=False)
+        try:
+            await asyncio.to_thread(self._write, key, agent_name, value)
+        except sqlite3.Error as e:
+            logger.error(f"LLM response cache write failed: {str(e)}")
+            self._count(agent_name, "errors")
+        return value
+
+    def _schedule_refresh(
+        self,
+        agent_name: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+    ) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._compute_and_store(agent_name, key, compute)
+                self._count(agent_name, "refreshes")
+            except UncacheableResult:
+                pass
+            except Exception as e:
+                logger.warning(f"Background refresh for {agent_name} failed: {str(e)}")
+                self._count(agent_name, "errors")
+            finally:
+                self._refreshing.pop(key, None)
+
+        task = asyncio.create_task(refresh())
+        self._refreshing[key] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.to_thread(self._close)
+
+
+response_cache = ResponseCache(
+    path=config.llm_cache_path,
+    ttl=config.llm_cache_ttl,
+    stale_ttl=config.llm_cache_stale_ttl,
+    max_entries=config.llm_cache_max_entries,
+    enabled_agents=config.llm_cache_agents.split(","),
+)
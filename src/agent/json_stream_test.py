@@ -0,0 +1,39 @@
+import json
+
+from src.agent.core.json_stream import JSONStreamParser, repair_json, loads_tolerant, WILDCARD
+
+
+def main():
+    """Regression checks for the tolerant JSON parser (no API calls)"""
+
+    cases = [
+        # Markdown-обертка и висячая запятая
+        ('```json\n{"a": [1, 2,],}\n```', {"a": [1, 2]}),
+        # Обрезанный ответ
+        ('{"a": "text', {"a": "text"}),
+        # Python-литералы
+        ('{"a": True, "b": None}', {"a": True, "b": None}),
+        # Неразрывный пробел и \f между токенами
+        ('{"a": 1,\xa0"b": 2}', {"a": 1, "b": 2}),
+        ('{"a":\x0c1,\x0c"b": [true\xa0, null]}', {"a": 1, "b": [True, None]}),
+        ('{"a": 1 }', {"a": 1}),
+        # Внутри строк пробелы сохраняются
+        ('{"a": "x\xa0y"}', {"a": "x\xa0y"}),
+    ]
+    for text, expected in cases:
+        result = loads_tolerant(text)
+        assert result == expected, f"{text!r}: {result!r} != {expected!r}"
+        json.loads(repair_json(text))
+
+    # Стриминг: значения отдаются по мере закрытия
+    parser = JSONStreamParser(emit_paths=[("stages", WILDCARD)])
+    events = []
+    for delta in ['{"stages": [{"n":', '\xa01},\x0c{"n": 2}', "]}"]:
+        events.extend(parser.feed(delta))
+    assert events == [(("stages", 0), {"n": 1}), (("stages", 1), {"n": 2})], events
+
+    print(f"✅ {len(cases) + 1} checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,22 @@ class AppConfig(BaseModel):
     prompts_dir: Optional[str] = Field(None, alias="PROMPTS_DIR")
     system_prompt_file: Optional[str] = Field(None, alias="SYSTEM_PROMPT_FILE")
 
+    # Пул соединений к LLM API (общий для всех агентов)
+    llm_max_connections: int = Field(100, alias="LLM_MAX_CONNECTIONS")
+    llm_max_keepalive_connections: int = Field(20, alias="LLM_MAX_KEEPALIVE_CONNECTIONS")
+    llm_keepalive_expiry: float = Field(60.0, alias="LLM_KEEPALIVE_EXPIRY")
+    llm_timeout: float = Field(600.0, alias="LLM_TIMEOUT")
+    llm_connect_timeout: float = Field(10.0, alias="LLM_CONNECT_TIMEOUT")
+
+    # Кэш ответов агентов (SQLite): время жизни в секундах, LRU лимит, агенты с включенным кэшем
+    llm_cache_path: str = Field("data/llm_cache.db", alias="LLM_CACHE_PATH")
+    llm_cache_ttl: float = Field(86400.0, alias="LLM_CACHE_TTL")
+    llm_cache_stale_ttl: float = Field(604800.0, alias="LLM_CACHE_STALE_TTL")
+    llm_cache_max_entries: int = Field(5000, alias="LLM_CACHE_MAX_ENTRIES")
+    llm_cache_agents: str = Field(
+        "profession_info_agent,profession_validator_agent,profession_vibe_agent", alias="LLM_CACHE_AGENTS"
+    )
+
     class Config:
         # Разрешает использовать alias как имена переменных в .env
         populate_by_name = True
@@ -8,11 +8,44 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    BCRYPT_MAX_WORKERS: int = int(os.getenv("BCRYPT_MAX_WORKERS", "2"))
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "data/career_ai.db")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "8"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", "20000"))
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", "268435456"))
+    DB_STATEMENT_CACHE: int = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+    ROADMAP_COMPRESSION_LEVEL: int = int(os.getenv("ROADMAP_COMPRESSION_LEVEL", "6"))
+    PROFILE_CACHE_MAX_ENTRIES: int = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "10000"))
+    PROFILE_CACHE_TTL: float = float(os.getenv("PROFILE_CACHE_TTL", "600"))
     ELEVENLABS_API_KEY: str = os.getenv("ELEVENLABS_API_KEY", "")
     FUSION_BRAIN_API_KEY: str = os.getenv("FUSION_BRAIN_API_KEY", "")
     FUSION_BRAIN_SECRET_KEY: str = os.getenv("FUSION_BRAIN_SECRET_KEY", "")
     FUSION_BRAIN_API_URL: str = os.getenv("FUSION_BRAIN_API_URL", "https://api-key.fusionbrain.ai/")
+    CARD_SET_VARIANTS: int = int(os.getenv("CARD_SET_VARIANTS", "3"))
+    FUSION_BRAIN_MAX_CONCURRENCY: int = int(os.getenv("FUSION_BRAIN_MAX_CONCURRENCY", "3"))
+    ELEVENLABS_MAX_CONCURRENCY: int = int(os.getenv("ELEVENLABS_MAX_CONCURRENCY", "4"))
+    MEDIA_IMAGE_TIMEOUT: float = float(os.getenv("MEDIA_IMAGE_TIMEOUT", "150"))
+    MEDIA_AUDIO_TIMEOUT: float = float(os.getenv("MEDIA_AUDIO_TIMEOUT", "60"))
+    MEDIA_STORE_DIR: str = os.getenv("MEDIA_STORE_DIR", "data/media")
+    MEDIA_GC_ENABLED: bool = os.getenv("MEDIA_GC_ENABLED", "true").lower() == "true"
+    MEDIA_QUOTA_USER_MB: int = int(os.getenv("MEDIA_QUOTA_USER_MB", "500"))
+    MEDIA_QUOTA_TOTAL_MB: int = int(os.getenv("MEDIA_QUOTA_TOTAL_MB", "20480"))
+    MEDIA_GC_INTERVAL: float = float(os.getenv("MEDIA_GC_INTERVAL", "600"))
+    MEDIA_GC_BATCH: int = int(os.getenv("MEDIA_GC_BATCH", "200"))
+    MEDIA_GC_MIN_AGE: float = float(os.getenv("MEDIA_GC_MIN_AGE", "3600"))
+    MEDIA_GC_ORPHAN_GRACE: float = float(os.getenv("MEDIA_GC_ORPHAN_GRACE", "86400"))
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "2"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOBS_RUN_IN_APP: bool = os.getenv("JOBS_RUN_IN_APP", "false").lower() == "true"
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+    PREFETCH_TOP_N: int = int(os.getenv("PREFETCH_TOP_N", "3"))
+    PREFETCH_MAX_CONCURRENCY: int = int(os.getenv("PREFETCH_MAX_CONCURRENCY", "2"))
+    PREFETCH_MAX_PENDING: int = int(os.getenv("PREFETCH_MAX_PENDING", "100"))
     APP_NAME: str = "Career AI Backend"
     APP_VERSION: str = "1.0.0"
     ALLOWED_ORIGINS: list = os.getenv("ALLOWED_ORIGINS", "*").split(",")
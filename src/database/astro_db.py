@@ -4,6 +4,7 @@ import uuid
 import json
 from datetime import datetime
 from src.database.db import get_db_connection
+from src.database.profile_cache import profile_cache
 
 
 def save_astro_profile(user_id: str, profile_data: dict) -> dict:
@@ -74,6 +75,7 @@ def save_astro_profile(user_id: str, profile_data: dict) -> dict:
             )
         
         conn.commit()
+        profile_cache.invalidate(user_id)
         
         return {
             "id": profile_id,
@@ -84,7 +86,36 @@ def save_astro_profile(user_id: str, profile_data: dict) -> dict:
         }
 
 
+def astro_profile_from_row(row, user_id: str) -> dict:
+    """Строка astro_profiles (sqlite3.Row или dict с теми же ключами) в словарь профиля"""
+    return {
+        "id": row["id"],
+        "user_id": user_id,
+        "birth_date": row["birth_date"],
+        "birth_time": row["birth_time"],
+        "birth_city": row["birth_city"],
+        "birth_country": row["birth_country"],
+        "zodiac_sign": row["zodiac_sign"],
+        "zodiac_element": row["zodiac_element"],
+        "zodiac_quality": row["zodiac_quality"],
+        "chinese_zodiac": row["chinese_zodiac"],
+        "life_path_number": row["life_path_number"],
+        "soul_number": row["soul_number"],
+        "personality_traits": row["personality_traits"],
+        "career_recommendations": row["career_recommendations"],
+        "strengths": row["strengths"],
+        "challenges": row["challenges"],
+        "compatibility_signs": json.loads(row["compatibility_signs"]),
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"]
+    }
+
+
 def get_astro_profile(user_id: str) -> dict | None:
+    found, cached = profile_cache.peek(user_id, "astro_profile")
+    if found:
+        return cached
+
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
@@ -100,27 +131,7 @@ def get_astro_profile(user_id: str) -> dict | None:
         row = cursor.fetchone()
         
         if row:
-            return {
-                "id": row["id"],
-                "user_id": user_id,
-                "birth_date": row["birth_date"],
-                "birth_time": row["birth_time"],
-                "birth_city": row["birth_city"],
-                "birth_country": row["birth_country"],
-                "zodiac_sign": row["zodiac_sign"],
-                "zodiac_element": row["zodiac_element"],
-                "zodiac_quality": row["zodiac_quality"],
-                "chinese_zodiac": row["chinese_zodiac"],
-                "life_path_number": row["life_path_number"],
-                "soul_number": row["soul_number"],
-                "personality_traits": row["personality_traits"],
-                "career_recommendations": row["career_recommendations"],
-                "strengths": row["strengths"],
-                "challenges": row["challenges"],
-                "compatibility_signs": json.loads(row["compatibility_signs"]),
-                "created_at": row["created_at"],
-                "updated_at": row["updated_at"]
-            }
+            return astro_profile_from_row(row, user_id)
         return None
 
 
@@ -129,5 +140,6 @@ def delete_astro_profile(user_id: str) -> bool:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM astro_profiles WHERE user_id = ?", (user_id,))
         conn.commit()
+        profile_cache.invalidate(user_id)
         return cursor.rowcount > 0
 
@@ -0,0 +1,99 @@
+"""
+Асинхронный доступ к БД для роутеров
+
+Функции *_db модулей синхронные и при вызове из async def обработчика
+выполнялись бы в потоке event loop, останавливая все идущие LLM стримы на время
+обращения к диску. Здесь те же функции с теми же именами и сигнатурами, но
+выполняются в отдельном пуле потоков БД (размером с пул соединений, поэтому
+поток никогда не ждет свободного соединения).
+
+Синхронные функции остаются в *_db модулях для скриптов (precompute_cards.py и др.).
+
+Использование:
+    from src.database.async_db import get_user_by_username
+    user = await get_user_by_username(username)
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, TypeVar
+
+from src.config import settings
+from src.database import db, personality_db, astro_db, roadmap_db, card_sets_db, user_context_db, media_db, jobs_db
+
+T = TypeVar("T")
+
+_executor = ThreadPoolExecutor(max_workers=settings.DB_POOL_SIZE, thread_name_prefix="db")
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a synchronous database function on the database thread pool"""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(_executor, call)
+
+
+def to_async(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        return await run_db(func, *args, **kwargs)
+    return wrapper
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=True)
+
+
+# Пользователи
+get_user_by_username = to_async(db.get_user_by_username)
+get_user_by_id = to_async(db.get_user_by_id)
+create_user = to_async(db.create_user)
+user_exists = to_async(db.user_exists)
+update_user_password = to_async(db.update_user_password)
+get_user_context = to_async(user_context_db.get_user_context)
+
+# Тест личности
+save_personality_result = to_async(personality_db.save_personality_result)
+get_user_personality_results = to_async(personality_db.get_user_personality_results)
+get_latest_personality_result = to_async(personality_db.get_latest_personality_result)
+delete_personality_result = to_async(personality_db.delete_personality_result)
+delete_all_personality_results = to_async(personality_db.delete_all_personality_results)
+
+# Астрология
+save_astro_profile = to_async(astro_db.save_astro_profile)
+get_astro_profile = to_async(astro_db.get_astro_profile)
+delete_astro_profile = to_async(astro_db.delete_astro_profile)
+
+# Roadmap
+save_roadmap = to_async(roadmap_db.save_roadmap)
+get_roadmap = to_async(roadmap_db.get_roadmap)
+get_roadmap_by_id = to_async(roadmap_db.get_roadmap_by_id)
+get_roadmap_response = to_async(roadmap_db.get_roadmap_response)
+get_roadmap_response_by_id = to_async(roadmap_db.get_roadmap_response_by_id)
+get_user_roadmaps = to_async(roadmap_db.get_user_roadmaps)
+delete_roadmap = to_async(roadmap_db.delete_roadmap)
+
+# Предгенерированные карточки профессий
+get_random_card_set = to_async(card_sets_db.get_random_card_set)
+count_card_sets = to_async(card_sets_db.count_card_sets)
+save_card_set = to_async(card_sets_db.save_card_set)
+
+# Каталог медиа
+record_media = to_async(media_db.record_media)
+get_media = to_async(media_db.get_media)
+delete_media = to_async(media_db.delete_media)
+touch_media = to_async(media_db.touch_media)
+add_media_refs = to_async(media_db.add_media_refs)
+
+# Очередь задач
+create_job = to_async(jobs_db.create_job)
+get_job = to_async(jobs_db.get_job)
+get_user_jobs = to_async(jobs_db.get_user_jobs)
+claim_job = to_async(jobs_db.claim_job)
+renew_lease = to_async(jobs_db.renew_lease)
+update_job_progress = to_async(jobs_db.update_job_progress)
+complete_job = to_async(jobs_db.complete_job)
+fail_job = to_async(jobs_db.fail_job)
+release_job = to_async(jobs_db.release_job)
@@ -0,0 +1,93 @@
+import uuid
+import json
+from typing import Optional, List, Dict, Any
+from src.database.db import get_db_connection
+
+
+def get_random_card_set(input_hash: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Получить случайный предгенерированный вариант карточек для набора входных данных
+    Возвращает None, если для этого набора вариантов еще нет
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT cards FROM profession_card_sets
+            WHERE input_hash = ?
+            ORDER BY RANDOM()
+            LIMIT 1
+        """, (input_hash,))
+
+        row = cursor.fetchone()
+        if row:
+            return json.loads(row['cards'])
+        return None
+
+
+def count_card_sets(input_hash: str) -> int:
+    """
+    Количество сохраненных вариантов для набора входных данных
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COUNT(*) AS total FROM profession_card_sets
+            WHERE input_hash = ?
+        """, (input_hash,))
+        return cursor.fetchone()['total']
+
+
+def save_card_set(
+    personality_code: Optional[str],
+    zodiac_sign: Optional[str],
+    input_hash: str,
+    cards: List[Dict[str, Any]],
+    max_variants: Optional[int] = None,
+) -> Optional[str]:
+    """
+    Сохранить вариант карточек для корзины (код личности × знак зодиака)
+    Если задан max_variants и вариантов уже достаточно - ничего не сохраняет и возвращает None
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        if max_variants is not None:
+            cursor.execute("""
+                SELECT COUNT(*) AS total FROM profession_card_sets
+                WHERE input_hash = ?
+            """, (input_hash,))
+            if cursor.fetchone()['total'] >= max_variants:
+                return None
+
+        card_set_id = str(uuid.uuid4())
+        cursor.execute("""
+            INSERT INTO profession_card_sets (id, personality_code, zodiac_sign, input_hash, cards)
+            VALUES (?, ?, ?, ?, ?)
+        """, (
+            card_set_id,
+            personality_code or "",
+            zodiac_sign or "",
+            input_hash,
+            json.dumps(cards, ensure_ascii=False)
+        ))
+
+        conn.commit()
+        return card_set_id
+
+
+def delete_stale_card_sets(valid_hashes: List[str]) -> int:
+    """
+    Удалить варианты, входные данные которых больше не встречаются
+    (изменились промпт, модель или статические таблицы личности/зодиака)
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        valid = set(valid_hashes)
+        cursor.execute("SELECT DISTINCT input_hash FROM profession_card_sets")
+        stale = [row['input_hash'] for row in cursor.fetchall() if row['input_hash'] not in valid]
+
+        for input_hash in stale:
+            cursor.execute("DELETE FROM profession_card_sets WHERE input_hash = ?", (input_hash,))
+
+        conn.commit()
+        return len(stale)
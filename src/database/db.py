@@ -6,13 +6,23 @@ from pathlib import Path
 from datetime import datetime
 from contextlib import contextmanager
 from src.config import settings
+from src.database.pool import db_pool
 
 
 def init_database():
     db_path = Path(settings.DATABASE_PATH)
     db_path.parent.mkdir(parents=True, exist_ok=True)
 
-    conn = sqlite3.connect(settings.DATABASE_PATH)
+    from src.database.roadmap_db import backfill_roadmap_summaries
+
+    with db_pool.connection() as conn:
+        _create_tables(conn)
+        backfill_roadmap_summaries(conn)
+
+    print(f"✅ База данных инициализирована: {settings.DATABASE_PATH}")
+
+
+def _create_tables(conn: sqlite3.Connection):
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -57,6 +67,12 @@ def init_database():
         ON personality_results(user_id)
     """)
 
+    # Последний результат пользователя (get_latest_personality_result, контекст пользователя)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_personality_user_created 
+        ON personality_results(user_id, created_at)
+    """)
+
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS astro_profiles (
             id TEXT PRIMARY KEY,
@@ -94,12 +110,35 @@ def init_database():
             user_id TEXT NOT NULL,
             profession_title TEXT NOT NULL,
             roadmap_data TEXT NOT NULL,
+            profession TEXT,
+            stage_count INTEGER,
+            overview_headline TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
         )
     """)
 
+    # Краткие поля для списка roadmaps (таблицы, созданные до их появления)
+    _add_missing_columns(cursor, "roadmaps", {
+        "profession": "TEXT",
+        "stage_count": "INTEGER",
+        "overview_headline": "TEXT",
+    })
+
+    # Раньше обновление писало локальное время в isoformat ("2024-01-01T12:00:00.123456"),
+    # а вставка - CURRENT_TIMESTAMP (UTC, "2024-01-01 09:00:00"). Приводим к одному
+    # формату, иначе сортировка по updated_at идет по формату, а не по времени
+    for column in ("created_at", "updated_at"):
+        cursor.execute(f"""
+            UPDATE roadmaps
+            SET {column} = strftime('%Y-%m-%d %H:%M:%f', {column}, 'utc')
+            WHERE {column} LIKE '____-__-__T%'
+        """)
+
+    # Ответ /roadmap/saved/* собирается из roadmap_data, отдельная копия в gzip не хранится
+    _drop_columns(cursor, "roadmaps", ["response_gzip"])
+
     cursor.execute("""
         CREATE INDEX IF NOT EXISTS idx_roadmaps_user_id 
         ON roadmaps(user_id)
@@ -110,20 +149,138 @@ def init_database():
         ON roadmaps(user_id, profession_title)
     """)
 
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_roadmaps_user_updated 
+        ON roadmaps(user_id, updated_at DESC, id DESC)
+    """)
+
+    # Каталог сгенерированных медиа файлов (изображения, звуки, голоса, JSON окружений)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS media (
+            kind TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            path TEXT NOT NULL,
+            owner_id TEXT,
+            checksum TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            mime_type TEXT NOT NULL,
+            provider TEXT,
+            latency_ms INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_accessed_at TIMESTAMP,
+            PRIMARY KEY (kind, filename),
+            FOREIGN KEY (owner_id) REFERENCES users (id) ON DELETE SET NULL
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_media_owner_id 
+        ON media(owner_id)
+    """)
+
+    _add_missing_columns(cursor, "media", {"last_accessed_at": "TIMESTAMP"})
+
+    # Ссылки JSON окружений на медиа файлы - такие файлы сборщик не удаляет
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS media_refs (
+            parent_kind TEXT NOT NULL,
+            parent_filename TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            PRIMARY KEY (parent_kind, parent_filename, kind, filename)
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_media_refs_target 
+        ON media_refs(kind, filename)
+    """)
+
+    # Очередь задач генерации (jobs_db, worker.py)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            result TEXT,
+            progress TEXT,
+            error TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            lease_owner TEXT,
+            lease_expires_at REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_created 
+        ON jobs(status, created_at)
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_jobs_user_created 
+        ON jobs(user_id, created_at)
+    """)
+
+    # Словари сжатия (roadmap_codec)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS compression_dicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            data BLOB NOT NULL,
+            sample_count INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Предгенерированные наборы карточек профессий по корзинам (код личности × знак зодиака)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS profession_card_sets (
+            id TEXT PRIMARY KEY,
+            personality_code TEXT NOT NULL,
+            zodiac_sign TEXT NOT NULL,
+            input_hash TEXT NOT NULL,
+            cards TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_card_sets_input_hash 
+        ON profession_card_sets(input_hash)
+    """)
+
     conn.commit()
-    conn.close()
 
-    print(f"✅ База данных инициализирована: {settings.DATABASE_PATH}")
+
+def _add_missing_columns(cursor: sqlite3.Cursor, table: str, columns: dict) -> None:
+    existing = {row["name"] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def _drop_columns(cursor: sqlite3.Cursor, table: str, columns: list) -> None:
+    existing = {row["name"] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    for name in columns:
+        if name in existing:
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN {name}")
 
 
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(settings.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    try:
+    """
+    Соединение из общего пула (WAL, настроенные PRAGMA)
+    Незакоммиченные изменения откатываются при возврате соединения в пул
+    """
+    with db_pool.connection() as conn:
         yield conn
-    finally:
-        conn.close()
 
 
 def get_user_by_username(username: str) -> dict | None:
@@ -180,6 +337,17 @@ def create_user(username: str, hashed_password: str) -> dict:
         }
 
 
+def update_user_password(user_id: str, hashed_password: str) -> bool:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE users SET hashed_password = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+            (hashed_password, user_id)
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+
+
 def user_exists(username: str) -> bool:
     with get_db_connection() as conn:
         cursor = conn.cursor()
@@ -0,0 +1,199 @@
+"""
+Очередь задач генерации в SQLite
+
+Задача (например, roadmap или окружения с медиа) ставится в очередь из API и
+выполняется воркером (worker.py). Воркер берет задачу в аренду (lease) на
+JOB_LEASE_SECONDS и продлевает ее, пока работает. Если воркер упал или
+перезапустился, аренда истекает и задачу забирает другой воркер - до
+max_attempts попыток.
+
+Статусы: queued -> running -> succeeded | failed
+"""
+import json
+import time
+import uuid
+from typing import Optional, List, Dict, Any
+from src.database.db import get_db_connection
+
+JOB_KIND_ROADMAP = "roadmap"
+JOB_KIND_AMBIENTS_WITH_MEDIA = "ambients_with_media"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+
+FINAL_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+
+def _job_from_row(row) -> Dict[str, Any]:
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'kind': row['kind'],
+        'status': row['status'],
+        'payload': json.loads(row['payload']),
+        'result': json.loads(row['result']) if row['result'] else None,
+        'progress': json.loads(row['progress']) if row['progress'] else None,
+        'error': row['error'],
+        'attempts': row['attempts'],
+        'max_attempts': row['max_attempts'],
+        'created_at': row['created_at'],
+        'started_at': row['started_at'],
+        'finished_at': row['finished_at']
+    }
+
+
+def create_job(user_id: str, kind: str, payload: Dict[str, Any], max_attempts: int = 3) -> Dict[str, Any]:
+    """
+    Поставить задачу в очередь
+    """
+    job_id = str(uuid.uuid4())
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO jobs (id, user_id, kind, status, payload, max_attempts)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            job_id,
+            user_id,
+            kind,
+            STATUS_QUEUED,
+            json.dumps(payload, ensure_ascii=False),
+            max_attempts
+        ))
+        conn.commit()
+
+        cursor.execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return _job_from_row(cursor.fetchone())
+
+
+def get_job(job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Получить задачу (с проверкой что она принадлежит пользователю)
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id))
+        row = cursor.fetchone()
+        return _job_from_row(row) if row else None
+
+
+def get_user_jobs(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT * FROM jobs
+            WHERE user_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (user_id, limit))
+        return [_job_from_row(row) for row in cursor.fetchall()]
+
+
+def claim_job(worker_id: str, kinds: List[str], lease_seconds: float) -> Optional[Dict[str, Any]]:
+    """
+    Взять в аренду самую старую задачу из очереди или задачу с истекшей арендой
+
+    Выбор и захват - один UPDATE, поэтому два воркера не получат одну задачу.
+    """
+    now = time.time()
+    placeholders = ", ".join("?" for _ in kinds)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+
+        # Задачи, исчерпавшие попытки, чей воркер пропал - больше не повторяем
+        cursor.execute(f"""
+            UPDATE jobs
+            SET status = ?, error = 'Worker lease expired', lease_owner = NULL,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE status = ? AND lease_expires_at < ? AND attempts >= max_attempts
+              AND kind IN ({placeholders})
+        """, (STATUS_FAILED, STATUS_RUNNING, now, *kinds))
+
+        cursor.execute(f"""
+            UPDATE jobs
+            SET status = ?, lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1,
+                progress = NULL, started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE kind IN ({placeholders})
+                  AND (status = ? OR (status = ? AND lease_expires_at < ?))
+                ORDER BY created_at
+                LIMIT 1
+            )
+            RETURNING *
+        """, (STATUS_RUNNING, worker_id, now + lease_seconds, *kinds, STATUS_QUEUED, STATUS_RUNNING, now))
+        row = cursor.fetchone()
+        conn.commit()
+        return _job_from_row(row) if row else None
+
+
+def renew_lease(job_id: str, worker_id: str, lease_seconds: float) -> bool:
+    """
+    Продлить аренду; False - задачу уже забрал другой воркер
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE jobs SET lease_expires_at = ?
+            WHERE id = ? AND lease_owner = ? AND status = ?
+        """, (time.time() + lease_seconds, job_id, worker_id, STATUS_RUNNING))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def update_job_progress(job_id: str, worker_id: str, progress: Dict[str, Any]) -> bool:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE jobs SET progress = ?
+            WHERE id = ? AND lease_owner = ? AND status = ?
+        """, (json.dumps(progress, ensure_ascii=False), job_id, worker_id, STATUS_RUNNING))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def complete_job(job_id: str, worker_id: str, result: Dict[str, Any]) -> bool:
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE jobs
+            SET status = ?, result = ?, error = NULL, lease_owner = NULL,
+                finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND lease_owner = ?
+        """, (STATUS_SUCCEEDED, json.dumps(result, ensure_ascii=False), job_id, worker_id))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def fail_job(job_id: str, worker_id: str, error: str, retry: bool = True) -> bool:
+    """
+    Завершить попытку с ошибкой: задача возвращается в очередь, пока есть попытки
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE jobs
+            SET status = CASE WHEN ? AND attempts < max_attempts THEN ? ELSE ? END,
+                finished_at = CASE WHEN ? AND attempts < max_attempts THEN NULL ELSE CURRENT_TIMESTAMP END,
+                error = ?, lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND lease_owner = ?
+        """, (retry, STATUS_QUEUED, STATUS_FAILED, retry, error, job_id, worker_id))
+        conn.commit()
+        return cursor.rowcount > 0
+
+
+def release_job(job_id: str, worker_id: str) -> bool:
+    """
+    Вернуть задачу в очередь при остановке воркера, не тратя попытку
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE jobs
+            SET status = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = ? AND lease_owner = ? AND status = ?
+        """, (STATUS_QUEUED, job_id, worker_id, STATUS_RUNNING))
+        conn.commit()
+        return cursor.rowcount > 0
@@ -0,0 +1,216 @@
+import hashlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+from src.database.db import get_db_connection
+
+MIME_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "mp3": "audio/mpeg",
+    "json": "application/json",
+}
+
+# Время последнего обращения обновляется не чаще раза в час - для LRU этого
+# достаточно, а чтение файла не превращается в запись в БД
+TOUCH_INTERVAL = timedelta(hours=1)
+
+# Время последнего обращения (для файлов, к которым не обращались - время создания)
+_LAST_USED = "COALESCE(m.last_accessed_at, m.created_at)"
+
+
+def _checksum(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _media_from_row(row) -> Dict[str, Any]:
+    return {
+        'kind': row['kind'],
+        'filename': row['filename'],
+        'path': row['path'],
+        'owner_id': row['owner_id'],
+        'checksum': row['checksum'],
+        'size_bytes': row['size_bytes'],
+        'mime_type': row['mime_type'],
+        'provider': row['provider'],
+        'latency_ms': row['latency_ms'],
+        'created_at': row['created_at'],
+        'last_accessed_at': row['last_accessed_at']
+    }
+
+
+def record_media(
+    kind: str,
+    path: Path,
+    owner_id: Optional[str] = None,
+    provider: Optional[str] = None,
+    latency_ms: Optional[int] = None,
+    filename: Optional[str] = None,
+    created_at: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Записать сгенерированный файл в каталог медиа
+    Размер и контрольная сумма берутся с диска. Файл хранилища может быть общим
+    для нескольких пользователей - владельцем остается тот, кто создал его первым
+    
+    created_at (UTC) задается для файлов, созданных раньше записи в каталог
+    """
+    path = Path(path)
+    filename = filename or path.name
+    ext = path.suffix.lstrip(".").lower()
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR IGNORE INTO media (
+                kind, filename, path, owner_id, checksum, size_bytes,
+                mime_type, provider, latency_ms, created_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+        """, (
+            kind,
+            filename,
+            str(path),
+            owner_id,
+            _checksum(path),
+            path.stat().st_size,
+            MIME_TYPES.get(ext, "application/octet-stream"),
+            provider,
+            latency_ms,
+            created_at.strftime("%Y-%m-%d %H:%M:%S") if created_at else None
+        ))
+        conn.commit()
+
+        cursor.execute("SELECT * FROM media WHERE kind = ? AND filename = ?", (kind, filename))
+        return _media_from_row(cursor.fetchone())
+
+
+def get_media(kind: str, filename: str) -> Optional[Dict[str, Any]]:
+    """
+    Получить запись каталога по публичному имени файла (поиск по первичному ключу)
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM media WHERE kind = ? AND filename = ?", (kind, filename))
+        row = cursor.fetchone()
+        return _media_from_row(row) if row else None
+
+
+def is_touch_due(media: Dict[str, Any]) -> bool:
+    last_used = media.get('last_accessed_at') or media['created_at']
+    try:
+        last_used_at = datetime.strptime(last_used, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return True
+    return datetime.utcnow() - last_used_at > TOUCH_INTERVAL
+
+
+def touch_media(kind: str, filename: str) -> None:
+    """Отметить обращение к файлу (для вытеснения давно не используемых)"""
+    with get_db_connection() as conn:
+        conn.execute(
+            "UPDATE media SET last_accessed_at = CURRENT_TIMESTAMP WHERE kind = ? AND filename = ?",
+            (kind, filename)
+        )
+        conn.commit()
+
+
+def add_media_refs(parent_kind: str, parent_filename: str, refs: List[Tuple[str, str]]) -> None:
+    """
+    Запомнить, что файл (JSON окружений) ссылается на медиа файлы -
+    пока он существует, они не удаляются сборщиком
+    """
+    with get_db_connection() as conn:
+        conn.executemany("""
+            INSERT OR IGNORE INTO media_refs (parent_kind, parent_filename, kind, filename)
+            VALUES (?, ?, ?, ?)
+        """, [(parent_kind, parent_filename, kind, filename) for kind, filename in refs])
+        conn.commit()
+
+
+def delete_media(kind: str, filename: str) -> bool:
+    """Удалить запись каталога и ссылки из этого файла на другие"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM media WHERE kind = ? AND filename = ?", (kind, filename))
+        deleted = cursor.rowcount > 0
+        cursor.execute(
+            "DELETE FROM media_refs WHERE parent_kind = ? AND parent_filename = ?",
+            (kind, filename)
+        )
+        conn.commit()
+        return deleted
+
+
+def get_media_page(after: Optional[Tuple[str, str]] = None, limit: int = 200) -> List[Dict[str, Any]]:
+    """Страница каталога в порядке первичного ключа (для обхода по частям)"""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if after is None:
+            cursor.execute("SELECT * FROM media ORDER BY kind, filename LIMIT ?", (limit,))
+        else:
+            cursor.execute("""
+                SELECT * FROM media
+                WHERE kind > ? OR (kind = ? AND filename > ?)
+                ORDER BY kind, filename
+                LIMIT ?
+            """, (after[0], after[0], after[1], limit))
+        return [_media_from_row(row) for row in cursor.fetchall()]
+
+
+def get_total_media_bytes() -> int:
+    with get_db_connection() as conn:
+        return conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM media").fetchone()[0]
+
+
+def get_owners_over_quota(quota_bytes: int) -> List[Tuple[str, int]]:
+    """(owner_id, занято байт) для пользователей, превысивших квоту"""
+    with get_db_connection() as conn:
+        rows = conn.execute("""
+            SELECT owner_id, SUM(size_bytes) AS total
+            FROM media
+            WHERE owner_id IS NOT NULL
+            GROUP BY owner_id
+            HAVING total > ?
+            ORDER BY total DESC
+        """, (quota_bytes,)).fetchall()
+        return [(row['owner_id'], row['total']) for row in rows]
+
+
+def get_eviction_candidates(
+    owner_id: Optional[str] = None,
+    min_age_seconds: int = 3600,
+    limit: int = 200,
+    protected_kinds: Tuple[str, ...] = (),
+) -> List[Dict[str, Any]]:
+    """
+    Давно не использованные файлы, на которые не ссылается ни один JSON окружений,
+    от самых старых по последнему обращению. Файлы protected_kinds не удаляются никогда
+    """
+    where = [
+        f"{_LAST_USED} < datetime('now', ?)",
+        """NOT EXISTS (
+            SELECT 1 FROM media_refs r
+            WHERE r.kind = m.kind AND r.filename = m.filename
+        )""",
+    ]
+    params: list = [f"-{int(min_age_seconds)} seconds"]
+    if protected_kinds:
+        where.append(f"m.kind NOT IN ({', '.join('?' * len(protected_kinds))})")
+        params.extend(protected_kinds)
+    if owner_id is not None:
+        where.append("m.owner_id = ?")
+        params.append(owner_id)
+
+    with get_db_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT m.* FROM media m
+            WHERE {" AND ".join(where)}
+            ORDER BY {_LAST_USED}
+            LIMIT ?
+        """, (*params, limit)).fetchall()
+        return [_media_from_row(row) for row in rows]
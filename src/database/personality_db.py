@@ -4,6 +4,7 @@ import uuid
 import json
 from datetime import datetime
 from src.database.db import get_db_connection
+from src.database.profile_cache import profile_cache
 
 
 def save_personality_result(user_id: str, result: dict) -> dict:
@@ -35,6 +36,7 @@ def save_personality_result(user_id: str, result: dict) -> dict:
             )
         )
         conn.commit()
+        profile_cache.invalidate(user_id)
 
         return {
             "id": result_id,
@@ -82,7 +84,33 @@ def get_user_personality_results(user_id: str) -> list:
         return results
 
 
+def personality_result_from_row(row, user_id: str) -> dict:
+    """Строка personality_results (sqlite3.Row или dict с теми же ключами) в словарь результата"""
+    return {
+        "id": row["id"],
+        "user_id": user_id,
+        "personality_type": row["personality_type"],
+        "code": row["code"],
+        "mind_score": row["mind_score"],
+        "energy_score": row["energy_score"],
+        "nature_score": row["nature_score"],
+        "tactics_score": row["tactics_score"],
+        "identity_score": row["identity_score"],
+        "description": row["description"],
+        "full_description": row["full_description"],
+        "strengths": row["strengths"],
+        "weaknesses": row["weaknesses"],
+        "career_advice": row["career_advice"],
+        "careers": json.loads(row["careers"]),
+        "created_at": row["created_at"]
+    }
+
+
 def get_latest_personality_result(user_id: str) -> dict | None:
+    found, cached = profile_cache.peek(user_id, "personality_result")
+    if found:
+        return cached
+
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute(
@@ -99,24 +127,7 @@ def get_latest_personality_result(user_id: str) -> dict | None:
         row = cursor.fetchone()
 
         if row:
-            return {
-                "id": row["id"],
-                "user_id": user_id,
-                "personality_type": row["personality_type"],
-                "code": row["code"],
-                "mind_score": row["mind_score"],
-                "energy_score": row["energy_score"],
-                "nature_score": row["nature_score"],
-                "tactics_score": row["tactics_score"],
-                "identity_score": row["identity_score"],
-                "description": row["description"],
-                "full_description": row["full_description"],
-                "strengths": row["strengths"],
-                "weaknesses": row["weaknesses"],
-                "career_advice": row["career_advice"],
-                "careers": json.loads(row["careers"]),
-                "created_at": row["created_at"]
-            }
+            return personality_result_from_row(row, user_id)
         return None
 
 
@@ -128,6 +139,7 @@ def delete_personality_result(user_id: str, result_id: str) -> bool:
             (user_id, result_id)
         )
         conn.commit()
+        profile_cache.invalidate(user_id)
         return cursor.rowcount > 0
 
 
@@ -136,4 +148,5 @@ def delete_all_personality_results(user_id: str) -> bool:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM personality_results WHERE user_id = ?", (user_id,))
         conn.commit()
+        profile_cache.invalidate(user_id)
         return cursor.rowcount > 0
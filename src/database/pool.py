@@ -0,0 +1,180 @@
+"""
+ConnectionPool - пул долгоживущих SQLite соединений
+
+Раньше get_db_connection открывал новое соединение на каждый запрос к БД
+(а /vibe/generate делает их несколько), с журналом rollback, при котором
+чтения блокируются на время записи roadmap. Пул:
+- держит до DB_POOL_SIZE соединений и раздает их по одному потоку за раз
+- включает WAL (читатели не ждут писателя), synchronous=NORMAL, mmap,
+  увеличенный page cache и кэш подготовленных выражений
+- откатывает незакоммиченную транзакцию при возврате соединения, как это
+  делало закрытие соединения раньше
+- считает время ожидания свободного соединения (см. /metrics)
+
+Использование:
+    with db_pool.connection() as conn:
+        conn.execute(...)
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Свободное соединение не появилось за DB_POOL_TIMEOUT секунд"""
+
+
+class ConnectionPool:
+    """Bounded pool of tuned SQLite connections shared across threads"""
+
+    def __init__(
+        self,
+        path: str,
+        size: int = 8,
+        timeout: float = 10.0,
+        busy_timeout_ms: int = 5000,
+        cache_size_kb: int = 20000,
+        mmap_size: int = 268435456,
+        statement_cache: int = 256,
+    ):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.statement_cache = statement_cache
+
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        self.acquisitions = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.statement_cache,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA cache_size={-int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._all) < self.size:
+                conn = self._connect()
+                self._all.append(conn)
+                return conn
+
+        # Все соединения заняты - ждем возврата
+        self.waits += 1
+        started = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            self.timeouts += 1
+            raise PoolTimeoutError(f"No free database connection within {self.timeout:.0f}s")
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn not in self._all:
+            # Пул закрыт, пока соединение было занято
+            conn.close()
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            # Соединение в неизвестном состоянии - заменяем новым при следующем запросе
+            logger.warning(f"Dropping broken database connection: {str(e)}")
+            self._discard(conn)
+            return
+        self._idle.put(conn)
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        self.acquisitions += 1
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self) -> None:
+        """Close idle connections; connections in use are closed when returned"""
+        with self._lock:
+            self._all.clear()
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        total = len(self._all)
+        idle = self._idle.qsize()
+        return {
+            "size": self.size,
+            "open": total,
+            "idle": idle,
+            "in_use": total - idle,
+            "acquisitions": self.acquisitions,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "wait_time_total": round(self.wait_time_total, 4),
+            "wait_time_avg": round(self.wait_time_total / self.waits, 4) if self.waits else 0.0,
+            "wait_time_max": round(self.wait_time_max, 4),
+        }
+
+
+db_pool = ConnectionPool(
+    settings.DATABASE_PATH,
+    size=settings.DB_POOL_SIZE,
+    timeout=settings.DB_POOL_TIMEOUT,
+    cache_size_kb=settings.DB_CACHE_SIZE_KB,
+    mmap_size=settings.DB_MMAP_SIZE,
+    statement_cache=settings.DB_STATEMENT_CACHE,
+)
@@ -0,0 +1,147 @@
+"""
+ProfileCache - кэш профилей пользователей в памяти процесса
+
+Результат теста личности и астрологический профиль меняются редко (только
+/personality/submit и /astrology/profile POST/DELETE), а читаются на каждом
+vibe и roadmap запросе. Кэш хранит снимок {"user", "personality_result",
+"astro_profile"} по user_id (LRU, ограниченный размер) и сбрасывается функциями
+записи в personality_db и astro_db.
+
+Чтобы чтение, начатое до записи, не положило в кэш устаревший снимок, читатель
+берет токен до запроса к БД (begin), а put сохраняет снимок, только если с тех
+пор не было ни одной инвалидации.
+
+TTL ограничивает устаревание при записи из другого процесса (несколько
+воркеров, скрипты) - инвалидация работает только внутри процесса.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from src.config import settings
+
+
+class ProfileCache:
+    """Bounded LRU of per-user profile snapshots with write-through invalidation"""
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._user_ids: Dict[str, str] = {}  # username -> user_id
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def begin(self) -> int:
+        """Token to pass to put() after reading the snapshot from the database"""
+        return self._writes
+
+    def _get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        stored_at, snapshot = entry
+        if time.monotonic() - stored_at > self.ttl:
+            self._drop(user_id)
+            return None
+        self._entries.move_to_end(user_id)
+        return snapshot
+
+    def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Copy of the cached snapshot for user_id, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            snapshot = self._get(user_id)
+            if snapshot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(snapshot)
+
+    def get_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            user_id = self._user_ids.get(username)
+            snapshot = self._get(user_id) if user_id is not None else None
+            if snapshot is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(snapshot)
+
+    def peek(self, user_id: str, field: str) -> Tuple[bool, Any]:
+        """
+        (found, copy of one snapshot field) without touching hit-rate metrics;
+        used by the single-field getters in personality_db/astro_db
+        """
+        if not self.enabled:
+            return False, None
+        with self._lock:
+            snapshot = self._get(user_id)
+            if snapshot is None:
+                return False, None
+            return True, copy.deepcopy(snapshot[field])
+
+    def put(self, snapshot: Dict[str, Any], token: int) -> None:
+        if not self.enabled:
+            return
+        user = snapshot["user"]
+        with self._lock:
+            if token != self._writes:
+                # Пока читали из БД, профиль кого-то поменялся - снимок может быть устаревшим
+                return
+            self._entries[user["id"]] = (time.monotonic(), copy.deepcopy(snapshot))
+            self._entries.move_to_end(user["id"])
+            self._user_ids[user["username"]] = user["id"]
+            while len(self._entries) > self.max_entries:
+                oldest_id, (_, oldest) = self._entries.popitem(last=False)
+                self._user_ids.pop(oldest["user"]["username"], None)
+
+    def _drop(self, user_id: str) -> None:
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._user_ids.pop(entry[1]["user"]["username"], None)
+
+    def invalidate(self, user_id: str) -> None:
+        """Called by every write to personality_results / astro_profiles"""
+        with self._lock:
+            self._writes += 1
+            self.invalidations += 1
+            self._drop(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._writes += 1
+            self._entries.clear()
+            self._user_ids.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+profile_cache = ProfileCache(
+    max_entries=settings.PROFILE_CACHE_MAX_ENTRIES,
+    ttl=settings.PROFILE_CACHE_TTL,
+)
@@ -0,0 +1,166 @@
+"""
+RoadmapCodec - сжатие roadmap_data со словарем, обученным на сохраненных roadmaps
+
+Все roadmaps имеют одну и ту же JSON структуру (overview, stages, skills,
+tools, projects, interviewQuestions), поэтому большая часть 30-60 KB текста -
+повторяющиеся ключи и типовые фразы. zlib с заранее заданным словарем (zdict)
+сжимает уже начало документа, а не только повторы внутри него.
+
+Формат значения в roadmaps.roadmap_data:
+    str (TEXT)                          - старый несжатый JSON
+    bytes: 0x01 | dict_id (4 байта BE) | поток zlib
+dict_id = 0 - без словаря (словарь еще не обучен), иначе id строки в compression_dicts.
+
+Старые строки и строки со старым словарем перепаковываются при чтении
+(см. roadmap_db), отдельная миграция не нужна. Словарь обучает
+train_roadmap_dict.py; сервер переходит на новый словарь, как только встретит
+строку, упакованную им, или при следующем старте. Строка никогда не
+перепаковывается более старым словарем.
+"""
+import json
+import re
+import sqlite3
+import struct
+import threading
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Union
+
+from src.config import settings
+
+FORMAT_ZLIB = 0x01
+DICT_NAME = "roadmap"
+# Окно deflate - 32 KB, байты словаря дальше этого расстояния не используются
+MAX_DICT_SIZE = 32 * 1024
+
+_HEADER = struct.Struct(">BI")
+
+# Токены JSON: строки, числа/литералы, структурные символы
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[^",:\[\]{}\s]+|[",:\[\]{}]')
+
+
+def dumps(roadmap_data: Dict[str, Any]) -> bytes:
+    """Compact serialization used both for storage and for dictionary training"""
+    return json.dumps(roadmap_data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = MAX_DICT_SIZE, max_ngram: int = 6) -> bytes:
+    """
+    Build a zlib preset dictionary from sample documents
+
+    Counts token n-grams by the number of documents they occur in and keeps the
+    ones shared by at least two samples, weighted by length. The most valuable
+    fragments go last: deflate encodes nearer matches with fewer bits.
+    """
+    document_frequency: Counter = Counter()
+    for sample in samples:
+        tokens = _TOKEN_RE.findall(sample.decode("utf-8"))
+        grams = set()
+        for n in range(1, max_ngram + 1):
+            for i in range(len(tokens) - n + 1):
+                gram = "".join(tokens[i:i + n])
+                if len(gram) >= 4:
+                    grams.add(gram)
+        document_frequency.update(grams)
+
+    scored = sorted(
+        ((count * len(gram.encode("utf-8")), gram) for gram, count in document_frequency.items() if count > 1),
+        reverse=True,
+    )
+
+    chosen = []
+    total = 0
+    for _, gram in scored:
+        encoded = gram.encode("utf-8")
+        if total + len(encoded) > size:
+            continue
+        # Фрагмент, уже входящий в выбранный, ничего не добавляет
+        if any(gram in other for other in chosen):
+            continue
+        chosen.append(gram)
+        total += len(encoded)
+        if total >= size:
+            break
+
+    return "".join(reversed(chosen)).encode("utf-8")
+
+
+class RoadmapCodec:
+    """Encodes roadmap JSON into versioned zlib blobs with a shared dictionary"""
+
+    def __init__(self, level: int = 6):
+        self.level = level
+        self._dicts: Dict[int, bytes] = {0: b""}
+        self._current_id: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _load_current(self, conn: sqlite3.Connection) -> int:
+        if self._current_id is None:
+            row = conn.execute(
+                "SELECT id, data FROM compression_dicts WHERE name = ? ORDER BY id DESC LIMIT 1",
+                (DICT_NAME,)
+            ).fetchone()
+            with self._lock:
+                if row is None:
+                    self._current_id = 0
+                else:
+                    self._dicts[row["id"]] = bytes(row["data"])
+                    self._current_id = row["id"]
+        return self._current_id
+
+    def _dictionary(self, conn: sqlite3.Connection, dict_id: int) -> bytes:
+        zdict = self._dicts.get(dict_id)
+        if zdict is None:
+            row = conn.execute("SELECT data FROM compression_dicts WHERE id = ?", (dict_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Unknown compression dictionary {dict_id}")
+            zdict = bytes(row["data"])
+            with self._lock:
+                self._dicts[dict_id] = zdict
+        return zdict
+
+    def pack(self, conn: sqlite3.Connection, data: bytes) -> bytes:
+        """Compress serialized roadmap JSON with the current dictionary"""
+        dict_id = self._load_current(conn)
+        zdict = self._dicts[dict_id]
+        compressor = zlib.compressobj(self.level, zdict=zdict) if zdict else zlib.compressobj(self.level)
+        return _HEADER.pack(FORMAT_ZLIB, dict_id) + compressor.compress(data) + compressor.flush()
+
+    def unpack(self, conn: sqlite3.Connection, value: Union[str, bytes]) -> bytes:
+        """Stored value back to serialized JSON, without parsing it"""
+        if isinstance(value, str):
+            return value.encode("utf-8")
+
+        version, dict_id = _HEADER.unpack_from(value)
+        if version != FORMAT_ZLIB:
+            raise ValueError(f"Unsupported roadmap format {version}")
+        zdict = self._dictionary(conn, dict_id)
+        decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        return decompressor.decompress(value[_HEADER.size:]) + decompressor.flush()
+
+    def encode(self, conn: sqlite3.Connection, roadmap_data: Dict[str, Any]) -> bytes:
+        return self.pack(conn, dumps(roadmap_data))
+
+    def decode(self, conn: sqlite3.Connection, value: Union[str, bytes]) -> Dict[str, Any]:
+        return json.loads(self.unpack(conn, value))
+
+    def needs_migration(self, conn: sqlite3.Connection, value: Union[str, bytes]) -> bool:
+        """Legacy text or a blob packed with an older dictionary than the current one"""
+        if isinstance(value, str):
+            return True
+        _, dict_id = _HEADER.unpack_from(value)
+        current = self._load_current(conn)
+        if dict_id > current:
+            # Словарь обучен после запуска процесса (train_roadmap_dict.py) -
+            # переходим на него, а не перепаковываем строку обратно в старый
+            self.reset()
+            current = self._load_current(conn)
+        return dict_id < current
+
+    def reset(self) -> None:
+        """Forget the current dictionary so the next encode reloads it"""
+        with self._lock:
+            self._current_id = None
+
+
+roadmap_codec = RoadmapCodec(level=settings.ROADMAP_COMPRESSION_LEVEL)
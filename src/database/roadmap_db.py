@@ -1,9 +1,118 @@
 import sqlite3
 import uuid
 import json
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+import base64
+import gzip
+import zlib
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Tuple
+from src.config import settings
 from src.database.db import get_db_connection
+from src.database.roadmap_codec import roadmap_codec
+
+HEADLINE_MAX_LENGTH = 160
+
+# Колонки для списка roadmaps - без тяжелого roadmap_data
+_SUMMARY_COLUMNS = "id, profession_title, profession, stage_count, overview_headline, created_at, updated_at"
+
+
+def roadmap_summary(roadmap_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Краткие поля roadmap для списка: профессия, число этапов и первое
+    предложение обзора. Хранятся в отдельных колонках, чтобы список не читал JSON
+    """
+    overview = roadmap_data.get("overview") or {}
+    description = (overview.get("description") or "").strip()
+    headline = description.split(". ", 1)[0]
+    if len(headline) > HEADLINE_MAX_LENGTH:
+        headline = headline[:HEADLINE_MAX_LENGTH - 1].rstrip() + "…"
+    return {
+        "profession": roadmap_data.get("profession"),
+        "stage_count": len(roadmap_data.get("stages") or []),
+        "overview_headline": headline or None,
+    }
+
+
+def backfill_roadmap_summaries(conn: sqlite3.Connection) -> int:
+    """Заполнить краткие поля у roadmaps, сохраненных до появления колонок"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, roadmap_data FROM roadmaps WHERE stage_count IS NULL")
+    rows = cursor.fetchall()
+    for row in rows:
+        try:
+            summary = roadmap_summary(roadmap_codec.decode(conn, row["roadmap_data"]))
+        except (ValueError, AttributeError, zlib.error):
+            summary = {"profession": None, "stage_count": 0, "overview_headline": None}
+        cursor.execute("""
+            UPDATE roadmaps
+            SET profession = ?, stage_count = ?, overview_headline = ?
+            WHERE id = ?
+        """, (summary["profession"], summary["stage_count"], summary["overview_headline"], row["id"]))
+    conn.commit()
+    return len(rows)
+
+
+def _encode_cursor(updated_at: str, roadmap_id: str) -> str:
+    raw = json.dumps([updated_at, roadmap_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, roadmap_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(updated_at, str) or not isinstance(roadmap_id, str):
+        raise ValueError("Invalid cursor")
+    return updated_at, roadmap_id
+
+
+def _summary_from_row(row) -> Dict[str, Any]:
+    return {
+        'id': row['id'],
+        'profession_title': row['profession_title'],
+        'profession': row['profession'],
+        'stage_count': row['stage_count'],
+        'overview_headline': row['overview_headline'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at']
+    }
+
+
+def _response_body(roadmap_id: str, profession_title: str, roadmap_json: bytes,
+                   created_at: str, updated_at: str) -> bytes:
+    """
+    Ответ /roadmap/saved/*: сохраненный JSON roadmap вставляется в обертку
+    как есть, без разбора и повторной сериализации
+    """
+    head = json.dumps({'id': roadmap_id, 'profession_title': profession_title},
+                      ensure_ascii=False, separators=(",", ":"))
+    tail = json.dumps({'created_at': created_at, 'updated_at': updated_at},
+                      ensure_ascii=False, separators=(",", ":"))
+    return head[:-1].encode("utf-8") + b',"roadmap":' + roadmap_json + b"," + tail[1:].encode("utf-8")
+
+
+def _load_roadmap_json(conn: sqlite3.Connection, roadmap_id: str, value) -> bytes:
+    """
+    Распаковать roadmap_data в JSON; несжатые строки и строки со старым словарем
+    перепаковываются на месте (ленивая миграция формата)
+    """
+    roadmap_json = roadmap_codec.unpack(conn, value)
+    if roadmap_codec.needs_migration(conn, value):
+        packed = (roadmap_codec.encode(conn, json.loads(roadmap_json)) if isinstance(value, str)
+                  else roadmap_codec.pack(conn, roadmap_json))
+        # Условие на старое значение - чтобы не затереть параллельное сохранение
+        conn.execute(
+            "UPDATE roadmaps SET roadmap_data = ? WHERE id = ? AND roadmap_data = ?",
+            (packed, roadmap_id, value)
+        )
+        conn.commit()
+    return roadmap_json
+
+
+def _load_roadmap_data(conn: sqlite3.Connection, roadmap_id: str, value) -> Dict[str, Any]:
+    return json.loads(_load_roadmap_json(conn, roadmap_id, value))
 
 
 def save_roadmap(user_id: str, profession_title: str, roadmap_data: Dict[str, Any]) -> str:
@@ -11,12 +120,18 @@ def save_roadmap(user_id: str, profession_title: str, roadmap_data: Dict[str, An
     Сохранить roadmap для пользователя
     Если roadmap для этой профессии уже существует - обновляет его
     """
+    summary = roadmap_summary(roadmap_data)
+    # updated_at задаем явно - по нему идет сортировка и курсор списка. Формат
+    # как у CURRENT_TIMESTAMP (UTC, через пробел) плюс миллисекунды, чтобы
+    # строки сравнивались в хронологическом порядке
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
         # Проверяем есть ли уже roadmap для этой профессии
         cursor.execute("""
-            SELECT id FROM roadmaps 
+            SELECT id, created_at FROM roadmaps 
             WHERE user_id = ? AND profession_title = ?
         """, (user_id, profession_title))
         
@@ -27,24 +142,36 @@ def save_roadmap(user_id: str, profession_title: str, roadmap_data: Dict[str, An
             roadmap_id = existing['id']
             cursor.execute("""
                 UPDATE roadmaps 
-                SET roadmap_data = ?, updated_at = ?
+                SET roadmap_data = ?, profession = ?, stage_count = ?,
+                    overview_headline = ?, updated_at = ?
                 WHERE id = ?
             """, (
-                json.dumps(roadmap_data, ensure_ascii=False),
-                datetime.now().isoformat(),
+                roadmap_codec.encode(conn, roadmap_data),
+                summary["profession"],
+                summary["stage_count"],
+                summary["overview_headline"],
+                now,
                 roadmap_id
             ))
         else:
             # Создаем новый
             roadmap_id = str(uuid.uuid4())
             cursor.execute("""
-                INSERT INTO roadmaps (id, user_id, profession_title, roadmap_data)
-                VALUES (?, ?, ?, ?)
+                INSERT INTO roadmaps (
+                    id, user_id, profession_title, roadmap_data, profession,
+                    stage_count, overview_headline, created_at, updated_at
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 roadmap_id,
                 user_id,
                 profession_title,
-                json.dumps(roadmap_data, ensure_ascii=False)
+                roadmap_codec.encode(conn, roadmap_data),
+                summary["profession"],
+                summary["stage_count"],
+                summary["overview_headline"],
+                now,
+                now
             ))
         
         conn.commit()
@@ -72,7 +199,7 @@ def get_roadmap(user_id: str, profession_title: str) -> Optional[Dict[str, Any]]
             return {
                 'id': row['id'],
                 'profession_title': row['profession_title'],
-                'roadmap': json.loads(row['roadmap_data']),
+                'roadmap': _load_roadmap_data(conn, row['id'], row['roadmap_data']),
                 'created_at': row['created_at'],
                 'updated_at': row['updated_at']
             }
@@ -80,9 +207,9 @@ def get_roadmap(user_id: str, profession_title: str) -> Optional[Dict[str, Any]]
         return None
 
 
-def get_user_roadmaps(user_id: str) -> List[Dict[str, Any]]:
+def get_roadmap_by_id(roadmap_id: str, user_id: str) -> Optional[Dict[str, Any]]:
     """
-    Получить все roadmaps пользователя
+    Получить полный roadmap по ID (с проверкой что он принадлежит пользователю)
     """
     with get_db_connection() as conn:
         cursor = conn.cursor()
@@ -90,22 +217,120 @@ def get_user_roadmaps(user_id: str) -> List[Dict[str, Any]]:
         cursor.execute("""
             SELECT id, profession_title, roadmap_data, created_at, updated_at
             FROM roadmaps 
-            WHERE user_id = ?
-            ORDER BY updated_at DESC
-        """, (user_id,))
+            WHERE id = ? AND user_id = ?
+        """, (roadmap_id, user_id))
         
-        rows = cursor.fetchall()
+        row = cursor.fetchone()
         
-        return [
-            {
+        if row:
+            return {
                 'id': row['id'],
                 'profession_title': row['profession_title'],
-                'roadmap': json.loads(row['roadmap_data']),
+                'roadmap': _load_roadmap_data(conn, row['id'], row['roadmap_data']),
                 'created_at': row['created_at'],
                 'updated_at': row['updated_at']
             }
-            for row in rows
-        ]
+        
+        return None
+
+
+def _saved_response(conn: sqlite3.Connection, where: str, params: tuple, compress: bool) -> Optional[bytes]:
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT id, profession_title, roadmap_data, created_at, updated_at
+        FROM roadmaps WHERE {where}
+    """, params)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    body = _response_body(
+        row['id'],
+        row['profession_title'],
+        _load_roadmap_json(conn, row['id'], row['roadmap_data']),
+        row['created_at'],
+        row['updated_at']
+    )
+    if compress:
+        body = gzip.compress(body, compresslevel=settings.ROADMAP_COMPRESSION_LEVEL, mtime=0)
+    return body
+
+
+def get_roadmap_response(user_id: str, profession_title: str, compress: bool = False) -> Optional[bytes]:
+    """
+    Ответ get_roadmap в виде готового JSON (с compress - сжатого gzip)
+    без разбора и сериализации roadmap
+    """
+    with get_db_connection() as conn:
+        return _saved_response(
+            conn,
+            "user_id = ? AND profession_title = ? ORDER BY updated_at DESC LIMIT 1",
+            (user_id, profession_title),
+            compress
+        )
+
+
+def get_roadmap_response_by_id(roadmap_id: str, user_id: str, compress: bool = False) -> Optional[bytes]:
+    """
+    Ответ get_roadmap_by_id в виде готового JSON (с compress - сжатого gzip)
+    """
+    with get_db_connection() as conn:
+        return _saved_response(conn, "id = ? AND user_id = ?", (roadmap_id, user_id), compress)
+
+
+def get_user_roadmaps(user_id: str, limit: int = 20, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Получить страницу кратких описаний roadmaps пользователя (без roadmap_data),
+    новые первыми. Полный roadmap загружается отдельно через get_roadmap_by_id
+    
+    Args:
+        cursor: next_cursor предыдущей страницы (keyset по updated_at, id)
+    
+    Returns:
+        dict: {"roadmaps": [...], "next_cursor": str | None, "total_count": int}
+    
+    Raises:
+        ValueError: если cursor поврежден
+    """
+    after = _decode_cursor(cursor) if cursor else None
+    
+    with get_db_connection() as conn:
+        db_cursor = conn.cursor()
+        
+        if after is None:
+            db_cursor.execute(f"""
+                SELECT {_SUMMARY_COLUMNS}
+                FROM roadmaps 
+                WHERE user_id = ?
+                ORDER BY updated_at DESC, id DESC
+                LIMIT ?
+            """, (user_id, limit + 1))
+        else:
+            updated_at, roadmap_id = after
+            db_cursor.execute(f"""
+                SELECT {_SUMMARY_COLUMNS}
+                FROM roadmaps 
+                WHERE user_id = ?
+                  AND (updated_at < ? OR (updated_at = ? AND id < ?))
+                ORDER BY updated_at DESC, id DESC
+                LIMIT ?
+            """, (user_id, updated_at, updated_at, roadmap_id, limit + 1))
+        
+        rows = db_cursor.fetchall()
+        
+        db_cursor.execute("SELECT COUNT(*) FROM roadmaps WHERE user_id = ?", (user_id,))
+        total_count = db_cursor.fetchone()[0]
+    
+    # Лишняя строка только показывает, что есть следующая страница
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1]['updated_at'], rows[-1]['id']) if has_more else None
+    
+    return {
+        "roadmaps": [_summary_from_row(row) for row in rows],
+        "next_cursor": next_cursor,
+        "total_count": total_count
+    }
 
 
 def delete_roadmap(roadmap_id: str, user_id: str) -> bool:
@@ -0,0 +1,83 @@
+from typing import Any, Dict, Optional
+from src.database.db import get_db_connection
+from src.database.personality_db import personality_result_from_row
+from src.database.astro_db import astro_profile_from_row
+from src.database.profile_cache import profile_cache
+
+_PERSONALITY_COLUMNS = (
+    "id", "personality_type", "code", "mind_score", "energy_score",
+    "nature_score", "tactics_score", "identity_score", "description",
+    "full_description", "strengths", "weaknesses", "career_advice",
+    "careers", "created_at",
+)
+
+_ASTRO_COLUMNS = (
+    "id", "birth_date", "birth_time", "birth_city", "birth_country",
+    "zodiac_sign", "zodiac_element", "zodiac_quality", "chinese_zodiac",
+    "life_path_number", "soul_number", "personality_traits",
+    "career_recommendations", "strengths", "challenges",
+    "compatibility_signs", "created_at", "updated_at",
+)
+
+_USER_CONTEXT_QUERY = f"""
+    SELECT u.id AS user_id, u.username, u.created_at AS user_created_at,
+           {", ".join(f"p.{c} AS p_{c}" for c in _PERSONALITY_COLUMNS)},
+           {", ".join(f"a.{c} AS a_{c}" for c in _ASTRO_COLUMNS)}
+    FROM users u
+    LEFT JOIN personality_results p ON p.id = (
+        SELECT id FROM personality_results
+        WHERE user_id = u.id
+        ORDER BY created_at DESC
+        LIMIT 1
+    )
+    LEFT JOIN astro_profiles a ON a.user_id = u.id
+    WHERE u.username = ?
+"""
+
+
+def _columns(row, prefix: str) -> Dict[str, Any]:
+    return {key[len(prefix):]: row[key] for key in row.keys() if key.startswith(prefix)}
+
+
+def get_user_context(username: str) -> Optional[Dict[str, Any]]:
+    """
+    Пользователь, его последний результат теста личности и астрологический профиль
+    одним запросом (вместо get_user_by_username + get_latest_personality_result + get_astro_profile)
+
+    Снимок кэшируется в profile_cache до ближайшей записи профиля пользователя.
+
+    Returns:
+        dict | None: {"user", "personality_result", "astro_profile"} или None, если пользователя нет
+    """
+    cached = profile_cache.get_by_username(username)
+    if cached is not None:
+        return cached
+
+    token = profile_cache.begin()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(_USER_CONTEXT_QUERY, (username,))
+        row = cursor.fetchone()
+
+        if row is None:
+            return None
+
+        user_id = row["user_id"]
+        context = {
+            "user": {
+                "id": user_id,
+                "username": row["username"],
+                "created_at": row["user_created_at"],
+            },
+            "personality_result": (
+                personality_result_from_row(_columns(row, "p_"), user_id)
+                if row["p_id"] is not None else None
+            ),
+            "astro_profile": (
+                astro_profile_from_row(_columns(row, "a_"), user_id)
+                if row["a_id"] is not None else None
+            ),
+        }
+
+    profile_cache.put(context, token)
+    return context
@@ -7,12 +7,14 @@ class SoundGenerationRequest(BaseModel):
     duration_seconds: Optional[float] = Field(5.0, ge=0.5, le=22.0, description="Длительность в секундах")
     prompt_influence: Optional[float] = Field(None, ge=0.0, le=1.0, description="Влияние промпта (0.0-1.0)")
     loop: Optional[bool] = Field(False, description="Должен ли звук зацикливаться")
+    stream: Optional[bool] = Field(False, description="Отдавать аудио потоком по мере генерации")
 
 
 class TextToSpeechRequest(BaseModel):
     text: str = Field(..., description="Текст для озвучивания")
     voice_id: Optional[str] = Field("JBFqnCBsd6RMkjVDRZzb", description="ID голоса")
     model_id: Optional[str] = Field("eleven_multilingual_v2", description="ID модели")
+    stream: Optional[bool] = Field(False, description="Отдавать аудио потоком по мере генерации")
 
 
 class AudioResponse(BaseModel):
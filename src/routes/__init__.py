@@ -5,5 +5,6 @@ from .vibe_routes import router as vibe_router
 from .audio_routes import router as audio_router
 from .image_routes import router as image_router
 from .roadmap_routes import router as roadmap_router
+from .jobs_routes import router as jobs_router
 
-__all__ = ["auth_router", "personality_router", "astro_router", "vibe_router", "audio_router", "image_router", "roadmap_router"]
+__all__ = ["auth_router", "personality_router", "astro_router", "vibe_router", "audio_router", "image_router", "roadmap_router", "jobs_router"]
@@ -1,38 +1,22 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from src.models.astro_model import BirthDataInput, AstroProfile
 from src.utils.astrology import create_astro_profile
-from src.utils.auth import verify_token
-from src.database.db import get_user_by_username
-from src.database.astro_db import save_astro_profile, get_astro_profile, delete_astro_profile
+from src.routes.deps import get_current_user_id
+from src.database.async_db import (
+    save_astro_profile,
+    get_astro_profile,
+    delete_astro_profile,
+)
 
 router = APIRouter(prefix="/astrology", tags=["Astrology"])
-security = HTTPBearer()
 
 
 @router.post("/profile", response_model=AstroProfile)
 async def create_or_update_astro_profile(
     birth_data: BirthDataInput,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
     try:
         profile_data = create_astro_profile(
             birth_data.birth_date,
@@ -46,7 +30,7 @@ async def create_or_update_astro_profile(
             detail=str(e)
         )
     
-    saved_profile = save_astro_profile(user["id"], profile_data)
+    saved_profile = await save_astro_profile(user_id, profile_data)
     
     return AstroProfile(
         user_id=saved_profile["user_id"],
@@ -72,26 +56,9 @@ async def create_or_update_astro_profile(
 
 @router.get("/profile", response_model=AstroProfile)
 async def get_my_astro_profile(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    profile = get_astro_profile(user["id"])
+    profile = await get_astro_profile(user_id)
     
     if profile is None:
         raise HTTPException(
@@ -123,26 +90,9 @@ async def get_my_astro_profile(
 
 @router.delete("/profile")
 async def delete_my_astro_profile(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    deleted = delete_astro_profile(user["id"])
+    deleted = await delete_astro_profile(user_id)
     
     if not deleted:
         raise HTTPException(
@@ -1,78 +1,91 @@
-from fastapi import APIRouter, HTTPException, status
-from fastapi.responses import FileResponse
-import requests
-import os
+from fastapi import APIRouter, HTTPException, status, Request
+from fastapi.responses import FileResponse, StreamingResponse
+import httpx
 from pathlib import Path
 
 from src.models.audio_model import SoundGenerationRequest, TextToSpeechRequest, AudioResponse
+from src.utils.elevenlabs import AsyncElevenLabsClient, ElevenLabsError
+from src.utils.media_store import media_store, sound_key, speech_key
+from src.utils.http_cache import file_response
 from src.config import settings
 
 router = APIRouter(prefix="/audio", tags=["Audio Generation"])
 
-# Директория для сохранения аудио файлов
+# Директория аудио файлов, сгенерированных до хранилища медиа
 AUDIO_DIR = Path("data/audio")
 AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 
 
-@router.post("/generate-sound", response_model=AudioResponse)
-async def generate_sound(request: SoundGenerationRequest):
-    """
-    Генерация звуковых эффектов через ElevenLabs API
-    """
+def _get_client() -> AsyncElevenLabsClient:
     if not settings.ELEVENLABS_API_KEY:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="ElevenLabs API ключ не настроен"
         )
+    return AsyncElevenLabsClient()
+
+
+def _stream_to_store(client: AsyncElevenLabsClient, response: httpx.Response, path: Path) -> StreamingResponse:
+    """Отдать аудио клиенту по мере генерации, одновременно записывая его в хранилище медиа"""
+    return StreamingResponse(
+        client.tee(response, path),
+        media_type="audio/mpeg",
+        headers={"X-File-Path": path.name}
+    )
+
+
+@router.post("/generate-sound", response_model=AudioResponse)
+async def generate_sound(request: SoundGenerationRequest):
+    """
+    Генерация звуковых эффектов через ElevenLabs API
     
-    # Конфигурация запроса
-    config = {
-        "text": request.text,
-        "duration_seconds": request.duration_seconds,
-        "model_id": "eleven_text_to_sound_v2",
-        "loop": request.loop,
-    }
-    
-    if request.prompt_influence is not None:
-        config["prompt_influence"] = request.prompt_influence
-    
-    # API endpoint
-    url = "https://api.elevenlabs.io/v1/sound-generation"
-    output_format = "mp3_44100_128"
-    
-    headers = {
-        "xi-api-key": settings.ELEVENLABS_API_KEY,
-        "Content-Type": "application/json"
-    }
-    
-    url_with_params = f"{url}?output_format={output_format}"
+    При stream=true аудио отдается по мере генерации (audio/mpeg),
+    имя сохраненного файла передается в заголовке X-File-Path.
+    Повторный запрос с теми же параметрами отдается из хранилища медиа.
+    """
+    key = sound_key(
+        request.text,
+        duration_seconds=request.duration_seconds,
+        loop=request.loop,
+        prompt_influence=request.prompt_influence,
+    )
+    filename = media_store.filename(key, "mp3")
     
     try:
-        response = requests.post(
-            url_with_params,
-            headers=headers,
-            json=config,
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"ElevenLabs API error: {response.text}"
+        if request.stream:
+            stored_path = media_store.lookup("sounds", key, "mp3")
+            if stored_path is not None:
+                return FileResponse(path=stored_path, media_type="audio/mpeg", headers={"X-File-Path": filename})
+            
+            client = _get_client()
+            response = await client.open_sound(
+                text=request.text,
+                duration_seconds=request.duration_seconds,
+                loop=request.loop,
+                prompt_influence=request.prompt_influence,
             )
+            return _stream_to_store(client, response, media_store.path_for("sounds", key, "mp3"))
         
-        # Сохранение аудио файла
-        filename = f"sound_{abs(hash(request.text))}.mp3"
-        output_path = AUDIO_DIR / filename
-        with open(output_path, "wb") as f:
-            f.write(response.content)
+        # Аудио пишется на диск по мере получения; одинаковые запросы ждут одну генерацию
+        await media_store.get_or_create("sounds", key, "mp3", lambda path: _get_client().generate_sound_to_file(
+            path,
+            text=request.text,
+            duration_seconds=request.duration_seconds,
+            loop=request.loop,
+            prompt_influence=request.prompt_influence,
+        ), provider="elevenlabs")
         
         return AudioResponse(
             message="Звуковой эффект успешно создан",
             file_path=filename
         )
         
-    except requests.RequestException as e:
+    except ElevenLabsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+    except httpx.HTTPError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при запросе к ElevenLabs API: {str(e)}"
@@ -83,54 +96,47 @@ async def generate_sound(request: SoundGenerationRequest):
 async def text_to_speech(request: TextToSpeechRequest):
     """
     Преобразование текста в речь через ElevenLabs API
-    """
-    if not settings.ELEVENLABS_API_KEY:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="ElevenLabs API ключ не настроен"
-        )
-    
-    # API endpoint
-    url = f"https://api.elevenlabs.io/v1/text-to-speech/{request.voice_id}"
-    output_format = "mp3_44100_128"
-    
-    headers = {
-        "xi-api-key": settings.ELEVENLABS_API_KEY,
-        "Content-Type": "application/json"
-    }
     
-    payload = {
-        "text": request.text,
-        "model_id": request.model_id,
-        "output_format": output_format
-    }
+    При stream=true речь отдается по мере синтеза (audio/mpeg),
+    имя сохраненного файла передается в заголовке X-File-Path.
+    Повторный запрос с теми же параметрами отдается из хранилища медиа.
+    """
+    key = speech_key(request.text, voice_id=request.voice_id, model_id=request.model_id)
+    filename = media_store.filename(key, "mp3")
     
     try:
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"ElevenLabs API error: {response.text}"
+        if request.stream:
+            stored_path = media_store.lookup("voices", key, "mp3")
+            if stored_path is not None:
+                return FileResponse(path=stored_path, media_type="audio/mpeg", headers={"X-File-Path": filename})
+            
+            client = _get_client()
+            response = await client.open_speech(
+                text=request.text,
+                voice_id=request.voice_id,
+                model_id=request.model_id,
             )
+            return _stream_to_store(client, response, media_store.path_for("voices", key, "mp3"))
         
-        # Сохранение аудио файла
-        filename = f"speech_{abs(hash(request.text))}.mp3"
-        output_path = AUDIO_DIR / filename
-        with open(output_path, "wb") as f:
-            f.write(response.content)
+        # Аудио пишется на диск по мере получения; одинаковые запросы ждут одну генерацию
+        await media_store.get_or_create("voices", key, "mp3", lambda path: _get_client().text_to_speech_to_file(
+            path,
+            text=request.text,
+            voice_id=request.voice_id,
+            model_id=request.model_id,
+        ), provider="elevenlabs")
         
         return AudioResponse(
             message="Речь успешно создана",
             file_path=filename
         )
         
-    except requests.RequestException as e:
+    except ElevenLabsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+    except httpx.HTTPError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при запросе к ElevenLabs API: {str(e)}"
@@ -138,21 +144,37 @@ async def text_to_speech(request: TextToSpeechRequest):
 
 
 @router.get("/download/{filename}")
-async def download_audio(filename: str):
+async def download_audio(filename: str, request: Request):
     """
     Скачивание сгенерированного аудио файла
+    
+    Поддерживает ETag/If-None-Match (304) и Range (206) для перемотки.
     """
-    file_path = AUDIO_DIR / filename
+    media = (
+        await media_store.catalog_entry("sounds", filename)
+        or await media_store.catalog_entry("voices", filename)
+    )
+    
+    # Файлы хранилища по имени не меняются; старые файлы из data/audio перепроверяются
+    if media is not None:
+        file_path, etag, immutable = Path(media["path"]), media["checksum"], True
+    else:
+        # Отмечаем обращение к файлу, который сборщик добавил в каталог как "audio",
+        # иначе он вытесняется первым как давно не использованный
+        await media_store.catalog_entry("audio", filename)
+        file_path, etag, immutable = AUDIO_DIR / filename, None, False
     
-    if not file_path.exists():
+    try:
+        return file_response(
+            request,
+            file_path,
+            media_type="audio/mpeg",
+            filename=filename,
+            etag=etag,
+            immutable=immutable,
+        )
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Аудио файл не найден"
         )
-    
-    return FileResponse(
-        path=file_path,
-        media_type="audio/mpeg",
-        filename=filename
-    )
-
@@ -1,24 +1,28 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import timedelta
+import logging
 
 from src.models.auth_model import UserCreate, UserLogin, Token, UserResponse
 from src.utils.auth import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
+    password_needs_rehash,
     create_access_token,
     verify_token
 )
-from src.database.db import (
+from src.database.async_db import (
     create_user,
     get_user_by_username,
     get_user_by_id,
-    user_exists
+    user_exists,
+    update_user_password
 )
 from src.config import settings
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 security = HTTPBearer()
+logger = logging.getLogger(__name__)
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
@@ -35,14 +39,14 @@ async def register(user_data: UserCreate):
             detail="Пароль должен содержать минимум 6 символов"
         )
 
-    if user_exists(user_data.username):
+    if await user_exists(user_data.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Пользователь с таким именем уже существует"
         )
 
-    hashed_password = get_password_hash(user_data.password)
-    user = create_user(user_data.username, hashed_password)
+    hashed_password = await get_password_hash_async(user_data.password)
+    user = await create_user(user_data.username, hashed_password)
 
     return UserResponse(
         id=user["id"],
@@ -53,7 +57,7 @@ async def register(user_data: UserCreate):
 
 @router.post("/login", response_model=Token)
 async def login(user_data: UserLogin):
-    user = get_user_by_username(user_data.username)
+    user = await get_user_by_username(user_data.username)
 
     if not user:
         raise HTTPException(
@@ -62,13 +66,21 @@ async def login(user_data: UserLogin):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    if not verify_password(user_data.password, user["hashed_password"]):
+    if not await verify_password_async(user_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверное имя пользователя или пароль",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Пароль известен только в момент входа - тогда и переводим хэш на текущий BCRYPT_ROUNDS
+    if password_needs_rehash(user["hashed_password"]):
+        try:
+            new_hash = await get_password_hash_async(user_data.password)
+            await update_user_password(user["id"], new_hash)
+        except Exception as e:
+            logger.warning(f"Failed to rehash password for user {user['id']}: {str(e)}")
+
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user["username"], "user_id": user["id"]},
@@ -90,7 +102,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user = get_user_by_username(username)
+    user = await get_user_by_username(username)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,102 @@
+"""
+Общие зависимости роутеров
+
+get_current_user_id берет ID пользователя из claim user_id токена (его кладет
+/auth/login) без обращения к таблице users - для обработчиков, которым нужен
+только ID. Для старых токенов без claim пользователь ищется по имени.
+
+get_user_context заменяет повторяющуюся в обработчиках цепочку
+verify_token -> get_user_by_username -> get_latest_personality_result -> get_astro_profile
+одним JOIN запросом. FastAPI кэширует результат зависимости в пределах запроса,
+поэтому повторное использование (в том числе из других зависимостей) не ходит в БД.
+
+Использование:
+    async def handler(ctx: UserContext = Depends(get_user_context)):
+        agent = SomeAgent(personality_data=ctx.personality_data, astrology_data=ctx.astrology_data)
+"""
+from typing import Any, Dict, Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+
+from src.utils.auth import decode_token
+from src.utils.agent_context import build_personality_data, build_astrology_data
+from src.database import async_db
+
+security = HTTPBearer()
+
+
+class UserContext:
+    """Пользователь запроса с последним тестом личности и астрологическим профилем"""
+
+    __slots__ = ("username", "user", "personality_result", "astro_profile", "personality_data", "astrology_data")
+
+    def __init__(
+        self,
+        username: str,
+        user: Dict[str, Any],
+        personality_result: Optional[Dict[str, Any]],
+        astro_profile: Optional[Dict[str, Any]],
+    ):
+        self.username = username
+        self.user = user
+        self.personality_result = personality_result
+        self.astro_profile = astro_profile
+        # Данные в том виде, в котором их получают агенты
+        self.personality_data = build_personality_data(personality_result)
+        self.astrology_data = build_astrology_data(astro_profile)
+
+    @property
+    def user_id(self) -> str:
+        return self.user["id"]
+
+
+def _verified_claims(credentials: HTTPAuthorizationCredentials) -> Dict[str, Any]:
+    claims = decode_token(credentials.credentials)
+    if claims is None or claims.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Невалидный токен",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
+
+
+async def get_current_user_id(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> str:
+    """ID пользователя из токена; БД используется только для токенов без user_id"""
+    claims = _verified_claims(credentials)
+
+    user_id = claims.get("user_id")
+    if user_id:
+        return user_id
+
+    user = await async_db.get_user_by_username(claims["sub"])
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пользователь не найден"
+        )
+    return user["id"]
+
+
+async def get_user_context(
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> UserContext:
+    """Проверка токена и загрузка контекста пользователя одним запросом к БД"""
+    username = _verified_claims(credentials)["sub"]
+
+    context = await async_db.get_user_context(username)
+    if context is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Пользователь не найден"
+        )
+
+    return UserContext(
+        username=username,
+        user=context["user"],
+        personality_result=context["personality_result"],
+        astro_profile=context["astro_profile"],
+    )
@@ -1,6 +1,8 @@
 from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-import requests
+import httpx
+import base64
+from pathlib import Path
 
 from src.models.image_model import (
     ImageGenerateRequest,
@@ -10,7 +12,9 @@ from src.models.image_model import (
     ServiceStatusResponse
 )
 from src.utils.auth import verify_token
-from src.utils.fusion_brain import FusionBrainAPI
+from src.utils.fusion_brain import AsyncFusionBrainAPI
+from src.utils.fusion_brain_jobs import fusion_brain_jobs
+from src.utils.media_store import media_store, image_key
 
 router = APIRouter(prefix="/images", tags=["Image Generation"])
 security = HTTPBearer()
@@ -67,19 +71,22 @@ async def generate_image(
         )
     
     try:
-        # Инициализация API
-        api = FusionBrainAPI()
+        # Генерация изображения (статус опрашивает общий менеджер задач)
+        async def produce(path: Path) -> None:
+            generated = await fusion_brain_jobs.generate_image(
+                prompt=request.prompt,
+                width=request.width,
+                height=request.height,
+                style=request.style,
+                negative_prompt=request.negative_prompt,
+                timeout=300,  # 5 минут максимум
+            )
+            media_store.write_bytes(path, base64.b64decode(generated))
         
-        # Генерация изображения
-        image_base64 = api.generate_image(
-            prompt=request.prompt,
-            width=request.width,
-            height=request.height,
-            style=request.style,
-            negative_prompt=request.negative_prompt,
-            attempts=30,  # 30 попыток * 10 сек = 5 минут максимум
-            delay=10
-        )
+        # Одинаковые запросы отдаются из хранилища медиа без обращения к API
+        key = image_key(request.prompt, request.width, request.height, request.style, request.negative_prompt)
+        image_path = await media_store.get_or_create("images", key, "jpg", produce, provider="fusion_brain")
+        image_base64 = base64.b64encode(image_path.read_bytes()).decode("ascii")
         
         return ImageGenerateResponse(
             image_base64=image_base64,
@@ -101,9 +108,9 @@ async def generate_image(
             status_code=status.HTTP_408_REQUEST_TIMEOUT,
             detail=str(e)
         )
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         # HTTP ошибки от Fusion Brain API
-        status_code = e.response.status_code if hasattr(e, 'response') else 500
+        status_code = e.response.status_code
         
         if status_code == 401:
             detail = "Ошибка авторизации Fusion Brain API. Проверьте API ключи."
@@ -154,8 +161,8 @@ async def get_available_styles(
         )
     
     try:
-        api = FusionBrainAPI()
-        styles_data = api.get_styles()
+        api = AsyncFusionBrainAPI()
+        styles_data = await api.get_styles()
         
         styles = []
         for style in styles_data:
@@ -204,8 +211,8 @@ async def check_service_status(
         )
     
     try:
-        api = FusionBrainAPI()
-        status_data = api.check_availability()
+        api = AsyncFusionBrainAPI()
+        status_data = await api.check_availability()
         
         # Проверяем статус
         pipeline_status = status_data.get("pipeline_status")
@@ -0,0 +1,82 @@
+"""
+Обработчики задач очереди для воркера (worker.py)
+
+Каждый обработчик восстанавливает контекст пользователя по user_id задачи и
+вызывает ту же функцию генерации, что и синхронный эндпоинт, поэтому результат
+задачи совпадает с телом ответа эндпоинта. События генерации (этапы roadmap,
+готовые медиа) превращаются в прогресс задачи.
+"""
+from typing import Any, Dict, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from src.database.async_db import get_user_by_id, get_user_context
+from src.database.jobs_db import JOB_KIND_ROADMAP, JOB_KIND_AMBIENTS_WITH_MEDIA
+from src.models.roadmap_model import RoadmapGenerateRequest
+from src.models.vibe_model import AmbientsWithMediaRequest
+from src.routes.deps import UserContext
+from src.routes.roadmap_routes import run_roadmap_generation
+from src.routes.vibe_routes import run_ambients_with_media
+from src.utils.job_worker import JobError, JobHandler, ProgressReporter
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _parse_payload(model: Type[M], job: Dict[str, Any]) -> M:
+    try:
+        return model(**job["payload"])
+    except ValidationError as e:
+        raise JobError(f"Некорректные данные задачи: {str(e)}")
+
+
+async def _load_user_context(user_id: str) -> UserContext:
+    user = await get_user_by_id(user_id)
+    context = await get_user_context(user["username"]) if user else None
+    if context is None:
+        # Пользователь удален - повторять бессмысленно
+        raise JobError("Пользователь не найден")
+
+    return UserContext(
+        username=user["username"],
+        user=context["user"],
+        personality_result=context["personality_result"],
+        astro_profile=context["astro_profile"],
+    )
+
+
+async def _run_roadmap(job: Dict[str, Any], report: ProgressReporter) -> Dict[str, Any]:
+    ctx = await _load_user_context(job["user_id"])
+    
+    async def on_event(event: str, data: Dict[str, Any]) -> None:
+        if event == "overview":
+            await report({"step": "overview"})
+        elif event == "stage":
+            await report({"step": "stages", "stages_done": data["index"] + 1})
+    
+    response = await run_roadmap_generation(_parse_payload(RoadmapGenerateRequest, job), ctx, on_event=on_event)
+    return response.model_dump(mode="json")
+
+
+async def _run_ambients_with_media(job: Dict[str, Any], report: ProgressReporter) -> Dict[str, Any]:
+    ctx = await _load_user_context(job["user_id"])
+    progress: Dict[str, Any] = {}
+    
+    async def on_event(event: str, data: Dict[str, Any]) -> None:
+        if event == "ambients":
+            progress.update(step="media", ambients=len(data["ambients"]), assets_done=0, assets_failed=0)
+        elif event == "asset":
+            progress["assets_done"] += 1
+            if data["error"]:
+                progress["assets_failed"] += 1
+        elif event == "generation_stats":
+            progress["step"] = "done"
+        await report(dict(progress))
+    
+    response = await run_ambients_with_media(_parse_payload(AmbientsWithMediaRequest, job), ctx, on_event=on_event)
+    return response.model_dump(mode="json")
+
+
+JOB_HANDLERS: Dict[str, JobHandler] = {
+    JOB_KIND_ROADMAP: _run_roadmap,
+    JOB_KIND_AMBIENTS_WITH_MEDIA: _run_ambients_with_media,
+}
@@ -0,0 +1,127 @@
+"""
+Статус задач генерации из очереди (jobs_db)
+
+Долгие генерации (/roadmap/generate, /vibe/ambients-with-media) с параметром
+async_job=true не держат соединение: задача ставится в очередь, клиент сразу
+получает 202 с job_id, а выполняет ее воркер (worker.py).
+"""
+import asyncio
+import logging
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from src.config import settings
+from src.routes.deps import UserContext, get_current_user_id
+from src.database.async_db import create_job, get_job, get_user_jobs
+from src.database.jobs_db import FINAL_STATUSES, STATUS_SUCCEEDED
+from src.utils.sse import format_sse, SSE_HEADERS
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+logger = logging.getLogger(__name__)
+
+
+def _job_links(job_id: str) -> Dict[str, str]:
+    return {
+        "status_url": f"/jobs/{job_id}",
+        "stream_url": f"/jobs/{job_id}/stream",
+    }
+
+
+async def enqueue_job_response(ctx: UserContext, kind: str, payload: Dict[str, Any]) -> JSONResponse:
+    """Поставить задачу в очередь и ответить 202 со ссылками на ее статус"""
+    job = await create_job(ctx.user_id, kind, payload, max_attempts=settings.JOB_MAX_ATTEMPTS)
+    logger.info(f"Queued {kind} job {job['id']} for user {ctx.username}")
+
+    links = _job_links(job["id"])
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": job["id"], "status": job["status"], **links},
+        headers={"Location": links["status_url"]},
+    )
+
+
+async def _get_user_job(job_id: str, user_id: str) -> Dict[str, Any]:
+    job = await get_job(job_id, user_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача не найдена"
+        )
+    return job
+
+
+def _job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Задача без входных данных - для ответов со статусом"""
+    return {key: value for key, value in job.items() if key not in ("user_id", "payload")}
+
+
+@router.get("")
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Последние задачи пользователя (без результатов)
+    """
+    jobs = await get_user_jobs(user_id, limit)
+    return {
+        "jobs": [
+            {key: value for key, value in _job_status(job).items() if key != "result"}
+            for job in jobs
+        ]
+    }
+
+
+@router.get("/{job_id}")
+async def get_job_status(
+    job_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Статус задачи; для завершенной успешно - результат генерации
+    """
+    return _job_status(await _get_user_job(job_id, user_id))
+
+
+@router.get("/{job_id}/stream")
+async def stream_job_status(
+    job_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Статус задачи в формате Server-Sent Events
+
+    События:
+    - status: {"status": ..., "attempts": ..., "progress": ...} - при каждом изменении
+    - done: результат генерации - задача выполнена, поток закрывается
+    - error: {"detail": "..."} - задача завершилась ошибкой, поток закрывается
+    """
+    # 404 до начала потока, пока еще можно вернуть обычный статус ответа
+    job = await _get_user_job(job_id, user_id)
+
+    async def event_stream():
+        nonlocal job
+        last_state = None
+        while True:
+            state = {"status": job["status"], "attempts": job["attempts"], "progress": job["progress"]}
+            if state != last_state:
+                yield format_sse("status", state)
+                last_state = state
+
+            if job["status"] in FINAL_STATUSES:
+                if job["status"] == STATUS_SUCCEEDED:
+                    yield format_sse("done", job["result"])
+                else:
+                    yield format_sse("error", {"detail": job["error"] or "Задача завершилась ошибкой"})
+                return
+
+            await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+            job = await get_job(job_id, user_id)
+            if job is None:
+                yield format_sse("error", {"detail": "Задача не найдена"})
+                return
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,5 +1,4 @@
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import List
 
 from src.models.personality_model import (
@@ -9,18 +8,16 @@ from src.models.personality_model import (
     PersonalityQuestion
 )
 from src.utils.personality_test import PERSONALITY_QUESTIONS, calculate_personality_type
-from src.utils.auth import verify_token
-from src.database.db import get_user_by_username
-from src.database.personality_db import (
+from src.routes.deps import get_current_user_id
+from src.database.async_db import (
     save_personality_result,
     get_user_personality_results,
     get_latest_personality_result,
     delete_personality_result,
-    delete_all_personality_results
+    delete_all_personality_results,
 )
 
 router = APIRouter(prefix="/personality", tags=["Personality Test"])
-security = HTTPBearer()
 
 
 @router.get("/questions", response_model=PersonalityTestResponse)
@@ -44,25 +41,8 @@ async def get_personality_questions():
 @router.post("/submit", response_model=PersonalityResult)
 async def submit_personality_test(
     submission: PersonalityTestSubmission,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
     if len(submission.answers) != len(PERSONALITY_QUESTIONS):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -80,7 +60,7 @@ async def submit_personality_test(
     
     result = calculate_personality_type(answers_dict)
     
-    saved_result = save_personality_result(user["id"], result)
+    saved_result = await save_personality_result(user_id, result)
     
     return PersonalityResult(
         id=saved_result["id"],
@@ -104,31 +84,14 @@ async def submit_personality_test(
 
 @router.get("/results", response_model=List[PersonalityResult])
 async def get_my_personality_results(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    results = get_user_personality_results(user["id"])
+    results = await get_user_personality_results(user_id)
     
     return [
         PersonalityResult(
             id=r["id"],
-            user_id=user["id"],
+            user_id=user_id,
             personality_type=r["personality_type"],
             code=r["code"],
             mind_score=r["mind_score"],
@@ -150,26 +113,9 @@ async def get_my_personality_results(
 
 @router.get("/latest", response_model=PersonalityResult)
 async def get_latest_result(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    result = get_latest_personality_result(user["id"])
+    result = await get_latest_personality_result(user_id)
     
     if result is None:
         raise HTTPException(
@@ -200,26 +146,9 @@ async def get_latest_result(
 @router.delete("/result/{result_id}")
 async def delete_test_result(
     result_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    deleted = delete_personality_result(user["id"], result_id)
+    deleted = await delete_personality_result(user_id, result_id)
     
     if not deleted:
         raise HTTPException(
@@ -232,26 +161,9 @@ async def delete_test_result(
 
 @router.delete("/results")
 async def delete_all_test_results(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    deleted = delete_all_personality_results(user["id"])
+    deleted = await delete_all_personality_results(user_id)
     
     if not deleted:
         raise HTTPException(
@@ -1,29 +1,49 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi.responses import StreamingResponse, Response
+from pydantic import ValidationError
+from typing import Any, Dict, Optional
+import asyncio
 import logging
 
 from src.models.roadmap_model import (
     RoadmapGenerateRequest,
     RoadmapGenerateResponse,
     ProfessionRoadmap,
+    RoadmapStage,
+)
+from src.routes.deps import UserContext, get_user_context, get_current_user_id
+from src.routes.jobs_routes import enqueue_job_response
+from src.database.jobs_db import JOB_KIND_ROADMAP
+from src.database.async_db import (
+    save_roadmap,
+    get_roadmap_response,
+    get_roadmap_response_by_id,
+    get_user_roadmaps,
+    delete_roadmap,
 )
-from src.utils.auth import verify_token
-from src.database.db import get_user_by_username
-from src.database.personality_db import get_latest_personality_result
-from src.database.astro_db import get_astro_profile
-from src.database.roadmap_db import save_roadmap, get_roadmap, get_user_roadmaps, delete_roadmap
 from src.agent.core.profession_roadmap_agent import ProfessionRoadmapAgent
+from src.utils.sse import format_sse, SSE_HEADERS, EventCallback
 
 router = APIRouter(prefix="/roadmap", tags=["Career Roadmap"])
-security = HTTPBearer()
 
 logger = logging.getLogger(__name__)
 
+# Ссылки на фоновые задачи генерации, чтобы их не собрал GC до завершения
+_background_tasks: set = set()
+
+
+def _log_profile_data(ctx: UserContext) -> None:
+    if ctx.personality_result:
+        logger.info(f"Retrieved personality data for user {ctx.username}: {ctx.personality_result.get('code')}")
+    if ctx.astro_profile:
+        logger.info(f"Retrieved astrology data for user {ctx.username}: {ctx.astro_profile.get('zodiac_sign')}")
+
 
 @router.post("/generate", response_model=RoadmapGenerateResponse, response_model_exclude_none=False)
 async def generate_profession_roadmap(
     request: RoadmapGenerateRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    async_job: bool = Query(False, description="Поставить генерацию в очередь и сразу вернуть ID задачи"),
+    ctx: UserContext = Depends(get_user_context)
 ):
     """
     Генерация карьерного roadmap для выбранной профессии
@@ -31,111 +51,15 @@ async def generate_profession_roadmap(
     Создает подробный план развития карьеры с этапами от начинающего до эксперта,
     включая навыки, инструменты, проекты, ресурсы и персонализированные советы
     на основе данных личности и астрологии пользователя.
-    """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
     
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    # Получаем данные теста личности (опционально)
-    personality_data = None
-    try:
-        personality_result = get_latest_personality_result(user["id"])
-        if personality_result:
-            personality_data = {
-                "code": personality_result.get("code"),
-                "personality_type": personality_result.get("personality_type"),
-                "description": personality_result.get("description"),
-                "full_description": personality_result.get("full_description"),
-                "strengths": personality_result.get("strengths"),
-                "weaknesses": personality_result.get("weaknesses"),
-                "career_advice": personality_result.get("career_advice"),
-                "careers": personality_result.get("careers"),
-            }
-            logger.info(f"Retrieved personality data for user {username}: {personality_result.get('code')}")
-    except Exception as e:
-        logger.warning(f"Could not retrieve personality data: {str(e)}")
-        pass  # Personality data is optional
-    
-    # Получаем данные астрологии (опционально)
-    astrology_data = None
-    try:
-        astro_profile = get_astro_profile(user["id"])
-        if astro_profile:
-            astrology_data = {
-                "zodiac_sign": astro_profile.get("zodiac_sign"),
-                "element": astro_profile.get("element"),
-                "quality": astro_profile.get("quality"),
-                "traits": astro_profile.get("traits"),
-                "careers": astro_profile.get("careers"),
-                "strengths": astro_profile.get("strengths"),
-                "challenges": astro_profile.get("challenges"),
-            }
-            logger.info(f"Retrieved astrology data for user {username}: {astro_profile.get('zodiac_sign')}")
-    except Exception as e:
-        logger.warning(f"Could not retrieve astrology data: {str(e)}")
-        pass  # Astrology data is optional
+    С async_job=true генерация выполняется воркером (worker.py): ответ 202 с job_id,
+    статус и результат - GET /jobs/{job_id} или GET /jobs/{job_id}/stream.
+    """
+    if async_job:
+        return await enqueue_job_response(ctx, JOB_KIND_ROADMAP, request.model_dump())
     
-    # Создаем агента и генерируем roadmap
     try:
-        logger.info(f"Generating roadmap for profession: {request.profession_title}")
-        
-        agent = ProfessionRoadmapAgent(
-            profession_title=request.profession_title,
-            personality_data=personality_data,
-            astrology_data=astrology_data,
-            current_level=request.current_level,
-            temperature=0.4,
-            max_tokens=16384,
-        )
-        
-        roadmap_data = await agent.generate_roadmap()
-        
-        # Логируем первый этап для проверки
-        if roadmap_data.get('stages') and len(roadmap_data['stages']) > 0:
-            first_stage = roadmap_data['stages'][0]
-            logger.info(f"First stage has interviewQuestions: {'interviewQuestions' in first_stage}")
-            if 'interviewQuestions' in first_stage:
-                logger.info(f"Number of questions: {len(first_stage['interviewQuestions'])}")
-        
-        # Преобразуем в модель Pydantic для валидации
-        roadmap = ProfessionRoadmap(**roadmap_data)
-        
-        # Проверяем после валидации
-        if roadmap.stages and len(roadmap.stages) > 0:
-            logger.info(f"After Pydantic: first stage has {len(roadmap.stages[0].interviewQuestions)} questions")
-        
-        logger.info(f"Successfully generated roadmap with {len(roadmap.stages)} stages")
-        
-        # Сохраняем roadmap в БД
-        try:
-            roadmap_id = save_roadmap(
-                user_id=user["id"],
-                profession_title=request.profession_title,
-                roadmap_data=roadmap_data
-            )
-            logger.info(f"Saved roadmap to database with ID: {roadmap_id}")
-        except Exception as e:
-            logger.warning(f"Failed to save roadmap to database: {str(e)}")
-            # Не падаем, просто логируем - roadmap все равно вернем
-        
-        return RoadmapGenerateResponse(
-            roadmap=roadmap,
-            has_personality_data=personality_data is not None,
-            has_astrology_data=astrology_data is not None,
-        )
+        return await run_roadmap_generation(request, ctx)
         
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
@@ -151,33 +75,205 @@ async def generate_profession_roadmap(
         )
 
 
+async def run_roadmap_generation(
+    request: RoadmapGenerateRequest,
+    ctx: UserContext,
+    on_event: Optional[EventCallback] = None,
+) -> RoadmapGenerateResponse:
+    """
+    Генерация и сохранение roadmap (общая для /roadmap/generate и воркера задач)
+    
+    С on_event roadmap генерируется потоково, и on_event получает события
+    overview и stage по ходу генерации и saved (`roadmap_id`) после сохранения в БД -
+    из них строятся /roadmap/generate/stream и прогресс задачи воркера
+    
+    Raises:
+        ValueError: ответ агента не прошел валидацию
+    """
+    personality_data = ctx.personality_data
+    astrology_data = ctx.astrology_data
+    _log_profile_data(ctx)
+    
+    # Создаем агента и генерируем roadmap
+    logger.info(f"Generating roadmap for profession: {request.profession_title}")
+    
+    agent = ProfessionRoadmapAgent(
+        profession_title=request.profession_title,
+        personality_data=personality_data,
+        astrology_data=astrology_data,
+        current_level=request.current_level,
+        temperature=0.4,
+        max_tokens=16384,
+    )
+    
+    if on_event is None:
+        roadmap_data = await agent.generate_roadmap()
+    else:
+        roadmap_data = None
+        async for event, data in agent.stream_roadmap():
+            if event == "roadmap":
+                roadmap_data = data
+            else:
+                await on_event(event, data)
+        if roadmap_data is None:
+            raise ValueError("Генерация roadmap завершилась без результата")
+    
+    # Логируем первый этап для проверки
+    if roadmap_data.get('stages') and len(roadmap_data['stages']) > 0:
+        first_stage = roadmap_data['stages'][0]
+        logger.info(f"First stage has interviewQuestions: {'interviewQuestions' in first_stage}")
+        if 'interviewQuestions' in first_stage:
+            logger.info(f"Number of questions: {len(first_stage['interviewQuestions'])}")
+    
+    # Преобразуем в модель Pydantic для валидации
+    roadmap = ProfessionRoadmap(**roadmap_data)
+    
+    # Проверяем после валидации
+    if roadmap.stages and len(roadmap.stages) > 0:
+        logger.info(f"After Pydantic: first stage has {len(roadmap.stages[0].interviewQuestions)} questions")
+    
+    logger.info(f"Successfully generated roadmap with {len(roadmap.stages)} stages")
+    
+    # Сохраняем roadmap в БД
+    try:
+        roadmap_id = await save_roadmap(
+            user_id=ctx.user_id,
+            profession_title=request.profession_title,
+            roadmap_data=roadmap_data
+        )
+        logger.info(f"Saved roadmap to database with ID: {roadmap_id}")
+    except Exception as e:
+        logger.warning(f"Failed to save roadmap to database: {str(e)}")
+        # Не падаем, просто логируем - roadmap все равно вернем
+    else:
+        if on_event is not None:
+            await on_event("saved", {"roadmap_id": roadmap_id})
+    
+    return RoadmapGenerateResponse(
+        roadmap=roadmap,
+        has_personality_data=personality_data is not None,
+        has_astrology_data=astrology_data is not None,
+    )
+
+
+@router.post("/generate/stream")
+async def generate_profession_roadmap_stream(
+    request: RoadmapGenerateRequest,
+    ctx: UserContext = Depends(get_user_context)
+):
+    """
+    Потоковая генерация карьерного roadmap (Server-Sent Events)
+    
+    События:
+    - **overview**: название профессии и обзор roadmap
+    - **stage**: очередной этап (`index`, `stage`) сразу после его генерации
+    - **done**: roadmap сохранен (`roadmap_id`, `stages_count`, флаги использованных данных)
+    - **error**: ошибка генерации или валидации (`detail`)
+    
+    Генерация продолжается и сохраняется в БД даже если клиент отключился.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(_run_roadmap_stream(request, ctx, queue))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    
+    async def event_stream():
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            event, data = item
+            yield format_sse(event, data)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def _run_roadmap_stream(
+    request: RoadmapGenerateRequest,
+    ctx: UserContext,
+    queue: asyncio.Queue,
+) -> None:
+    """
+    Фоновая генерация roadmap для SSE эндпоинта: события пишутся в очередь
+    
+    Задача не зависит от соединения клиента, поэтому оплаченная генерация не теряется.
+    """
+    roadmap_id = None
+    
+    async def on_event(event: str, data: Dict[str, Any]) -> None:
+        nonlocal roadmap_id
+        if event == "stage":
+            stage = data["stage"]
+            try:
+                stage = RoadmapStage(**stage).model_dump()
+            except ValidationError as e:
+                # Этап отдается как есть: сохранять ли roadmap, решает проверка полного ответа
+                logger.warning(f"Streamed stage {data['index']} failed validation: {str(e)}")
+            await queue.put(("stage", {"index": data["index"], "stage": stage}))
+        elif event == "saved":
+            roadmap_id = data["roadmap_id"]
+        else:
+            await queue.put((event, data))
+    
+    try:
+        response = await run_roadmap_generation(request, ctx, on_event=on_event)
+        await queue.put(("done", {
+            "roadmap_id": roadmap_id,
+            "stages_count": len(response.roadmap.stages),
+            "has_personality_data": response.has_personality_data,
+            "has_astrology_data": response.has_astrology_data,
+        }))
+    except (ValueError, ValidationError) as e:
+        logger.error(f"Validation error: {str(e)}")
+        await queue.put(("error", {"detail": f"Ошибка валидации roadmap: {str(e)}"}))
+    except Exception as e:
+        logger.error(f"Error streaming roadmap: {str(e)}", exc_info=True)
+        await queue.put(("error", {"detail": f"Внутренняя ошибка сервера при генерации roadmap: {str(e)}"}))
+    finally:
+        await queue.put(None)
+
+
+def _accepts_gzip(request: Request) -> bool:
+    """gzip разрешен явно или через *; явная запись gzip (в том числе q=0) важнее *"""
+    qvalues = {}
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.strip().partition(";")
+        name = name.strip().lower()
+        if name not in ("gzip", "*"):
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    pass
+        qvalues[name] = q
+    q = qvalues.get("gzip", qvalues.get("*", 0.0))
+    return q > 0
+
+
+def _json_response(body: bytes, compressed: bool) -> Response:
+    """Готовый JSON сохраненного roadmap; ответ зависит от Accept-Encoding"""
+    headers = {"Vary": "Accept-Encoding"}
+    if compressed:
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/saved/{profession_title}")
 async def get_saved_roadmap(
     profession_title: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    request: Request,
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Получить сохраненный roadmap для конкретной профессии
     """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
     try:
-        saved_roadmap = get_roadmap(user["id"], profession_title)
+        compress = _accepts_gzip(request)
+        saved_roadmap = await get_roadmap_response(user_id, profession_title, compress)
         
         if saved_roadmap is None:
             raise HTTPException(
@@ -185,7 +281,7 @@ async def get_saved_roadmap(
                 detail=f"Roadmap для профессии '{profession_title}' не найден"
             )
         
-        return saved_roadmap
+        return _json_response(saved_roadmap, compress)
         
     except HTTPException:
         raise
@@ -197,38 +293,57 @@ async def get_saved_roadmap(
         )
 
 
-@router.get("/saved")
-async def get_all_saved_roadmaps(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+@router.get("/saved/id/{roadmap_id}")
+async def get_saved_roadmap_by_id(
+    roadmap_id: str,
+    request: Request,
+    user_id: str = Depends(get_current_user_id)
 ):
     """
-    Получить все сохраненные roadmaps пользователя
+    Получить полный сохраненный roadmap по ID (элемент списка /saved)
     """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
+    try:
+        compress = _accepts_gzip(request)
+        saved_roadmap = await get_roadmap_response_by_id(roadmap_id, user_id, compress)
+        
+        if saved_roadmap is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Roadmap не найден или не принадлежит пользователю"
+            )
+        
+        return _json_response(saved_roadmap, compress)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving saved roadmap: {str(e)}")
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Ошибка при получении roadmap"
         )
+
+
+@router.get("/saved")
+async def get_all_saved_roadmaps(
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="next_cursor предыдущей страницы"),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Получить сохраненные roadmaps пользователя постранично
     
+    Возвращает только краткие поля (профессия, число этапов, заголовок обзора,
+    даты); полный roadmap - GET /roadmap/saved/id/{roadmap_id}.
+    """
     try:
-        roadmaps = get_user_roadmaps(user["id"])
-        
-        return {
-            "roadmaps": roadmaps,
-            "total_count": len(roadmaps)
-        }
+        return await get_user_roadmaps(user_id, limit=limit, cursor=cursor)
         
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
     except Exception as e:
         logger.error(f"Error retrieving user roadmaps: {str(e)}")
         raise HTTPException(
@@ -240,30 +355,13 @@ async def get_all_saved_roadmaps(
 @router.delete("/saved/{roadmap_id}")
 async def delete_saved_roadmap(
     roadmap_id: str,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Удалить сохраненный roadmap
     """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
     try:
-        deleted = delete_roadmap(roadmap_id, user["id"])
+        deleted = await delete_roadmap(roadmap_id, user_id)
         
         if not deleted:
             raise HTTPException(
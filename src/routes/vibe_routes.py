@@ -1,12 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse
-from typing import List, Dict, Any, Optional
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+import asyncio
 import json
 import base64
+import time
 from pathlib import Path
 from datetime import datetime
-import requests
 import logging
 
 from src.models.vibe_model import (
@@ -31,15 +32,21 @@ from src.models.vibe_model import (
     ProfessionInfoResponse
 )
 from src.utils.auth import verify_token
-from src.database.db import get_user_by_username
-from src.database.personality_db import get_latest_personality_result
-from src.database.astro_db import get_astro_profile
+from src.routes.deps import UserContext, get_user_context, get_current_user_id
+from src.routes.jobs_routes import enqueue_job_response
+from src.database.jobs_db import JOB_KIND_AMBIENTS_WITH_MEDIA
+from src.database.async_db import get_random_card_set, save_card_set, record_media, add_media_refs
 from src.agent.core.profession_cards_agent import ProfessionCardsAgent
 from src.agent.core.profession_vibe_agent import ProfessionVibeAgent
 from src.agent.core.profession_validator_agent import ProfessionValidatorAgent
 from src.agent.core.profession_ambients_agent import ProfessionAmbientsAgent
 from src.agent.core.profession_info_agent import ProfessionInfoAgent
-from src.utils.fusion_brain import FusionBrainAPI
+from src.utils.fusion_brain_jobs import fusion_brain_jobs
+from src.utils.elevenlabs import AsyncElevenLabsClient
+from src.utils.media_store import media_store, image_key, sound_key, speech_key
+from src.utils.http_cache import file_response
+from src.utils.sse import format_sse, SSE_HEADERS, EventCallback
+from src.utils.prefetch import prefetcher
 from src.config import settings
 
 router = APIRouter(prefix="/vibe", tags=["Vibe Generator"])
@@ -47,6 +54,9 @@ security = HTTPBearer()
 
 logger = logging.getLogger(__name__)
 
+# Ссылки на фоновые задачи генерации, чтобы их не собрал GC до завершения
+_background_tasks: set = set()
+
 # Директории для хранения медиа файлов
 DATA_DIR = Path("data")
 AMBIENTS_DIR = DATA_DIR / "ambients"
@@ -65,65 +75,48 @@ TEMPLATE_VOICE_PATH = "ambients/voices/template_voice.mp3"
 for directory in [IMAGES_DIR, SOUNDS_DIR, VOICES_DIR, JSON_DIR]:
     directory.mkdir(parents=True, exist_ok=True)
 
+# Директории файлов вне каталога медиа (шаблоны и файлы, сгенерированные до хранилища)
+_LEGACY_MEDIA_DIRS = {
+    "images": IMAGES_DIR,
+    "sounds": SOUNDS_DIR,
+    "voices": VOICES_DIR,
+    "results": JSON_DIR,
+}
+_LEGACY_MEDIA_TYPES = {
+    "images": "image/jpeg",
+    "sounds": "audio/mpeg",
+    "voices": "audio/mpeg",
+    "results": "application/json",
+}
+
+# Ограничение одновременных запросов к провайдерам медиа (общее для всех запросов)
+_FUSION_BRAIN_SEMAPHORE = asyncio.Semaphore(settings.FUSION_BRAIN_MAX_CONCURRENCY)
+_ELEVENLABS_SEMAPHORE = asyncio.Semaphore(settings.ELEVENLABS_MAX_CONCURRENCY)
+
+# Поле с промптом в ответе агента, директория в URL (и вид в хранилище медиа), заглушка для шаблона
+_MEDIA_KINDS = {
+    "image": {"field": "image_prompt", "dir": "images", "template": TEMPLATE_IMAGE_PATH},
+    "sound": {"field": "sound_prompt", "dir": "sounds", "template": TEMPLATE_SOUND_PATH},
+    "voice": {"field": "voice", "dir": "voices", "template": TEMPLATE_VOICE_PATH},
+}
+
+# (индекс окружения, вид медиа, окружение) - вызывается по готовности каждого файла
+AssetCallback = Callable[[int, str, AmbientEnvironmentWithMedia], Awaitable[None]]
+
 
 @router.post("/generate", response_model=VibeGenerateResponse)
 async def generate_profession_cards(
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    ctx: UserContext = Depends(get_user_context)
 ):
     """
     Генерация персонализированных карточек профессий на основе теста личности и астрологии
+
+    Вход агента полностью определяется кодом личности и знаком зодиака, поэтому карточки
+    отдаются из предгенерированных вариантов (precompute_cards.py). Живая генерация
+    выполняется только для корзин, которых еще нет в таблице, и ее результат сохраняется.
     """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    # Получаем данные теста личности
-    personality_data = None
-    try:
-        personality_result = get_latest_personality_result(user["id"])
-        if personality_result:
-            personality_data = {
-                "code": personality_result.get("code"),
-                "personality_type": personality_result.get("personality_type"),
-                "description": personality_result.get("description"),
-                "full_description": personality_result.get("full_description"),
-                "strengths": personality_result.get("strengths"),
-                "weaknesses": personality_result.get("weaknesses"),
-                "career_advice": personality_result.get("career_advice"),
-                "careers": personality_result.get("careers"),
-            }
-    except Exception:
-        pass  # Personality data is optional
-    
-    # Получаем данные астрологии
-    astrology_data = None
-    try:
-        astro_profile = get_astro_profile(user["id"])
-        if astro_profile:
-            astrology_data = {
-                "zodiac_sign": astro_profile.get("zodiac_sign"),
-                "element": astro_profile.get("element"),
-                "quality": astro_profile.get("quality"),
-                "traits": astro_profile.get("traits"),
-                "careers": astro_profile.get("careers"),
-                "strengths": astro_profile.get("strengths"),
-                "challenges": astro_profile.get("challenges"),
-            }
-    except Exception:
-        pass  # Astrology data is optional
+    personality_data = ctx.personality_data
+    astrology_data = ctx.astrology_data
     
     # Проверяем, что есть хотя бы один источник данных
     if not personality_data and not astrology_data:
@@ -141,7 +134,22 @@ async def generate_profession_cards(
             max_tokens=8192,
         )
         
-        cards_data = await agent.generate_profession_cards()
+        input_hash = agent.input_fingerprint()
+        cards_data = await get_random_card_set(input_hash)
+        
+        if cards_data is None:
+            cards_data = await agent.generate_profession_cards()
+            # Сохраняем живую генерацию, чтобы следующий запрос этой корзины обслуживался из таблицы
+            try:
+                await save_card_set(
+                    personality_code=personality_data.get("code") if personality_data else None,
+                    zodiac_sign=astrology_data.get("zodiac_sign") if astrology_data else None,
+                    input_hash=input_hash,
+                    cards=cards_data,
+                    max_variants=settings.CARD_SET_VARIANTS,
+                )
+            except Exception as e:
+                logger.warning(f"Could not save generated card set: {str(e)}")
         
         # Преобразуем в модели Pydantic
         profession_cards = [
@@ -157,6 +165,8 @@ async def generate_profession_cards(
             for card in cards_data
         ]
         
+        _prefetch_profession_details(ctx, profession_cards)
+        
         return VibeGenerateResponse(
             professions=profession_cards,
             total_count=len(profession_cards),
@@ -176,69 +186,117 @@ async def generate_profession_cards(
         )
 
 
+def _questions_agent(ctx: UserContext, profession_title: str) -> ProfessionVibeAgent:
+    """Агент вопросов /vibe/questions (и его предзагрузки - параметры должны совпадать для попадания в кэш)"""
+    # Данные теста личности (опционально)
+    personality_data = None
+    personality_result = ctx.personality_result
+    if personality_result:
+        personality_data = {
+            "code": personality_result.get("code"),
+            "personality_type": personality_result.get("personality_type"),
+            "description": personality_result.get("description"),
+            "strengths": personality_result.get("strengths"),
+            "weaknesses": personality_result.get("weaknesses"),
+        }
+    
+    # Данные астрологии (опционально)
+    astrology_data = None
+    astro_profile = ctx.astro_profile
+    if astro_profile:
+        astrology_data = {
+            "zodiac_sign": astro_profile.get("zodiac_sign"),
+            "element": astro_profile.get("element"),
+            "traits": astro_profile.get("traits"),
+            "strengths": astro_profile.get("strengths"),
+        }
+    
+    return ProfessionVibeAgent(
+        profession_title=profession_title,
+        personality_data=personality_data,
+        astrology_data=astrology_data,
+        temperature=0.5,
+        max_tokens=4096,
+    )
+
+
+def _validator_agent(profession_title: str) -> ProfessionValidatorAgent:
+    """Агент валидации /vibe/validate"""
+    return ProfessionValidatorAgent(
+        profession_title=profession_title,
+        temperature=0.3,
+        max_tokens=2048,
+    )
+
+
+def _info_agent(ctx: UserContext, profession_title: str, profession_description: Optional[str]) -> ProfessionInfoAgent:
+    """Агент информации о профессии /vibe/profession-info"""
+    # Данные теста личности (опционально для персонализации)
+    personality_data = None
+    personality_result = ctx.personality_result
+    if personality_result:
+        personality_data = {
+            "code": personality_result.get("code"),
+            "personality_type": personality_result.get("personality_type"),
+            "description": personality_result.get("description"),
+            "strengths": personality_result.get("strengths"),
+            "weaknesses": personality_result.get("weaknesses"),
+            "career_paths": personality_result.get("career_paths"),
+        }
+    
+    # Астрологические данные (опционально для персонализации)
+    astrology_data = None
+    astro_profile = ctx.astro_profile
+    if astro_profile:
+        astrology_data = {
+            "sun_sign": astro_profile.get("sun_sign"),
+            "element": astro_profile.get("element"),
+            "description": astro_profile.get("description"),
+            "career_recommendations": astro_profile.get("career_recommendations"),
+        }
+    
+    return ProfessionInfoAgent(
+        profession_title=profession_title,
+        profession_description=profession_description,
+        personality_data=personality_data,
+        astrology_data=astrology_data,
+    )
+
+
+def _prefetch_profession_details(ctx: UserContext, cards: List[ProfessionCard]) -> None:
+    """
+    Предзагрузка информации, валидации и вопросов для лучших карточек
+    
+    Результаты попадают в кэш ответов агентов, поэтому предзагружаются только
+    агенты с включенным кэшем. Информация предзагружается с описанием карточки -
+    клиент передает его в /vibe/profession-info.
+    """
+    if not prefetcher.enabled:
+        return
+    
+    top_cards = sorted(cards, key=lambda card: card.matchScore, reverse=True)[:settings.PREFETCH_TOP_N]
+    for card in top_cards:
+        agents = (
+            (_info_agent(ctx, card.title, card.description), "generate_info"),
+            (_validator_agent(card.title), "validate_profession"),
+            (_questions_agent(ctx, card.title), "generate_questions"),
+        )
+        for agent, method in agents:
+            if agent.use_cache:
+                prefetcher.submit(f"{agent.name}:{ctx.user_id}:{card.title}", getattr(agent, method))
+
+
 @router.post("/questions", response_model=VibeQuestionsResponse)
 async def get_profession_questions(
     request: VibeQuestionsRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    ctx: UserContext = Depends(get_user_context)
 ):
     """
     Получение уточняющих вопросов о выбранной профессии
     """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    # Получаем данные теста личности (опционально)
-    personality_data = None
-    try:
-        personality_result = get_latest_personality_result(user["id"])
-        if personality_result:
-            personality_data = {
-                "code": personality_result.get("code"),
-                "personality_type": personality_result.get("personality_type"),
-                "description": personality_result.get("description"),
-                "strengths": personality_result.get("strengths"),
-                "weaknesses": personality_result.get("weaknesses"),
-            }
-    except Exception:
-        pass
-    
-    # Получаем данные астрологии (опционально)
-    astrology_data = None
-    try:
-        astro_profile = get_astro_profile(user["id"])
-        if astro_profile:
-            astrology_data = {
-                "zodiac_sign": astro_profile.get("zodiac_sign"),
-                "element": astro_profile.get("element"),
-                "traits": astro_profile.get("traits"),
-                "strengths": astro_profile.get("strengths"),
-            }
-    except Exception:
-        pass
-    
     # Создаем агента и генерируем вопросы
     try:
-        agent = ProfessionVibeAgent(
-            profession_title=request.profession_title,
-            personality_data=personality_data,
-            astrology_data=astrology_data,
-            temperature=0.5,
-            max_tokens=4096,
-        )
+        agent = _questions_agent(ctx, request.profession_title)
         
         questions_data = await agent.generate_questions()
         
@@ -300,11 +358,7 @@ async def validate_profession(
     
     # Создаем агента валидации
     try:
-        agent = ProfessionValidatorAgent(
-            profession_title=request.profession_title,
-            temperature=0.3,
-            max_tokens=2048,
-        )
+        agent = _validator_agent(request.profession_title)
         
         validation_result = await agent.validate_profession()
         
@@ -334,63 +388,14 @@ async def validate_profession(
 @router.post("/ambients", response_model=AmbientsGenerateResponse)
 async def generate_profession_ambients(
     request: AmbientsGenerateRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    ctx: UserContext = Depends(get_user_context)
 ):
     """
     Генерация окружений (амбиентов) для выбранной профессии
     на основе всех собранных данных: личность, астрология, профессия, уточняющие вопросы
     """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    # Получаем данные теста личности
-    personality_data = None
-    try:
-        personality_result = get_latest_personality_result(user["id"])
-        if personality_result:
-            personality_data = {
-                "code": personality_result.get("code"),
-                "personality_type": personality_result.get("personality_type"),
-                "description": personality_result.get("description"),
-                "full_description": personality_result.get("full_description"),
-                "strengths": personality_result.get("strengths"),
-                "weaknesses": personality_result.get("weaknesses"),
-                "career_advice": personality_result.get("career_advice"),
-                "careers": personality_result.get("careers"),
-            }
-    except Exception:
-        pass  # Personality data is optional
-    
-    # Получаем данные астрологии
-    astrology_data = None
-    try:
-        astro_profile = get_astro_profile(user["id"])
-        if astro_profile:
-            astrology_data = {
-                "zodiac_sign": astro_profile.get("zodiac_sign"),
-                "element": astro_profile.get("element"),
-                "quality": astro_profile.get("quality"),
-                "traits": astro_profile.get("traits"),
-                "careers": astro_profile.get("careers"),
-                "strengths": astro_profile.get("strengths"),
-                "challenges": astro_profile.get("challenges"),
-            }
-    except Exception:
-        pass  # Astrology data is optional
+    personality_data = ctx.personality_data
+    astrology_data = ctx.astrology_data
     
     # Формируем данные уточняющих вопросов
     clarifying_data = {
@@ -456,29 +461,106 @@ async def generate_profession_ambients(
 @router.post("/ambients-with-media", response_model=AmbientsWithMediaResponse)
 async def generate_profession_ambients_with_media(
     request: AmbientsWithMediaRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    async_job: bool = Query(False, description="Поставить генерацию в очередь и сразу вернуть ID задачи"),
+    ctx: UserContext = Depends(get_user_context)
 ):
     """
     Генерация окружений (амбиентов) для выбранной профессии с медиа файлами
     (изображения, звуки, голоса) на основе всех собранных данных
+    
+    С async_job=true генерация выполняется воркером (worker.py): ответ 202 с job_id,
+    статус и результат - GET /jobs/{job_id} или GET /jobs/{job_id}/stream.
     """
-    token = credentials.credentials
-    username = verify_token(token)
+    if async_job:
+        return await enqueue_job_response(ctx, JOB_KIND_AMBIENTS_WITH_MEDIA, request.model_dump())
     
-    if username is None:
+    try:
+        return await run_ambients_with_media(request, ctx)
+        
+    except ValueError as e:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ошибка генерации: {str(e)}"
         )
-    
-    user = get_user_by_username(username)
-    if user is None:
+    except Exception as e:
+        logger.error(f"Error in ambients generation: {str(e)}", exc_info=True)
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Внутренняя ошибка сервера: {str(e)}"
         )
+
+
+@router.post("/ambients-with-media/stream")
+async def generate_profession_ambients_with_media_stream(
+    request: AmbientsWithMediaRequest,
+    ctx: UserContext = Depends(get_user_context)
+):
+    """
+    Потоковая генерация окружений с медиа файлами (Server-Sent Events)
+    
+    События:
+    - **ambients**: название профессии, тексты окружений и инструменты - сразу после
+      генерации текста, до медиа
+    - **asset**: очередной медиа файл готов (`ambient_index`, `ambient_id`, `kind`,
+      `path` или `error`) - в порядке готовности
+    - **generation_stats**: итоговая статистика и путь к сохраненному JSON, последнее событие
+    - **error**: ошибка генерации (`detail`)
+    
+    Генерация продолжается и сохраняется даже если клиент отключился.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(_run_ambients_with_media_stream(request, ctx, queue))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    
+    async def event_stream():
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            event, data = item
+            yield format_sse(event, data)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def _run_ambients_with_media_stream(
+    request: AmbientsWithMediaRequest,
+    ctx: UserContext,
+    queue: asyncio.Queue,
+) -> None:
+    """Фоновая генерация окружений для SSE эндпоинта: события пишутся в очередь"""
+    async def on_event(event: str, data: Dict[str, Any]) -> None:
+        await queue.put((event, data))
+    
+    try:
+        await run_ambients_with_media(request, ctx, on_event=on_event)
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        await queue.put(("error", {"detail": f"Ошибка генерации: {str(e)}"}))
+    except Exception as e:
+        logger.error(f"Error streaming ambients: {str(e)}", exc_info=True)
+        await queue.put(("error", {"detail": f"Внутренняя ошибка сервера: {str(e)}"}))
+    finally:
+        await queue.put(None)
+
+
+async def run_ambients_with_media(
+    request: AmbientsWithMediaRequest,
+    ctx: UserContext,
+    on_event: Optional[EventCallback] = None,
+) -> AmbientsWithMediaResponse:
+    """
+    Генерация окружений и их медиа (общая для /vibe/ambients-with-media,
+    потоковой версии и воркера задач)
+    
+    on_event получает события по ходу генерации: ambients (тексты окружений,
+    до генерации медиа), asset (каждый готовый или неудавшийся файл) и
+    generation_stats (в конце)
     
+    Raises:
+        ValueError: ответ агента не прошел валидацию
+    """
     # Статистика генерации
     stats = {
         "images_generated": 0,
@@ -489,284 +571,280 @@ async def generate_profession_ambients_with_media(
         "voices_failed": 0,
     }
     
-    try:
-        # Генерируем окружения через агента
-        if not request.use_template:
-            # Получаем данные пользователя
-            personality_data = None
-            try:
-                personality_result = get_latest_personality_result(user["id"])
-                if personality_result:
-                    personality_data = {
-                        "code": personality_result.get("code"),
-                        "personality_type": personality_result.get("personality_type"),
-                        "description": personality_result.get("description"),
-                        "full_description": personality_result.get("full_description"),
-                        "strengths": personality_result.get("strengths"),
-                        "weaknesses": personality_result.get("weaknesses"),
-                        "career_advice": personality_result.get("career_advice"),
-                        "careers": personality_result.get("careers"),
-                    }
-            except Exception:
-                pass
-            
-            astrology_data = None
-            try:
-                astro_profile = get_astro_profile(user["id"])
-                if astro_profile:
-                    astrology_data = {
-                        "zodiac_sign": astro_profile.get("zodiac_sign"),
-                        "element": astro_profile.get("element"),
-                        "quality": astro_profile.get("quality"),
-                        "traits": astro_profile.get("traits"),
-                        "careers": astro_profile.get("careers"),
-                        "strengths": astro_profile.get("strengths"),
-                        "challenges": astro_profile.get("challenges"),
-                    }
-            except Exception:
-                pass
-            
-            clarifying_data = {
-                "questions": [
-                    {
-                        "id": qa.question_id,
-                        "question": qa.question_text,
-                        "answer": qa.answer
-                    }
-                    for qa in request.question_answers
-                ]
-            }
-            
-            # Создаем агента и генерируем окружения
-            agent = ProfessionAmbientsAgent(
-                profession_title=request.profession_title,
-                personality_data=personality_data,
-                astrology_data=astrology_data,
-                clarifying_data=clarifying_data,
-                temperature=0.6,
-                max_tokens=8192,
-            )
-            
-            ambients_data = await agent.generate_ambients()
-        else:
-            # Используем шаблонные данные для тестирования
-            ambients_data = _get_template_ambients_data(request.profession_title)
-        
-        # Создаем уникальный ID для этой генерации
-        generation_id = f"{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        # Сохраняем исходный JSON
-        json_filename = f"ambients_{generation_id}.json"
-        json_path = JSON_DIR / json_filename
-        with open(json_path, "w", encoding="utf-8") as f:
-            json.dump(ambients_data, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"Saved ambients JSON to {json_path}")
-        
-        # Генерируем медиа для каждого окружения
-        ambients_with_media = []
-        
-        for i, ambient in enumerate(ambients_data.get("ambients", [])):
-            logger.info(f"Processing ambient {i+1}/{len(ambients_data.get('ambients', []))}: {ambient.get('name')}")
-            
-            ambient_with_media = AmbientEnvironmentWithMedia(
-                id=ambient.get("id"),
-                name=ambient.get("name"),
-                text=ambient.get("text"),
-                image_prompt=ambient.get("image_prompt"),
-                sound_prompt=ambient.get("sound_prompt"),
-                voice=ambient.get("voice"),
-            )
-            
-            # Генерация изображения
-            if ambient.get("image_prompt") and not request.use_template:
-                try:
-                    image_filename = f"img_{generation_id}_{i+1}.jpg"
-                    image_path = await _generate_image(
-                        ambient.get("image_prompt"),
-                        image_filename
-                    )
-                    ambient_with_media.image_path = f"ambients/images/{image_filename}"
-                    stats["images_generated"] += 1
-                    logger.info(f"Generated image: {image_filename}")
-                except Exception as e:
-                    ambient_with_media.image_error = str(e)
-                    stats["images_failed"] += 1
-                    logger.error(f"Failed to generate image: {str(e)}")
-            elif ambient.get("image_prompt") and request.use_template:
-                # Используем заглушку
-                ambient_with_media.image_path = TEMPLATE_IMAGE_PATH
-                stats["images_generated"] += 1
-            
-            # Генерация звука
-            if ambient.get("sound_prompt") and not request.use_template:
-                try:
-                    sound_filename = f"sound_{generation_id}_{i+1}.mp3"
-                    sound_path = await _generate_sound(
-                        ambient.get("sound_prompt"),
-                        sound_filename
-                    )
-                    ambient_with_media.sound_path = f"ambients/sounds/{sound_filename}"
-                    stats["sounds_generated"] += 1
-                    logger.info(f"Generated sound: {sound_filename}")
-                except Exception as e:
-                    ambient_with_media.sound_error = str(e)
-                    stats["sounds_failed"] += 1
-                    logger.error(f"Failed to generate sound: {str(e)}")
-            elif ambient.get("sound_prompt") and request.use_template:
-                # Используем заглушку
-                ambient_with_media.sound_path = TEMPLATE_SOUND_PATH
-                stats["sounds_generated"] += 1
-            
-            # Генерация голоса
-            if ambient.get("voice") and not request.use_template:
-                try:
-                    voice_filename = f"voice_{generation_id}_{i+1}.mp3"
-                    voice_path = await _generate_voice(
-                        ambient.get("voice"),
-                        voice_filename
-                    )
-                    ambient_with_media.voice_path = f"ambients/voices/{voice_filename}"
-                    stats["voices_generated"] += 1
-                    logger.info(f"Generated voice: {voice_filename}")
-                except Exception as e:
-                    ambient_with_media.voice_error = str(e)
-                    stats["voices_failed"] += 1
-                    logger.error(f"Failed to generate voice: {str(e)}")
-            elif ambient.get("voice") and request.use_template:
-                # Используем заглушку
-                ambient_with_media.voice_path = TEMPLATE_VOICE_PATH
-                stats["voices_generated"] += 1
-            
-            ambients_with_media.append(ambient_with_media)
+    # Генерируем окружения через агента
+    if not request.use_template:
+        # Данные пользователя
+        personality_data = ctx.personality_data
+        astrology_data = ctx.astrology_data
         
-        tools = ProfessionTools(
-            title=ambients_data.get("tools", {}).get("title", "Инструменты профессии"),
-            items=ambients_data.get("tools", {}).get("items", [])
-        )
+        clarifying_data = {
+            "questions": [
+                {
+                    "id": qa.question_id,
+                    "question": qa.question_text,
+                    "answer": qa.answer
+                }
+                for qa in request.question_answers
+            ]
+        }
         
-        return AmbientsWithMediaResponse(
-            profession_title=ambients_data.get("profession_title", request.profession_title),
-            ambients=ambients_with_media,
-            tools=tools,
-            json_path=f"ambients/results/{json_filename}",
-            generation_stats=stats
+        # Создаем агента и генерируем окружения
+        agent = ProfessionAmbientsAgent(
+            profession_title=request.profession_title,
+            personality_data=personality_data,
+            astrology_data=astrology_data,
+            clarifying_data=clarifying_data,
+            temperature=0.6,
+            max_tokens=8192,
         )
         
-    except ValueError as e:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ошибка генерации: {str(e)}"
+        started = time.perf_counter()
+        ambients_data = await agent.generate_ambients()
+        latency_ms = int((time.perf_counter() - started) * 1000)
+    else:
+        # Используем шаблонные данные для тестирования
+        ambients_data = _get_template_ambients_data(request.profession_title)
+        latency_ms = None
+    
+    # Создаем уникальный ID для этой генерации
+    generation_id = f"{ctx.username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    
+    # Сохраняем исходный JSON
+    json_filename = f"ambients_{generation_id}.json"
+    json_path = JSON_DIR / json_filename
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(ambients_data, f, ensure_ascii=False, indent=2)
+    
+    logger.info(f"Saved ambients JSON to {json_path}")
+    try:
+        await record_media(
+            "results",
+            json_path,
+            owner_id=ctx.user_id,
+            provider="template" if request.use_template else "llm",
+            latency_ms=latency_ms,
         )
     except Exception as e:
-        logger.error(f"Error in ambients generation: {str(e)}", exc_info=True)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Внутренняя ошибка сервера: {str(e)}"
+        logger.warning(f"Failed to record {json_filename} in media catalog: {str(e)}")
+    
+    ambients_with_media = [
+        AmbientEnvironmentWithMedia(
+            id=ambient.get("id"),
+            name=ambient.get("name"),
+            text=ambient.get("text"),
+            image_prompt=ambient.get("image_prompt"),
+            sound_prompt=ambient.get("sound_prompt"),
+            voice=ambient.get("voice"),
         )
+        for ambient in ambients_data.get("ambients", [])
+    ]
+    
+    tools = ProfessionTools(
+        title=ambients_data.get("tools", {}).get("title", "Инструменты профессии"),
+        items=ambients_data.get("tools", {}).get("items", [])
+    )
+    profession_title = ambients_data.get("profession_title", request.profession_title)
+    
+    on_asset: Optional[AssetCallback] = None
+    if on_event is not None:
+        # Тексты доступны сразу, медиа - по мере готовности
+        await on_event("ambients", {
+            "profession_title": profession_title,
+            "ambients": [ambient.model_dump() for ambient in ambients_with_media],
+            "tools": tools.model_dump(),
+        })
+        
+        async def _emit_asset(index: int, kind: str, ambient: AmbientEnvironmentWithMedia) -> None:
+            await on_event("asset", {
+                "ambient_index": index,
+                "ambient_id": ambient.id,
+                "kind": kind,
+                "path": getattr(ambient, f"{kind}_path"),
+                "error": getattr(ambient, f"{kind}_error"),
+            })
+        on_asset = _emit_asset
+    
+    # Генерируем медиа для всех окружений параллельно
+    await _generate_ambients_media(
+        ambients_with_media,
+        stats=stats,
+        use_template=request.use_template,
+        owner_id=ctx.user_id,
+        on_asset=on_asset,
+    )
+    
+    # Пока JSON генерации существует, его медиа не удаляются сборщиком
+    refs = []
+    for ambient in ambients_with_media:
+        for kind, spec in _MEDIA_KINDS.items():
+            media_path = getattr(ambient, f"{kind}_path")
+            if media_path and media_path != spec["template"]:
+                refs.append((spec["dir"], media_path.rsplit("/", 1)[-1]))
+    if refs:
+        try:
+            await add_media_refs("results", json_filename, refs)
+        except Exception as e:
+            logger.warning(f"Failed to record media references of {json_filename}: {str(e)}")
+    
+    result_path = f"ambients/results/{json_filename}"
+    if on_event is not None:
+        await on_event("generation_stats", {"generation_stats": stats, "json_path": result_path})
+    
+    return AmbientsWithMediaResponse(
+        profession_title=profession_title,
+        ambients=ambients_with_media,
+        tools=tools,
+        json_path=result_path,
+        generation_stats=stats
+    )
+
+
+async def _generate_ambients_media(
+    ambients_with_media: List[AmbientEnvironmentWithMedia],
+    stats: Dict[str, int],
+    use_template: bool,
+    owner_id: Optional[str] = None,
+    on_asset: Optional[AssetCallback] = None,
+) -> None:
+    """
+    Генерация медиа (изображение, звук, голос) для всех окружений; пути и
+    ошибки записываются в сами окружения
+
+    Все задачи запускаются одновременно в TaskGroup. Число одновременных запросов
+    к каждому провайдеру ограничено семафором, у каждой задачи свой дедлайн.
+    Ошибка или таймаут одной задачи не отменяет остальные - она попадает
+    в *_error окружения и в generation_stats. Повторяющиеся промпты берутся
+    из хранилища медиа без обращения к провайдеру.
+    
+    on_asset вызывается сразу по готовности (или ошибке) каждого файла.
+    """
+    jobs = []
+    for index, ambient_with_media in enumerate(ambients_with_media):
+        for kind, spec in _MEDIA_KINDS.items():
+            prompt = getattr(ambient_with_media, spec["field"])
+            if not prompt:
+                continue
+            if use_template:
+                # Используем заглушку
+                setattr(ambient_with_media, f"{kind}_path", spec["template"])
+                stats[f"{kind}s_generated"] += 1
+                if on_asset is not None:
+                    await on_asset(index, kind, ambient_with_media)
+                continue
+            jobs.append((index, kind, prompt, ambient_with_media))
+    
+    if jobs:
+        logger.info(f"Generating {len(jobs)} media files for {len(ambients_with_media)} ambients")
+        async with asyncio.TaskGroup() as tg:
+            for index, kind, prompt, ambient_with_media in jobs:
+                tg.create_task(_generate_media_item(
+                    kind, prompt, ambient_with_media, stats, owner_id, index=index, on_asset=on_asset
+                ))
 
 
-async def _generate_image(prompt: str, filename: str) -> str:
-    """Генерация изображения через Fusion Brain API"""
+async def _generate_media_item(
+    kind: str,
+    prompt: str,
+    ambient_with_media: AmbientEnvironmentWithMedia,
+    stats: Dict[str, int],
+    owner_id: Optional[str] = None,
+    index: int = 0,
+    on_asset: Optional[AssetCallback] = None,
+) -> None:
+    """Генерация одного медиа файла с лимитом провайдера и дедлайном; ошибки не пробрасываются"""
+    if kind == "image":
+        semaphore, generator, timeout = _FUSION_BRAIN_SEMAPHORE, _generate_image, settings.MEDIA_IMAGE_TIMEOUT
+    else:
+        generator = _generate_sound if kind == "sound" else _generate_voice
+        semaphore, timeout = _ELEVENLABS_SEMAPHORE, settings.MEDIA_AUDIO_TIMEOUT
+    
     try:
-        api = FusionBrainAPI()
-        image_base64 = api.generate_image(
+        async with semaphore:
+            async with asyncio.timeout(timeout):
+                filename = await generator(prompt, owner_id=owner_id)
+        setattr(ambient_with_media, f"{kind}_path", f"ambients/{_MEDIA_KINDS[kind]['dir']}/{filename}")
+        stats[f"{kind}s_generated"] += 1
+        logger.info(f"Generated {kind}: {filename}")
+    except TimeoutError:
+        setattr(ambient_with_media, f"{kind}_error", f"{kind.capitalize()} generation timed out after {timeout:.0f}s")
+        stats[f"{kind}s_failed"] += 1
+        logger.error(f"Timed out generating {kind}: {prompt[:50]}")
+    except Exception as e:
+        setattr(ambient_with_media, f"{kind}_error", str(e))
+        stats[f"{kind}s_failed"] += 1
+        logger.error(f"Failed to generate {kind}: {str(e)}")
+    
+    if on_asset is not None:
+        await on_asset(index, kind, ambient_with_media)
+
+
+async def _generate_image(prompt: str, owner_id: Optional[str] = None) -> str:
+    """Генерация изображения через Fusion Brain API, возвращает имя файла в хранилище медиа"""
+    width, height = 448, 448  # Кратно 64, близко к 400
+    
+    async def produce(path: Path) -> None:
+        image_base64 = await fusion_brain_jobs.generate_image(
             prompt=prompt,
-            width=448,  # Кратно 64, близко к 400
-            height=448,
-            attempts=10,  # Уменьшено до 10 попыток (~100 сек макс)
-            delay=10
+            width=width,
+            height=height,
+            timeout=100,  # ~100 сек макс
         )
-        
         # Декодируем base64 и сохраняем
-        image_data = base64.b64decode(image_base64)
-        image_path = IMAGES_DIR / filename
-        with open(image_path, "wb") as f:
-            f.write(image_data)
-        
-        return str(image_path)
+        media_store.write_bytes(path, base64.b64decode(image_base64))
+    
+    try:
+        key = image_key(prompt, width=width, height=height)
+        image_path = await media_store.get_or_create(
+            "images", key, "jpg", produce, owner_id=owner_id, provider="fusion_brain"
+        )
+        return image_path.name
     except Exception as e:
         raise Exception(f"Image generation failed: {str(e)}")
 
 
-async def _generate_sound(prompt: str, filename: str) -> str:
-    """Генерация звука через ElevenLabs API"""
-    if not settings.ELEVENLABS_API_KEY:
-        raise Exception("ElevenLabs API key not configured")
+async def _generate_sound(prompt: str, owner_id: Optional[str] = None) -> str:
+    """Генерация звука через ElevenLabs API, возвращает имя файла в хранилище медиа"""
+    duration_seconds = 8.0  # 8 секунд
+    loop = True  # Для зацикливания
+    
+    async def produce(path: Path) -> None:
+        await AsyncElevenLabsClient().generate_sound_to_file(
+            path,
+            text=prompt,
+            duration_seconds=duration_seconds,
+            loop=loop,
+        )
     
     try:
-        url = "https://api.elevenlabs.io/v1/sound-generation"
-        output_format = "mp3_44100_128"
-        
-        headers = {
-            "xi-api-key": settings.ELEVENLABS_API_KEY,
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "text": prompt,
-            "duration_seconds": 8.0,  # 8 секунд
-            "model_id": "eleven_text_to_sound_v2",
-            "loop": True  # Для зацикливания
-        }
-        
-        response = requests.post(
-            f"{url}?output_format={output_format}",
-            headers=headers,
-            json=payload,
-            timeout=40
+        key = sound_key(prompt, duration_seconds=duration_seconds, loop=loop)
+        sound_path = await media_store.get_or_create(
+            "sounds", key, "mp3", produce, owner_id=owner_id, provider="elevenlabs"
         )
-        
-        if response.status_code != 200:
-            raise Exception(f"ElevenLabs API error: {response.text}")
-        
-        # Сохраняем звук
-        sound_path = SOUNDS_DIR / filename
-        with open(sound_path, "wb") as f:
-            f.write(response.content)
-        
-        return str(sound_path)
+        return sound_path.name
     except Exception as e:
         raise Exception(f"Sound generation failed: {str(e)}")
 
 
-async def _generate_voice(text: str, filename: str) -> str:
-    """Генерация голоса через ElevenLabs TTS API"""
-    if not settings.ELEVENLABS_API_KEY:
-        raise Exception("ElevenLabs API key not configured")
+async def _generate_voice(text: str, owner_id: Optional[str] = None) -> str:
+    """Генерация голоса через ElevenLabs TTS API, возвращает имя файла в хранилище медиа"""
+    # Используем русскоязычный голос
+    voice_id = "JBFqnCBsd6RMkjVDRZzb"  # George - multilingual
+    model_id = "eleven_multilingual_v2"
+    
+    async def produce(path: Path) -> None:
+        await AsyncElevenLabsClient().text_to_speech_to_file(
+            path,
+            text=text,
+            voice_id=voice_id,
+            model_id=model_id,
+        )
     
     try:
-        # Используем русскоязычный голос
-        voice_id = "JBFqnCBsd6RMkjVDRZzb"  # George - multilingual
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
-        
-        headers = {
-            "xi-api-key": settings.ELEVENLABS_API_KEY,
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "text": text,
-            "model_id": "eleven_multilingual_v2",
-            "output_format": "mp3_44100_128"
-        }
-        
-        response = requests.post(
-            url,
-            headers=headers,
-            json=payload,
-            timeout=40
+        key = speech_key(text, voice_id=voice_id, model_id=model_id)
+        voice_path = await media_store.get_or_create(
+            "voices", key, "mp3", produce, owner_id=owner_id, provider="elevenlabs"
         )
-        
-        if response.status_code != 200:
-            raise Exception(f"ElevenLabs TTS API error: {response.text}")
-        
-        # Сохраняем голос
-        voice_path = VOICES_DIR / filename
-        with open(voice_path, "wb") as f:
-            f.write(response.content)
-        
-        return str(voice_path)
+        return voice_path.name
     except Exception as e:
         raise Exception(f"Voice generation failed: {str(e)}")
 
@@ -813,11 +891,15 @@ def _get_template_ambients_data(profession_title: str) -> Dict[str, Any]:
 async def get_ambient_media_file(
     media_type: str,
     filename: str,
+    request: Request,
     token: Optional[str] = Query(None, description="JWT токен")
 ):
     """
     Получение медиа файла (изображение, звук, голос)
     
+    Поддерживает ETag/If-None-Match (304) и Range (206) - браузер не скачивает
+    файл повторно и может перематывать аудио.
+    
     media_type: images, sounds, voices, results
     token: JWT токен из query параметра
     """
@@ -839,70 +921,59 @@ async def get_ambient_media_file(
     # Логируем параметры
     logger.info(f"Accessing media: media_type={media_type}, filename={filename}")
     
-    # Определяем директорию
-    # Шаблоны и обычные файлы лежат в одних директориях
-    if media_type == "images":
-        file_path = IMAGES_DIR / filename
-        media_type_str = "image/jpeg"
-    elif media_type == "sounds":
-        file_path = SOUNDS_DIR / filename
-        media_type_str = "audio/mpeg"
-    elif media_type == "voices":
-        file_path = VOICES_DIR / filename
-        media_type_str = "audio/mpeg"
-    elif media_type == "results":
-        file_path = JSON_DIR / filename
-        media_type_str = "application/json"
-    else:
+    if media_type not in ("images", "sounds", "voices", "results"):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Неверный тип медиа"
         )
     
-    if not file_path.exists():
+    # Сгенерированные файлы находятся по первичному ключу каталога медиа
+    media = await media_store.catalog_entry(media_type, filename)
+    
+    # Файлы каталога не меняются: в хранилище имя - хэш запроса, JSON пишется один раз.
+    # Шаблоны и старые файлы могут быть перезаписаны - их браузер перепроверяет
+    if media is not None:
+        file_path = Path(media["path"])
+        media_type_str = media["mime_type"]
+        etag, immutable = media["checksum"], True
+    else:
+        file_path = _LEGACY_MEDIA_DIRS[media_type] / filename
+        media_type_str = _LEGACY_MEDIA_TYPES[media_type]
+        etag, immutable = None, False
+    
+    try:
+        return file_response(
+            request,
+            file_path,
+            media_type=media_type_str,
+            filename=filename,
+            etag=etag,
+            immutable=immutable,
+        )
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Файл не найден: {file_path}"
         )
-    
-    return FileResponse(
-        path=file_path,
-        media_type=media_type_str,
-        filename=filename
-    )
 
 
 @router.post("/generate-ambient-media", response_model=GenerateMediaForAmbientResponse)
 async def generate_media_for_ambient(
     request: GenerateMediaForAmbientRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    user_id: str = Depends(get_current_user_id)
 ):
     """
     Генерация медиа файлов для конкретного окружения
     Используется для постепенной загрузки медиа после отображения текста
     """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
     response = GenerateMediaForAmbientResponse(
         ambient_id=request.ambient_id
     )
     
-    # Создаем уникальный ID для файлов
-    generation_id = f"{username}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{request.ambient_id}"
-    
     # Генерация изображения
     if request.image_prompt and not request.use_template:
         try:
-            image_filename = f"img_{generation_id}.jpg"
-            await _generate_image(request.image_prompt, image_filename)
+            image_filename = await _generate_image(request.image_prompt, owner_id=user_id)
             response.image_path = f"ambients/images/{image_filename}"
             logger.info(f"Generated image for ambient {request.ambient_id}, path: {response.image_path}")
         except Exception as e:
@@ -915,8 +986,7 @@ async def generate_media_for_ambient(
     # Генерация звука
     if request.sound_prompt and not request.use_template:
         try:
-            sound_filename = f"sound_{generation_id}.mp3"
-            await _generate_sound(request.sound_prompt, sound_filename)
+            sound_filename = await _generate_sound(request.sound_prompt, owner_id=user_id)
             response.sound_path = f"ambients/sounds/{sound_filename}"
             logger.info(f"Generated sound for ambient {request.ambient_id}, path: {response.sound_path}")
         except Exception as e:
@@ -929,8 +999,7 @@ async def generate_media_for_ambient(
     # Генерация голоса
     if request.voice_text and not request.use_template:
         try:
-            voice_filename = f"voice_{generation_id}.mp3"
-            await _generate_voice(request.voice_text, voice_filename)
+            voice_filename = await _generate_voice(request.voice_text, owner_id=user_id)
             response.voice_path = f"ambients/voices/{voice_filename}"
             logger.info(f"Generated voice for ambient {request.ambient_id}, path: {response.voice_path}")
         except Exception as e:
@@ -947,7 +1016,7 @@ async def generate_media_for_ambient(
 @router.post("/profession-info", response_model=ProfessionInfoResponse)
 async def get_profession_info(
     request: ProfessionInfoRequest,
-    credentials: HTTPAuthorizationCredentials = Depends(security)
+    ctx: UserContext = Depends(get_user_context)
 ):
     """
     Получение детальной информации о профессии
@@ -964,61 +1033,9 @@ async def get_profession_info(
     - Рабочая среда
     - Типичные проекты
     """
-    token = credentials.credentials
-    username = verify_token(token)
-    
-    if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Невалидный токен",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    user = get_user_by_username(username)
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Пользователь не найден"
-        )
-    
-    # Получаем данные теста личности (опционально для персонализации)
-    personality_data = None
-    try:
-        personality_result = get_latest_personality_result(user["id"])
-        if personality_result:
-            personality_data = {
-                "code": personality_result.get("code"),
-                "personality_type": personality_result.get("personality_type"),
-                "description": personality_result.get("description"),
-                "strengths": personality_result.get("strengths"),
-                "weaknesses": personality_result.get("weaknesses"),
-                "career_paths": personality_result.get("career_paths"),
-            }
-    except Exception as e:
-        logger.warning(f"Не удалось получить данные теста личности: {str(e)}")
-    
-    # Получаем астрологические данные (опционально для персонализации)
-    astrology_data = None
-    try:
-        astro_profile = get_astro_profile(user["id"])
-        if astro_profile:
-            astrology_data = {
-                "sun_sign": astro_profile.get("sun_sign"),
-                "element": astro_profile.get("element"),
-                "description": astro_profile.get("description"),
-                "career_recommendations": astro_profile.get("career_recommendations"),
-            }
-    except Exception as e:
-        logger.warning(f"Не удалось получить астрологические данные: {str(e)}")
-    
     try:
         # Создаем агента для генерации информации
-        agent = ProfessionInfoAgent(
-            profession_title=request.profession_title,
-            profession_description=request.profession_description,
-            personality_data=personality_data,
-            astrology_data=astrology_data,
-        )
+        agent = _info_agent(ctx, request.profession_title, request.profession_description)
         
         # Генерируем информацию
         info_data = await agent.generate_info()
@@ -1,15 +1,21 @@
 from .auth import (
     verify_password,
     get_password_hash,
+    verify_password_async,
+    get_password_hash_async,
     create_access_token,
     verify_token,
+    decode_token,
     authenticate_user
 )
 
 __all__ = [
     "verify_password",
     "get_password_hash",
+    "verify_password_async",
+    "get_password_hash_async",
     "create_access_token",
     "verify_token",
+    "decode_token",
     "authenticate_user"
 ]
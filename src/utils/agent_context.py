@@ -0,0 +1,48 @@
+from typing import Any, Dict, Optional
+
+
+def build_personality_data(personality_result: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Данные теста личности в том виде, в котором они передаются агентам
+
+    Args:
+        personality_result: Результат теста (из personality_results или PERSONALITY_TYPES)
+
+    Returns:
+        dict | None: Данные для агента или None, если теста нет
+    """
+    if not personality_result:
+        return None
+    return {
+        "code": personality_result.get("code"),
+        "personality_type": personality_result.get("personality_type"),
+        "description": personality_result.get("description"),
+        "full_description": personality_result.get("full_description"),
+        "strengths": personality_result.get("strengths"),
+        "weaknesses": personality_result.get("weaknesses"),
+        "career_advice": personality_result.get("career_advice"),
+        "careers": personality_result.get("careers"),
+    }
+
+
+def build_astrology_data(astro_profile: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Астрологический профиль в том виде, в котором он передается агентам
+
+    Args:
+        astro_profile: Профиль из astro_profiles (или построенный по ZODIAC_SIGNS)
+
+    Returns:
+        dict | None: Данные для агента или None, если профиля нет
+    """
+    if not astro_profile:
+        return None
+    return {
+        "zodiac_sign": astro_profile.get("zodiac_sign"),
+        "element": astro_profile.get("element"),
+        "quality": astro_profile.get("quality"),
+        "traits": astro_profile.get("traits"),
+        "careers": astro_profile.get("careers"),
+        "strengths": astro_profile.get("strengths"),
+        "challenges": astro_profile.get("challenges"),
+    }
@@ -1,5 +1,10 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import HTTPException, status
@@ -19,14 +24,14 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     try:
         password_bytes = password.encode('utf-8')
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
         hashed = bcrypt.hashpw(password_bytes, salt)
         return hashed.decode('utf-8')
     except Exception as e:
         print(f"Ошибка при хешировании пароля: {e}")
         try:
             password_bytes = password[:70].encode('utf-8')
-            salt = bcrypt.gensalt()
+            salt = bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)
             hashed = bcrypt.hashpw(password_bytes, salt)
             return hashed.decode('utf-8')
         except Exception as e2:
@@ -37,6 +42,34 @@ def get_password_hash(password: str) -> str:
             )
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Хэш создан с другим числом раундов, чем BCRYPT_ROUNDS"""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+
+# bcrypt занимает сотни миллисекунд CPU; в event loop это останавливало бы все
+# стримы генерации. bcrypt отпускает GIL, поэтому достаточно пула потоков,
+# а его размер ограничивает число одновременных хэширований.
+_password_executor = ThreadPoolExecutor(max_workers=settings.BCRYPT_MAX_WORKERS, thread_name_prefix="bcrypt")
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
+def shutdown_password_executor() -> None:
+    _password_executor.shutdown(wait=True)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -49,15 +82,81 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def verify_token(token: str) -> Optional[str]:
+class _VerifiedTokenCache:
+    """
+    LRU проверенных токенов -> claims
+
+    jwt.decode с проверкой подписи выполнялся на каждый запрос, в том числе на
+    каждую загрузку /vibe/media/... Запись живет до exp токена, невалидные
+    токены не кэшируются.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, claims = entry
+            if time.time() >= expires_at:
+                del self._entries[token]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token: str, claims: Dict[str, Any]) -> None:
+        if self.max_entries <= 0 or "exp" not in claims:
+            return
+        with self._lock:
+            self._entries[token] = (float(claims["exp"]), claims)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+token_cache = _VerifiedTokenCache(settings.TOKEN_CACHE_SIZE)
+
+
+def decode_token(token: str) -> Optional[Dict[str, Any]]:
+    """Claims of a valid, unexpired token (cached until exp), or None"""
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
     except JWTError:
         return None
+    token_cache.put(token, claims)
+    return claims
+
+
+def verify_token(token: str) -> Optional[str]:
+    claims = decode_token(token)
+    if claims is None:
+        return None
+    username: str = claims.get("sub")
+    if username is None:
+        return None
+    return username
 
 
 def authenticate_user(username: str, password: str, get_user_func) -> Optional[dict]:
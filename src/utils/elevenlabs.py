@@ -0,0 +1,210 @@
+import os
+import uuid
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, AsyncIterator, Set
+
+import httpx
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+ELEVENLABS_API_URL = "https://api.elevenlabs.io/v1"
+DEFAULT_OUTPUT_FORMAT = "mp3_44100_128"
+
+# Общий HTTP клиент (создается лениво, закрывается в lifespan)
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Фоновые загрузки файлов при потоковой отдаче (tee) - дописываются и после отключения клиента
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=ELEVENLABS_API_URL,
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _background_tasks:
+        await asyncio.gather(*_background_tasks, return_exceptions=True)
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+class ElevenLabsError(Exception):
+    """Ошибка ответа ElevenLabs API"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _FileWriter:
+    """
+    Запись потока во временный файл рядом с целевым
+    Файл появляется под итоговым именем только после полной загрузки
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}.part")
+        self.file = open(self.tmp_path, "wb")
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self) -> Path:
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def discard(self) -> None:
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class AsyncElevenLabsClient:
+    """
+    Асинхронный клиент ElevenLabs на общем httpx.AsyncClient
+
+    Аудио не буферизуется в памяти целиком: чанки ответа сразу пишутся на диск,
+    а при stream=True одновременно отдаются клиенту (tee).
+    """
+
+    def __init__(self, api_key: Optional[str] = None, http_client: Optional[httpx.AsyncClient] = None):
+        self.api_key = api_key or settings.ELEVENLABS_API_KEY
+        if not self.api_key:
+            raise ElevenLabsError("ElevenLabs API key not configured")
+        self.client = http_client or get_http_client()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "xi-api-key": self.api_key,
+            "Content-Type": "application/json",
+        }
+
+    async def _open(self, url: str, payload: Dict[str, Any], params: Dict[str, Any]) -> httpx.Response:
+        """Open a streamed POST response; raises ElevenLabsError on a non-200 status"""
+        request = self.client.build_request("POST", url, headers=self.headers, json=payload, params=params)
+        response = await self.client.send(request, stream=True)
+        if response.status_code != 200:
+            try:
+                body = (await response.aread()).decode("utf-8", errors="replace")
+            finally:
+                await response.aclose()
+            raise ElevenLabsError(f"ElevenLabs API error: {body}", status_code=response.status_code)
+        return response
+
+    async def open_sound(
+        self,
+        text: str,
+        duration_seconds: Optional[float] = None,
+        loop: bool = False,
+        prompt_influence: Optional[float] = None,
+        model_id: str = "eleven_text_to_sound_v2",
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+    ) -> httpx.Response:
+        """Start sound effect generation, return the open streamed response"""
+        payload: Dict[str, Any] = {
+            "text": text,
+            "duration_seconds": duration_seconds,
+            "model_id": model_id,
+            "loop": loop,
+        }
+        if prompt_influence is not None:
+            payload["prompt_influence"] = prompt_influence
+        return await self._open("/sound-generation", payload, {"output_format": output_format})
+
+    async def open_speech(
+        self,
+        text: str,
+        voice_id: str,
+        model_id: str = "eleven_multilingual_v2",
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+    ) -> httpx.Response:
+        """Start text-to-speech via the streaming endpoint, return the open streamed response"""
+        payload = {
+            "text": text,
+            "model_id": model_id,
+        }
+        return await self._open(f"/text-to-speech/{voice_id}/stream", payload, {"output_format": output_format})
+
+    async def save(self, response: httpx.Response, path: Path) -> Path:
+        """Write an open response to disk chunk by chunk"""
+        writer = _FileWriter(path)
+        try:
+            async for chunk in response.aiter_bytes():
+                writer.write(chunk)
+        except BaseException:
+            writer.discard()
+            raise
+        finally:
+            await response.aclose()
+        return writer.commit()
+
+    def tee(self, response: httpx.Response, path: Path) -> AsyncIterator[bytes]:
+        """
+        Yield response chunks to the caller while writing them to disk.
+
+        The download runs in a background task started right away, so the
+        file is completed and the response (with its pooled connection) is
+        closed even if the consumer stops early or never starts iterating
+        (client disconnected before the first chunk).
+        """
+        chunks: asyncio.Queue = asyncio.Queue()
+        task = asyncio.create_task(self._download(response, _FileWriter(path), chunks))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        return self._relay(chunks)
+
+    async def _download(self, response: httpx.Response, writer: _FileWriter, chunks: asyncio.Queue) -> None:
+        try:
+            async for chunk in response.aiter_bytes():
+                writer.write(chunk)
+                chunks.put_nowait(chunk)
+            writer.commit()
+        except asyncio.CancelledError:
+            writer.discard()
+            raise
+        except Exception as e:
+            writer.discard()
+            logger.warning(f"Could not finish ElevenLabs download to {writer.path}: {str(e)}")
+            chunks.put_nowait(e)
+        finally:
+            await response.aclose()
+            chunks.put_nowait(None)
+
+    @staticmethod
+    async def _relay(chunks: asyncio.Queue) -> AsyncIterator[bytes]:
+        while True:
+            item = await chunks.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    async def generate_sound_to_file(self, path: Path, text: str, **kwargs) -> Path:
+        """Generate a sound effect and stream it straight to a file"""
+        return await self.save(await self.open_sound(text, **kwargs), path)
+
+    async def text_to_speech_to_file(self, path: Path, text: str, voice_id: str, **kwargs) -> Path:
+        """Generate speech and stream it straight to a file"""
+        return await self.save(await self.open_speech(text, voice_id, **kwargs), path)
@@ -1,12 +1,115 @@
 import json
 import time
+import asyncio
 import base64
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
+import httpx
 import requests
 
 from src.config import settings
 
+# Общий HTTP клиент для асинхронного API (создается лениво, закрывается в lifespan)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    global _http_client
+    if _http_client is not None and not _http_client.is_closed:
+        await _http_client.aclose()
+    _http_client = None
+
+
+def _auth_headers(api_key: str, secret_key: str) -> Dict[str, str]:
+    return {
+        'X-Key': f'Key {api_key}',
+        'X-Secret': f'Secret {secret_key}',
+    }
+
+
+def _build_generate_params(
+    prompt: str,
+    images: int,
+    width: int,
+    height: int,
+    style: Optional[str],
+    negative_prompt: Optional[str],
+) -> Dict[str, Any]:
+    """
+    Проверка параметров генерации и сборка params для pipeline/run
+    Общая для синхронного и асинхронного клиента
+    """
+    if len(prompt) > 1000:
+        raise ValueError("Промпт не должен превышать 1000 символов")
+    
+    if images != 1:
+        raise ValueError("Можно генерировать только 1 изображение за раз")
+    
+    if width > 1024 or height > 1024:
+        raise ValueError("Максимальный размер изображения 1024x1024")
+    
+    if width % 64 != 0 or height % 64 != 0:
+        raise ValueError("Размеры должны быть кратны 64")
+    
+    params = {
+        "type": "GENERATE",
+        "numImages": images,
+        "width": width,
+        "height": height,
+        "generateParams": {
+            "query": prompt
+        }
+    }
+    
+    if style:
+        params["style"] = style
+    
+    if negative_prompt:
+        params["negativePromptDecoder"] = negative_prompt
+    
+    return params
+
+
+def _parse_status(data: Dict[str, Any]) -> Optional[List[str]]:
+    """
+    Разбор ответа pipeline/status
+    
+    Returns:
+        List[str]: Файлы, если генерация завершена; None, если еще в процессе
+    """
+    status = data.get('status')
+    
+    if status == 'DONE':
+        result = data.get('result', {})
+        
+        # Проверка на цензуру
+        if result.get('censored', False):
+            raise ValueError("Изображение не прошло модерацию контента")
+        
+        files = result.get('files')
+        if files:
+            return files
+        raise ValueError("Генерация завершена, но файлы не получены")
+    
+    if status == 'FAIL':
+        error = data.get('errorDescription', 'Неизвестная ошибка')
+        raise ValueError(f"Ошибка генерации: {error}")
+    
+    if status == 'INITIAL' or status == 'PROCESSING':
+        return None
+    
+    raise ValueError(f"Неизвестный статус: {status}")
+
 
 class FusionBrainAPI:
     """
@@ -22,10 +125,7 @@ class FusionBrainAPI:
         if not self.API_KEY or not self.SECRET_KEY:
             raise ValueError("Fusion Brain API ключи не настроены в переменных окружения")
         
-        self.AUTH_HEADERS = {
-            'X-Key': f'Key {self.API_KEY}',
-            'X-Secret': f'Secret {self.SECRET_KEY}',
-        }
+        self.AUTH_HEADERS = _auth_headers(self.API_KEY, self.SECRET_KEY)
 
     def get_pipeline(self) -> str:
         """
@@ -71,33 +171,7 @@ class FusionBrainAPI:
         Returns:
             str: UUID задачи генерации
         """
-        if len(prompt) > 1000:
-            raise ValueError("Промпт не должен превышать 1000 символов")
-        
-        if images != 1:
-            raise ValueError("Можно генерировать только 1 изображение за раз")
-        
-        if width > 1024 or height > 1024:
-            raise ValueError("Максимальный размер изображения 1024x1024")
-        
-        if width % 64 != 0 or height % 64 != 0:
-            raise ValueError("Размеры должны быть кратны 64")
-        
-        params = {
-            "type": "GENERATE",
-            "numImages": images,
-            "width": width,
-            "height": height,
-            "generateParams": {
-                "query": prompt
-            }
-        }
-        
-        if style:
-            params["style"] = style
-        
-        if negative_prompt:
-            params["negativePromptDecoder"] = negative_prompt
+        params = _build_generate_params(prompt, images, width, height, style, negative_prompt)
 
         data = {
             'pipeline_id': (None, pipeline_id),
@@ -143,33 +217,14 @@ class FusionBrainAPI:
                     timeout=15  # Таймаут для запроса
                 )
                 response.raise_for_status()
-                data = response.json()
                 
-                status = data.get('status')
+                files = _parse_status(response.json())
+                if files is not None:
+                    return files
                 
-                if status == 'DONE':
-                    result = data.get('result', {})
-                    
-                    # Проверка на цензуру
-                    if result.get('censored', False):
-                        raise ValueError("Изображение не прошло модерацию контента")
-                    
-                    files = result.get('files')
-                    if files:
-                        return files
-                    else:
-                        raise ValueError("Генерация завершена, но файлы не получены")
-                
-                elif status == 'FAIL':
-                    error = data.get('errorDescription', 'Неизвестная ошибка')
-                    raise ValueError(f"Ошибка генерации: {error}")
-                
-                elif status == 'INITIAL' or status == 'PROCESSING':
-                    attempts -= 1
-                    if attempts > 0:
-                        time.sleep(delay)
-                else:
-                    raise ValueError(f"Неизвестный статус: {status}")
+                attempts -= 1
+                if attempts > 0:
+                    time.sleep(delay)
                     
             except requests.exceptions.HTTPError as e:
                 # Если 403 или другая HTTP ошибка - прерываем цикл
@@ -264,3 +319,204 @@ class FusionBrainAPI:
         response.raise_for_status()
         return response.json()
 
+
+class AsyncFusionBrainAPI:
+    """
+    Асинхронный клиент Fusion Brain API (Kandinsky)
+    
+    Работает поверх общего httpx.AsyncClient и не блокирует event loop:
+    ожидание результата - asyncio.sleep, отмена задачи (CancelledError)
+    прерывает опрос статуса сразу. Правила валидации те же, что у FusionBrainAPI.
+    """
+
+    def __init__(
+        self,
+        url: str = None,
+        api_key: str = None,
+        secret_key: str = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.URL = url or settings.FUSION_BRAIN_API_URL
+        self.API_KEY = api_key or settings.FUSION_BRAIN_API_KEY
+        self.SECRET_KEY = secret_key or settings.FUSION_BRAIN_SECRET_KEY
+        
+        if not self.API_KEY or not self.SECRET_KEY:
+            raise ValueError("Fusion Brain API ключи не настроены в переменных окружения")
+        
+        self.AUTH_HEADERS = _auth_headers(self.API_KEY, self.SECRET_KEY)
+        self.client = http_client or get_http_client()
+
+    async def get_pipeline(self) -> str:
+        """
+        Получение ID доступной модели генерации
+        
+        Returns:
+            str: UUID модели Kandinsky
+        """
+        response = await self.client.get(
+            self.URL + 'key/api/v1/pipelines',
+            headers=self.AUTH_HEADERS
+        )
+        response.raise_for_status()
+        data = response.json()
+        
+        if not data:
+            raise ValueError("Нет доступных моделей")
+        
+        return data[0]['id']
+
+    async def generate(
+        self,
+        prompt: str,
+        pipeline_id: str,
+        images: int = 1,
+        width: int = 1024,
+        height: int = 1024,
+        style: Optional[str] = None,
+        negative_prompt: Optional[str] = None
+    ) -> str:
+        """
+        Запуск генерации изображения
+        
+        Returns:
+            str: UUID задачи генерации
+        """
+        params = _build_generate_params(prompt, images, width, height, style, negative_prompt)
+        
+        files = {
+            'pipeline_id': (None, pipeline_id),
+            'params': (None, json.dumps(params), 'application/json')
+        }
+        
+        response = await self.client.post(
+            self.URL + 'key/api/v1/pipeline/run',
+            headers=self.AUTH_HEADERS,
+            files=files
+        )
+        response.raise_for_status()
+        result = response.json()
+        
+        if 'uuid' not in result:
+            raise ValueError(f"Ошибка запуска генерации: {result}")
+        
+        return result['uuid']
+
+    async def get_status(self, request_id: str) -> Optional[List[str]]:
+        """
+        Однократная проверка статуса генерации
+        
+        Returns:
+            List[str]: Список base64 изображений или None, если генерация еще идет
+        """
+        response = await self.client.get(
+            self.URL + 'key/api/v1/pipeline/status/' + request_id,
+            headers=self.AUTH_HEADERS,
+            timeout=15
+        )
+        response.raise_for_status()
+        return _parse_status(response.json())
+
+    async def check_generation(
+        self,
+        request_id: str,
+        attempts: int = 30,
+        delay: int = 10
+    ) -> Optional[List[str]]:
+        """
+        Ожидание результата генерации
+        
+        Args:
+            request_id: UUID задачи генерации
+            attempts: Количество попыток проверки
+            delay: Задержка между попытками в секундах
+            
+        Returns:
+            List[str]: Список base64 изображений
+        """
+        max_attempts = attempts
+        while attempts > 0:
+            try:
+                files = await self.get_status(request_id)
+                if files is not None:
+                    return files
+                
+            except httpx.HTTPStatusError as e:
+                # Если 403 или другая HTTP ошибка - прерываем цикл
+                if e.response.status_code == 403:
+                    raise ValueError("API отклонил запрос (403 Forbidden). Возможно превышен лимит запросов.")
+                elif e.response.status_code < 500:
+                    raise ValueError(f"HTTP ошибка: {e.response.status_code}")
+                # Серверная ошибка - можем попробовать еще раз
+                if attempts <= 1:
+                    raise ValueError(f"Серверная ошибка API: {e.response.status_code}")
+                
+            except httpx.RequestError as e:
+                # Другие ошибки сети
+                if attempts <= 1:
+                    raise ValueError(f"Ошибка сети: {str(e)}")
+            
+            attempts -= 1
+            if attempts > 0:
+                await asyncio.sleep(delay)
+        
+        raise TimeoutError(f"Превышено время ожидания генерации ({max_attempts * delay} сек)")
+
+    async def generate_image(
+        self,
+        prompt: str,
+        width: int = 1024,
+        height: int = 1024,
+        style: Optional[str] = None,
+        negative_prompt: Optional[str] = None,
+        attempts: int = 30,
+        delay: int = 10
+    ) -> str:
+        """
+        Полный цикл генерации изображения
+        
+        Returns:
+            str: Base64 изображение
+        """
+        pipeline_id = await self.get_pipeline()
+        
+        uuid = await self.generate(
+            prompt=prompt,
+            pipeline_id=pipeline_id,
+            images=1,
+            width=width,
+            height=height,
+            style=style,
+            negative_prompt=negative_prompt
+        )
+        
+        files = await self.check_generation(uuid, attempts=attempts, delay=delay)
+        
+        if not files or len(files) == 0:
+            raise ValueError("Не удалось получить сгенерированное изображение")
+        
+        return files[0]
+
+    async def check_availability(self) -> dict:
+        """
+        Проверка доступности сервиса
+        
+        Returns:
+            dict: Статус сервиса
+        """
+        response = await self.client.get(
+            self.URL + 'key/api/v1/pipeline/availability',
+            headers=self.AUTH_HEADERS
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def get_styles(self) -> List[dict]:
+        """
+        Получение списка доступных стилей
+        
+        Returns:
+            List[dict]: Список стилей
+        """
+        response = await self.client.get('https://cdn.fusionbrain.ai/static/styles/key')
+        response.raise_for_status()
+        return response.json()
@@ -0,0 +1,293 @@
+"""
+FusionBrainJobManager - фоновый менеджер задач генерации Fusion Brain
+
+Раньше каждый вызов generate_image запрашивал pipeline, запускал задачу и
+сам опрашивал ее статус каждые 10 секунд в собственном цикле. Менеджер:
+- кэширует ID pipeline
+- принимает задачи и возвращает future с результатом
+- опрашивает статусы всех незавершенных задач из одного фонового цикла
+- подстраивает интервал опроса под наблюдаемое время генерации: первая
+  проверка - около исторической медианы (p50), дальше - короткие повторы
+
+Жизненный цикл управляется из lifespan в main.py:
+    await fusion_brain_jobs.start()
+    ...
+    await fusion_brain_jobs.stop()
+
+Использование:
+    image_base64 = await fusion_brain_jobs.generate_image(prompt, width=448, height=448, timeout=100)
+"""
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+
+from src.utils.fusion_brain import AsyncFusionBrainAPI
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    __slots__ = ("uuid", "future", "submitted_at", "deadline", "next_poll_at", "polls")
+
+    def __init__(self, uuid: str, future: asyncio.Future, submitted_at: float, deadline: float, next_poll_at: float):
+        self.uuid = uuid
+        self.future = future
+        self.submitted_at = submitted_at
+        self.deadline = deadline
+        self.next_poll_at = next_poll_at
+        self.polls = 0
+
+
+class FusionBrainJobManager:
+    """Submits Fusion Brain jobs and resolves them from a single polling loop"""
+
+    def __init__(
+        self,
+        default_delay: float = 10.0,
+        min_interval: float = 2.0,
+        max_interval: float = 10.0,
+        pipeline_ttl: float = 3600.0,
+        max_parallel_polls: int = 10,
+        history_size: int = 200,
+        min_samples: int = 5,
+    ):
+        self.default_delay = default_delay
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.pipeline_ttl = pipeline_ttl
+        self.max_parallel_polls = max_parallel_polls
+        self.min_samples = min_samples
+
+        self._api: Optional[AsyncFusionBrainAPI] = None
+        self._pipeline_id: Optional[str] = None
+        self._pipeline_fetched_at = 0.0
+        self._pipeline_lock = asyncio.Lock()
+
+        self._jobs: Dict[str, _Job] = {}
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+
+        # Время от запуска до готовности для последних задач, секунды
+        self._durations: Deque[float] = deque(maxlen=history_size)
+
+        self.jobs_submitted = 0
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.status_requests = 0
+
+    # --- жизненный цикл ----------------------------------------------------
+
+    async def start(self) -> None:
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+        for job in self._jobs.values():
+            if not job.future.done():
+                job.future.cancel()
+        self._jobs.clear()
+        self._api = None
+
+    def _get_api(self) -> AsyncFusionBrainAPI:
+        if self._api is None:
+            self._api = AsyncFusionBrainAPI()
+        return self._api
+
+    async def _get_pipeline_id(self) -> str:
+        async with self._pipeline_lock:
+            if self._pipeline_id is None or time.monotonic() - self._pipeline_fetched_at > self.pipeline_ttl:
+                self._pipeline_id = await self._get_api().get_pipeline()
+                self._pipeline_fetched_at = time.monotonic()
+            return self._pipeline_id
+
+    # --- адаптивный интервал ----------------------------------------------
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if len(self._durations) < self.min_samples:
+            return None
+        return statistics.quantiles(self._durations, n=100, method="inclusive")[int(q * 100) - 1]
+
+    def _first_delay(self) -> float:
+        p50 = self._percentile(0.5)
+        return p50 if p50 is not None else self.default_delay
+
+    def _retry_interval(self) -> float:
+        # После первой проверки опрашиваем чаще: большинство задач уже близки к готовности
+        p50 = self._percentile(0.5)
+        if p50 is None:
+            return self.default_delay
+        return min(self.max_interval, max(self.min_interval, p50 / 8))
+
+    # --- API ---------------------------------------------------------------
+
+    async def submit(
+        self,
+        prompt: str,
+        width: int = 1024,
+        height: int = 1024,
+        style: Optional[str] = None,
+        negative_prompt: Optional[str] = None,
+        timeout: float = 300.0,
+    ) -> asyncio.Future:
+        """Start a generation job, return a future resolved with the list of base64 files"""
+        await self.start()
+
+        api = self._get_api()
+        pipeline_id = await self._get_pipeline_id()
+        try:
+            uuid = await api.generate(
+                prompt=prompt,
+                pipeline_id=pipeline_id,
+                images=1,
+                width=width,
+                height=height,
+                style=style,
+                negative_prompt=negative_prompt,
+            )
+        except httpx.HTTPStatusError:
+            # Возможно, pipeline сменился - при следующем запуске запросим заново
+            self._pipeline_id = None
+            raise
+
+        now = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        self._jobs[uuid] = _Job(
+            uuid=uuid,
+            future=future,
+            submitted_at=now,
+            deadline=now + timeout,
+            next_poll_at=now + min(self._first_delay(), timeout),
+        )
+        self.jobs_submitted += 1
+        self._wakeup.set()
+        return future
+
+    async def generate_image(
+        self,
+        prompt: str,
+        width: int = 1024,
+        height: int = 1024,
+        style: Optional[str] = None,
+        negative_prompt: Optional[str] = None,
+        timeout: float = 300.0,
+    ) -> str:
+        """Full generation cycle through the manager, returns a base64 image"""
+        future = await self.submit(prompt, width, height, style, negative_prompt, timeout)
+        files = await future
+
+        if not files or len(files) == 0:
+            raise ValueError("Не удалось получить сгенерированное изображение")
+
+        return files[0]
+
+    # --- фоновый цикл ------------------------------------------------------
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                now = time.monotonic()
+                # Отмененные вызывающей стороной задачи больше не опрашиваем
+                for uuid in [u for u, job in self._jobs.items() if job.future.done()]:
+                    del self._jobs[uuid]
+
+                if not self._jobs:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                wake_at = min(min(job.next_poll_at, job.deadline) for job in self._jobs.values())
+                if wake_at > now:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=wake_at - now)
+                    except TimeoutError:
+                        pass
+                    continue
+
+                due = [job for job in self._jobs.values() if job.next_poll_at <= now or job.deadline <= now]
+                for i in range(0, len(due), self.max_parallel_polls):
+                    await asyncio.gather(*(self._poll_job(job) for job in due[i:i + self.max_parallel_polls]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Fusion Brain polling loop error: {str(e)}")
+                await asyncio.sleep(self.min_interval)
+
+    async def _poll_job(self, job: _Job) -> None:
+        if job.future.done():
+            return
+
+        now = time.monotonic()
+        try:
+            self.status_requests += 1
+            job.polls += 1
+            files = await self._get_api().get_status(job.uuid)
+        except httpx.HTTPStatusError as e:
+            code = e.response.status_code
+            if code == 403:
+                self._fail(job, ValueError("API отклонил запрос (403 Forbidden). Возможно превышен лимит запросов."))
+                return
+            if code < 500:
+                self._fail(job, ValueError(f"HTTP ошибка: {code}"))
+                return
+            files = None  # серверная ошибка - повторим позже
+        except httpx.RequestError:
+            files = None  # ошибка сети - повторим позже
+        except ValueError as e:
+            # FAIL, цензура или неизвестный статус
+            self._fail(job, e)
+            return
+        except Exception as e:
+            logger.warning(f"Fusion Brain status check for {job.uuid} failed: {str(e)}")
+            files = None
+
+        if files is not None:
+            self._durations.append(time.monotonic() - job.submitted_at)
+            self.jobs_completed += 1
+            self._jobs.pop(job.uuid, None)
+            if not job.future.done():
+                job.future.set_result(files)
+            return
+
+        if now >= job.deadline:
+            waited = now - job.submitted_at
+            self._fail(job, TimeoutError(f"Превышено время ожидания генерации ({waited:.0f} сек)"))
+            return
+
+        job.next_poll_at = min(now + self._retry_interval(), job.deadline)
+
+    def _fail(self, job: _Job, error: Exception) -> None:
+        self.jobs_failed += 1
+        self._jobs.pop(job.uuid, None)
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    def stats(self) -> Dict[str, Any]:
+        p50 = self._percentile(0.5)
+        p90 = self._percentile(0.9)
+        completed = self.jobs_completed
+        return {
+            "running": self._loop_task is not None and not self._loop_task.done(),
+            "pending_jobs": len(self._jobs),
+            "jobs_submitted": self.jobs_submitted,
+            "jobs_completed": completed,
+            "jobs_failed": self.jobs_failed,
+            "status_requests": self.status_requests,
+            "status_requests_per_job": round(self.status_requests / completed, 2) if completed else 0.0,
+            "duration_p50": round(p50, 2) if p50 is not None else None,
+            "duration_p90": round(p90, 2) if p90 is not None else None,
+            "first_poll_delay": round(self._first_delay(), 2),
+            "retry_interval": round(self._retry_interval(), 2),
+        }
+
+
+fusion_brain_jobs = FusionBrainJobManager()
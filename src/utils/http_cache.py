@@ -0,0 +1,88 @@
+"""
+Отдача файлов с HTTP кэшированием
+
+FileResponse сам обрабатывает Range/If-Range (206 Partial Content) и HEAD,
+но не отвечает 304 и по умолчанию ставит слабый ETag из mtime и размера.
+file_response добавляет:
+- сильный ETag (контрольная сумма из каталога медиа или хэш из имени файла)
+- 304 Not Modified по If-None-Match / If-Modified-Since
+- Cache-Control: immutable для файлов, содержимое которых по имени не меняется
+
+Использование:
+    return file_response(request, path, "audio/mpeg", etag=checksum, immutable=True)
+"""
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional, Union
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+# Год - максимум, который имеет смысл для max-age. private: в URL медиа есть токен
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as RFC 9110 requires for If-None-Match"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _not_modified(request: Request, etag: Optional[str], mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-Modified-Since игнорируется, если есть If-None-Match
+        return etag is not None and _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def file_response(
+    request: Request,
+    path: Union[str, Path],
+    media_type: str,
+    filename: Optional[str] = None,
+    etag: Optional[str] = None,
+    immutable: bool = False,
+) -> Response:
+    """
+    FileResponse with validators and conditional request handling
+
+    Args:
+        etag: Content checksum or another value that changes whenever the file
+              content does; sent as a strong ETag. Without it the weak
+              mtime/size ETag of FileResponse is used.
+        immutable: The file behind this URL never changes (content-addressed)
+    """
+    stat = os.stat(path)
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+    }
+    if etag is not None:
+        headers["ETag"] = f'"{etag}"'
+
+    response = FileResponse(path=path, media_type=media_type, filename=filename, headers=headers, stat_result=stat)
+
+    if _not_modified(request, response.headers.get("etag"), stat.st_mtime):
+        not_modified_headers = {
+            name: response.headers[name]
+            for name in ("etag", "last-modified", "cache-control")
+            if name in response.headers
+        }
+        return Response(status_code=304, headers=not_modified_headers)
+
+    return response
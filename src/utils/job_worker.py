@@ -0,0 +1,193 @@
+"""
+JobWorker - выполнение задач генерации из очереди (jobs_db)
+
+Воркер берет задачи в аренду и выполняет до JOB_WORKER_CONCURRENCY задач
+одновременно. Пока задача выполняется, аренда продлевается каждую треть
+JOB_LEASE_SECONDS; если продлить не удалось (аренда истекла и задачу забрал
+другой воркер), выполнение отменяется. Ошибка возвращает задачу в очередь,
+пока не исчерпаны попытки; JobError завершает ее сразу.
+
+Обработчик получает задачу и report(progress) - прогресс сохраняется в
+jobs.progress и отдается клиенту через GET /jobs/{job_id}/stream.
+
+При остановке выполняемые задачи отменяются и возвращаются в очередь без
+траты попытки - их продолжит следующий запуск воркера.
+
+Обычно запускается отдельным процессом (worker.py), с JOBS_RUN_IN_APP=true -
+из lifespan в main.py:
+    await job_worker.start()
+    ...
+    await job_worker.stop()
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from src.database.async_db import (
+    claim_job,
+    renew_lease,
+    update_job_progress,
+    complete_job,
+    fail_job,
+    release_job,
+)
+
+logger = logging.getLogger(__name__)
+
+ProgressReporter = Callable[[Dict[str, Any]], Awaitable[None]]
+JobHandler = Callable[[Dict[str, Any], ProgressReporter], Awaitable[Dict[str, Any]]]
+
+
+class JobError(Exception):
+    """Permanent job failure: the job is marked failed without further attempts"""
+
+
+class JobWorker:
+    """Claims queued jobs and runs them with lease renewal and bounded concurrency"""
+
+    def __init__(
+        self,
+        handlers: Dict[str, JobHandler],
+        concurrency: int = 2,
+        lease_seconds: float = 60.0,
+        poll_interval: float = 1.0,
+        worker_id: Optional[str] = None,
+    ):
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._slots = asyncio.Semaphore(concurrency)
+        self._loop_task: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+        self.jobs_succeeded = 0
+        self.jobs_failed = 0
+        self.jobs_retried = 0
+        self.leases_lost = 0
+
+    # --- жизненный цикл ----------------------------------------------------
+
+    async def start(self) -> None:
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._loop())
+            logger.info(f"Job worker {self.worker_id} started ({self.concurrency} slots, kinds: {list(self.handlers)})")
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+
+        # Незавершенные задачи возвращаются в очередь в _run
+        for task in list(self._running):
+            task.cancel()
+        await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def _loop(self) -> None:
+        kinds = list(self.handlers)
+        while True:
+            await self._slots.acquire()
+            try:
+                job = await claim_job(self.worker_id, kinds, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Failed to claim a job: {str(e)}", exc_info=True)
+                job = None
+
+            if job is None:
+                self._slots.release()
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            task = asyncio.create_task(self._run(job))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    # --- выполнение задачи -------------------------------------------------
+
+    async def _keep_lease(self, job_id: str, handler_task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                renewed = await renew_lease(job_id, self.worker_id, self.lease_seconds)
+            except Exception as e:
+                # Временная ошибка БД - попробуем при следующем продлении
+                logger.warning(f"Failed to renew lease of job {job_id}: {str(e)}")
+                continue
+            if not renewed:
+                self.leases_lost += 1
+                logger.warning(f"Lost lease of job {job_id}, cancelling it")
+                handler_task.cancel()
+                return
+
+    def _reporter(self, job_id: str) -> ProgressReporter:
+        async def report(progress: Dict[str, Any]) -> None:
+            try:
+                await update_job_progress(job_id, self.worker_id, progress)
+            except Exception as e:
+                # Прогресс не должен ронять генерацию
+                logger.warning(f"Failed to update progress of job {job_id}: {str(e)}")
+        return report
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        started = time.monotonic()
+        handler_task = asyncio.create_task(self.handlers[job["kind"]](job, self._reporter(job_id)))
+        lease_task = asyncio.create_task(self._keep_lease(job_id, handler_task))
+        try:
+            try:
+                result = await asyncio.shield(handler_task)
+            finally:
+                lease_task.cancel()
+
+            await complete_job(job_id, self.worker_id, result)
+            self.jobs_succeeded += 1
+            logger.info(f"Job {job_id} ({job['kind']}) succeeded in {time.monotonic() - started:.1f}s")
+
+        except asyncio.CancelledError:
+            if not handler_task.done():
+                # Остановка воркера: отменяем обработчик и возвращаем задачу в очередь
+                handler_task.cancel()
+                await asyncio.gather(handler_task, return_exceptions=True)
+                await release_job(job_id, self.worker_id)
+                logger.info(f"Job {job_id} released back to the queue")
+                raise
+            # Обработчик отменен после потери аренды - задачей уже владеет другой воркер
+
+        except JobError as e:
+            await fail_job(job_id, self.worker_id, str(e), retry=False)
+            self.jobs_failed += 1
+            logger.warning(f"Job {job_id} ({job['kind']}) failed permanently: {str(e)}")
+
+        except Exception as e:
+            retried = job["attempts"] < job["max_attempts"]
+            await fail_job(job_id, self.worker_id, str(e), retry=True)
+            if retried:
+                self.jobs_retried += 1
+            else:
+                self.jobs_failed += 1
+            logger.error(
+                f"Job {job_id} ({job['kind']}) attempt {job['attempts']}/{job['max_attempts']} failed: {str(e)}",
+                exc_info=True
+            )
+
+        finally:
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "running": self._loop_task is not None and not self._loop_task.done(),
+            "active_jobs": len(self._running),
+            "concurrency": self.concurrency,
+            "jobs_succeeded": self.jobs_succeeded,
+            "jobs_failed": self.jobs_failed,
+            "jobs_retried": self.jobs_retried,
+            "leases_lost": self.leases_lost,
+        }
@@ -0,0 +1,362 @@
+"""
+MediaRetention - фоновая очистка сгенерированных медиа по квотам
+
+Каждая генерация окружений добавляет изображения, звуки, голоса и JSON, а
+data/audio растет от /audio. Сборщик работает небольшими проходами, каждый из
+которых ограничен MEDIA_GC_BATCH операциями:
+- проверяет очередную страницу каталога медиа и удаляет записи без файлов
+- обходит несколько директорий (старые плоские data/ambients/*, data/audio,
+  шарды хранилища): удаляет брошенные временные .part файлы и добавляет в
+  каталог файлы, которых в нем нет (владелец неизвестен), чтобы они
+  учитывались в квотах
+- при превышении квоты пользователя или общей квоты удаляет давно не
+  использованные файлы (LRU по времени последнего обращения)
+
+Не удаляются: шаблоны (template_*), файлы моложе MEDIA_GC_MIN_AGE, сохраненные
+JSON окружений (на них ссылаются результаты задач и ответы, уже отданные
+клиентам) и медиа, на которые ссылается JSON (media_refs). Они учитываются в
+квотах, но место под квоту освобождается только за счет остальных файлов.
+
+Ссылки JSON, сохраненных до появления media_refs, восстанавливаются по их
+промптам (имена файлов в хранилище и старые имена по ID генерации). Пока все
+JSON окружений не пройдены, квоты не применяются.
+
+Жизненный цикл управляется из lifespan в main.py:
+    await media_retention.start()
+    ...
+    await media_retention.stop()
+
+Разовый запуск: python media_gc.py
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from src.config import settings
+from src.database import media_db
+from src.database.async_db import run_db
+from src.utils.media_store import media_store, image_key, sound_key, speech_key
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# Директории вне хранилища: путь -> вид в каталоге медиа
+LEGACY_DIRS: Dict[str, str] = {
+    "data/ambients/images": "images",
+    "data/ambients/sounds": "sounds",
+    "data/ambients/voices": "voices",
+    "data/ambients/results": "results",
+    "data/audio": "audio",
+}
+
+RESULTS_DIR = Path("data/ambients/results")
+
+# Виды, которые сборщик не удаляет: JSON окружений защищает свои медиа, пока существует
+PROTECTED_KINDS = ("results",)
+
+# Поле с промптом в JSON окружений -> (префикс старого имени, расширение, вид, ключ)
+# Параметры ключей совпадают с генерацией в vibe_routes
+RESULT_MEDIA_FIELDS: Dict[str, Tuple[str, str, str, Callable[[str], str]]] = {
+    "image_prompt": ("img", "jpg", "images", lambda prompt: image_key(prompt, width=448, height=448)),
+    "sound_prompt": ("sound", "mp3", "sounds", lambda prompt: sound_key(prompt, duration_seconds=8.0, loop=True)),
+    "voice": ("voice", "mp3", "voices", lambda text: speech_key(text, voice_id="JBFqnCBsd6RMkjVDRZzb")),
+}
+
+
+def result_media_refs(result_path: Path) -> List[Tuple[str, str]]:
+    """
+    Media files a saved ambients JSON points to: the store name derived from
+    each prompt and the legacy per-generation name (ambients_<generation_id>.json
+    -> img_<generation_id>_<n>.jpg); a missing file is simply never matched
+    """
+    with open(result_path, encoding="utf-8") as f:
+        ambients = json.load(f).get("ambients", [])
+
+    generation_id = result_path.stem[len("ambients_"):]
+    refs = []
+    for i, ambient in enumerate(ambients):
+        for field, (prefix, ext, kind, make_key) in RESULT_MEDIA_FIELDS.items():
+            prompt = ambient.get(field)
+            if prompt:
+                refs.append((kind, media_store.filename(make_key(prompt), ext)))
+                refs.append((kind, f"{prefix}_{generation_id}_{i+1}.{ext}"))
+    return refs
+
+
+class MediaRetention:
+    """Incremental quota-based eviction and orphan cleanup for generated media"""
+
+    def __init__(
+        self,
+        store_root: str,
+        user_quota_bytes: int,
+        total_quota_bytes: int,
+        interval: float = 600.0,
+        batch_size: int = 200,
+        min_age: float = 3600.0,
+        orphan_grace: float = 86400.0,
+        dirs_per_pass: int = 64,
+        dry_run: bool = False,
+    ):
+        self.store_root = Path(store_root)
+        self.user_quota_bytes = user_quota_bytes
+        self.total_quota_bytes = total_quota_bytes
+        self.interval = interval
+        self.batch_size = batch_size
+        self.min_age = min_age
+        self.orphan_grace = orphan_grace
+        self.dirs_per_pass = dirs_per_pass
+        self.dry_run = dry_run
+
+        # Позиции обхода между проходами
+        self._row_cursor: Optional[Tuple[str, str]] = None
+        self._pending_dirs: Deque[Tuple[Path, str]] = deque()
+        self._results_cursor: Optional[str] = None
+        self._refs_ready = False
+
+        self._loop_task: Optional[asyncio.Task] = None
+
+        self.passes = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+        self.missing_rows_removed = 0
+        self.orphans_adopted = 0
+        self.temp_files_removed = 0
+        self.results_linked = 0
+        self.last_pass_at: Optional[float] = None
+        self.last_pass_duration: Optional[float] = None
+
+    # --- жизненный цикл ----------------------------------------------------
+
+    async def start(self) -> None:
+        if self._loop_task is None or self._loop_task.done():
+            self._loop_task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            await asyncio.gather(self._loop_task, return_exceptions=True)
+            self._loop_task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                # Проход синхронный (диск и БД) и выполняется в пуле потоков БД
+                await run_db(self.run_pass)
+            except Exception as e:
+                logger.error(f"Media retention pass failed: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    # --- проход ------------------------------------------------------------
+
+    @property
+    def sweep_complete(self) -> bool:
+        """Catalog pages and directories have all been visited since the last restart of the sweep"""
+        return self._refs_ready and self._row_cursor is None and not self._pending_dirs
+
+    def run_pass(self) -> Dict[str, int]:
+        """One bounded pass; returns the amount of work done by each step"""
+        started = time.monotonic()
+        result = {
+            "result_refs": self._link_saved_results(),
+            "missing_rows": self._remove_missing_rows(),
+            **self._scan_dirs(),
+            "evicted": self._enforce_quotas(),
+        }
+        self.passes += 1
+        self.last_pass_at = time.time()
+        self.last_pass_duration = time.monotonic() - started
+        if any(result.values()):
+            logger.info(f"Media retention pass: {result}")
+        return result
+
+    def _link_result(self, path: Path, mtime: float) -> None:
+        """Catalog a saved ambients JSON (if needed) and protect the media it points to"""
+        if media_db.get_media("results", path.name) is None:
+            media_db.record_media("results", path, created_at=datetime.fromtimestamp(mtime, timezone.utc))
+        try:
+            refs = result_media_refs(path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read media references of {path.name}: {str(e)}")
+            return
+        if refs:
+            media_db.add_media_refs("results", path.name, refs)
+
+    def _link_saved_results(self) -> int:
+        """Restore media_refs of saved ambients JSON (once per process, before any eviction)"""
+        if self._refs_ready:
+            return 0
+
+        try:
+            names = sorted(
+                entry.name for entry in os.scandir(RESULTS_DIR)
+                if entry.is_file() and entry.name.startswith("ambients_") and entry.name.endswith(".json")
+            )
+        except FileNotFoundError:
+            names = []
+        if self._results_cursor is not None:
+            names = [name for name in names if name > self._results_cursor]
+
+        batch = names[:self.batch_size]
+        for name in batch:
+            path = RESULTS_DIR / name
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if not self.dry_run:
+                self._link_result(path, mtime)
+
+        self.results_linked += len(batch)
+        if len(names) <= self.batch_size:
+            self._refs_ready = True
+            self._results_cursor = None
+        else:
+            self._results_cursor = batch[-1]
+        return len(batch)
+
+    def _remove_missing_rows(self) -> int:
+        rows = media_db.get_media_page(self._row_cursor, limit=self.batch_size)
+        # Страница неполная - каталог пройден, следующий проход начнет сначала
+        self._row_cursor = (rows[-1]["kind"], rows[-1]["filename"]) if len(rows) == self.batch_size else None
+
+        removed = 0
+        for media in rows:
+            if not os.path.exists(media["path"]):
+                if not self.dry_run:
+                    media_db.delete_media(media["kind"], media["filename"])
+                removed += 1
+        self.missing_rows_removed += removed
+        return removed
+
+    def _scan_roots(self) -> List[Tuple[Path, str]]:
+        roots = [(Path(path), kind) for path, kind in LEGACY_DIRS.items()]
+        if self.store_root.is_dir():
+            roots += [(entry, entry.name) for entry in sorted(self.store_root.iterdir()) if entry.is_dir()]
+        return roots
+
+    def _scan_dirs(self) -> Dict[str, int]:
+        """Scan the next few directories (breadth-first, resumed on the next pass)"""
+        if not self._pending_dirs:
+            self._pending_dirs.extend(self._scan_roots())
+
+        adopted = temp_removed = 0
+        now = time.time()
+        for _ in range(min(self.dirs_per_pass, len(self._pending_dirs))):
+            directory, kind = self._pending_dirs.popleft()
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+
+            for entry in entries:
+                if entry.is_dir():
+                    self._pending_dirs.append((Path(entry.path), kind))
+                    continue
+                if entry.name.startswith("template_"):
+                    continue
+                try:
+                    mtime = entry.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                # Молодые файлы могут еще записываться или попасть в каталог сами
+                if now - mtime < self.orphan_grace:
+                    continue
+
+                if entry.name.startswith(".") and entry.name.endswith(".part"):
+                    # Недописанный файл прерванной загрузки
+                    if not self.dry_run:
+                        os.unlink(entry.path)
+                    temp_removed += 1
+                elif media_db.get_media(kind, entry.name) is None:
+                    if not self.dry_run:
+                        if kind == "results" and entry.name.endswith(".json"):
+                            self._link_result(Path(entry.path), mtime)
+                        else:
+                            # Время создания - по файлу, чтобы он сразу занял свое место в LRU
+                            media_db.record_media(kind, Path(entry.path), created_at=datetime.fromtimestamp(mtime, timezone.utc))
+                    adopted += 1
+
+        self.orphans_adopted += adopted
+        self.temp_files_removed += temp_removed
+        return {"adopted": adopted, "temp_files": temp_removed}
+
+    def _evict(self, media: Dict[str, Any]) -> None:
+        if not self.dry_run:
+            try:
+                os.unlink(media["path"])
+            except FileNotFoundError:
+                pass
+            media_db.delete_media(media["kind"], media["filename"])
+        self.evicted_files += 1
+        self.evicted_bytes += media["size_bytes"]
+
+    def _evict_until(self, excess: int, budget: int, owner_id: Optional[str] = None) -> int:
+        """Evict least recently used files until excess bytes are freed or budget runs out"""
+        evicted = 0
+        candidates = media_db.get_eviction_candidates(
+            owner_id,
+            min_age_seconds=int(self.min_age),
+            limit=budget,
+            protected_kinds=PROTECTED_KINDS,
+        )
+        for media in candidates:
+            if excess <= 0:
+                break
+            self._evict(media)
+            excess -= media["size_bytes"]
+            evicted += 1
+        return evicted
+
+    def _enforce_quotas(self) -> int:
+        if not self._refs_ready:
+            # Иначе можно удалить медиа старого JSON, ссылки которого еще не восстановлены
+            return 0
+
+        budget = self.batch_size
+        evicted = 0
+
+        for owner_id, used in media_db.get_owners_over_quota(self.user_quota_bytes):
+            if budget <= evicted:
+                break
+            evicted += self._evict_until(used - self.user_quota_bytes, budget - evicted, owner_id)
+
+        total = media_db.get_total_media_bytes()
+        if total > self.total_quota_bytes and evicted < budget:
+            evicted += self._evict_until(total - self.total_quota_bytes, budget - evicted)
+
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._loop_task is not None and not self._loop_task.done(),
+            "passes": self.passes,
+            "evicted_files": self.evicted_files,
+            "evicted_bytes": self.evicted_bytes,
+            "missing_rows_removed": self.missing_rows_removed,
+            "orphans_adopted": self.orphans_adopted,
+            "temp_files_removed": self.temp_files_removed,
+            "results_linked": self.results_linked,
+            "refs_ready": self._refs_ready,
+            "pending_dirs": len(self._pending_dirs),
+            "last_pass_at": self.last_pass_at,
+            "last_pass_duration": round(self.last_pass_duration, 3) if self.last_pass_duration is not None else None,
+        }
+
+
+media_retention = MediaRetention(
+    settings.MEDIA_STORE_DIR,
+    user_quota_bytes=settings.MEDIA_QUOTA_USER_MB * MB,
+    total_quota_bytes=settings.MEDIA_QUOTA_TOTAL_MB * MB,
+    interval=settings.MEDIA_GC_INTERVAL,
+    batch_size=settings.MEDIA_GC_BATCH,
+    min_age=settings.MEDIA_GC_MIN_AGE,
+    orphan_grace=settings.MEDIA_GC_ORPHAN_GRACE,
+)
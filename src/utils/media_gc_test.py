@@ -0,0 +1,76 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Отдельная БД и хранилище во временной директории - до импорта настроек
+WORKDIR = tempfile.mkdtemp(prefix="media_gc_test_")
+os.environ["DATABASE_PATH"] = os.path.join(WORKDIR, "test.db")
+os.environ["MEDIA_STORE_DIR"] = os.path.join(WORKDIR, "media")
+
+from src.database import init_database, media_db
+from src.utils.media_gc import MediaRetention
+
+
+def _write(path: str, data: bytes, age: timedelta) -> Path:
+    """Create a file with its modification time set age ago"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    mtime = time.time() - age.total_seconds()
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def main():
+    """Saved ambients JSON and the media it references survive a pass over quota (no API calls)"""
+
+    init_database()
+    # Пути сборщика (data/ambients/...) относительные
+    os.chdir(WORKDIR)
+
+    old = timedelta(days=30)
+    old_at = datetime.now(timezone.utc) - old
+    generation_id = "tester_20240101_000000"
+
+    # JSON окружений старше всех медиа - первый в LRU, если бы не был защищен
+    result = _write(
+        f"data/ambients/results/ambients_{generation_id}.json",
+        json.dumps({"ambients": [{"id": 1, "image_prompt": "forest"}]}).encode("utf-8"),
+        old + timedelta(days=1),
+    )
+    referenced = _write(f"data/ambients/images/img_{generation_id}_1.jpg", b"r" * 4096, old)
+    orphan = _write("data/ambients/images/img_other_20240101_000000_1.jpg", b"o" * 4096, old)
+    for path in (referenced, orphan):
+        media_db.record_media("images", path, created_at=old_at)
+
+    retention = MediaRetention(
+        os.environ["MEDIA_STORE_DIR"],
+        user_quota_bytes=0,
+        total_quota_bytes=0,
+        min_age=60,
+        orphan_grace=60,
+    )
+    for _ in range(10):
+        retention.run_pass()
+        if retention.sweep_complete:
+            break
+    # Еще несколько проходов при той же нехватке места
+    for _ in range(3):
+        retention.run_pass()
+
+    assert retention.stats()["refs_ready"], retention.stats()
+    assert result.exists(), "saved ambients JSON was evicted"
+    assert media_db.get_media("results", result.name) is not None
+    assert referenced.exists(), "media referenced by a saved JSON was evicted"
+    assert media_db.get_media("images", referenced.name) is not None
+    assert not orphan.exists(), "unreferenced media over quota was kept"
+    assert media_db.get_media("images", orphan.name) is None
+
+    print(f"✅ referenced media survived {retention.passes} passes over quota ({WORKDIR})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+MediaStore - контентно-адресуемое хранилище сгенерированных медиа
+
+Файл адресуется sha256 от (провайдер, модель, промпт, параметры), поэтому
+одинаковый запрос к провайдеру выполняется один раз: хранилище проверяется
+до обращения к API, а одновременные запросы одного ключа ждут общую генерацию.
+
+Раскладка на диске (шардирование по префиксу хэша):
+    data/media/<kind>/ab/cd/abcd...ef.<ext>
+
+Наружу отдается только имя файла (<hash>.<ext>) - по нему путь восстанавливается
+без обращения к БД. Файлы со старыми именами остаются в прежних директориях и
+отдаются оттуда (см. migrate_media.py).
+
+Каждый созданный файл записывается в каталог медиа (таблица media): владелец,
+размер, контрольная сумма, провайдер и время генерации.
+
+Использование:
+    key = media_key("elevenlabs", "eleven_text_to_sound_v2", prompt, {"duration_seconds": 8.0})
+    path = await media_store.get_or_create("sounds", key, "mp3", produce)
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.config import settings
+from src.database import async_db
+from src.database.media_db import MIME_TYPES, is_touch_due
+
+logger = logging.getLogger(__name__)
+
+_STORED_NAME_RE = re.compile(r"^([0-9a-f]{64})\.([a-z0-9]+)$")
+
+
+def media_key(provider: str, model: str, prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """sha256 over the canonical JSON of everything that determines the provider output"""
+    payload = json.dumps(
+        {"provider": provider, "model": model, "prompt": prompt, "params": params or {}},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Ключи провайдеров: параметры должны совпадать с реальным запросом к API,
+# иначе одинаковые запросы не будут найдены в хранилище
+
+def image_key(
+    prompt: str,
+    width: int,
+    height: int,
+    style: Optional[str] = None,
+    negative_prompt: Optional[str] = None,
+) -> str:
+    return media_key("fusion_brain", "kandinsky", prompt, {
+        "width": width,
+        "height": height,
+        "style": style,
+        "negative_prompt": negative_prompt,
+    })
+
+
+def sound_key(
+    prompt: str,
+    duration_seconds: Optional[float],
+    loop: bool = False,
+    prompt_influence: Optional[float] = None,
+    model_id: str = "eleven_text_to_sound_v2",
+    output_format: str = "mp3_44100_128",
+) -> str:
+    return media_key("elevenlabs", model_id, prompt, {
+        "duration_seconds": duration_seconds,
+        "loop": loop,
+        "prompt_influence": prompt_influence,
+        "output_format": output_format,
+    })
+
+
+def speech_key(
+    text: str,
+    voice_id: str,
+    model_id: str = "eleven_multilingual_v2",
+    output_format: str = "mp3_44100_128",
+) -> str:
+    return media_key("elevenlabs", model_id, text, {
+        "voice_id": voice_id,
+        "output_format": output_format,
+    })
+
+
+class MediaStore:
+    """Content-addressed media files with in-flight coalescing"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def filename(key: str, ext: str) -> str:
+        return f"{key}.{ext}"
+
+    def path_for(self, kind: str, key: str, ext: str) -> Path:
+        return self.root / kind / key[:2] / key[2:4] / self.filename(key, ext)
+
+    def resolve(self, kind: str, filename: str) -> Optional[Path]:
+        """
+        Path of a stored file by its public name, or None if the name
+        is not a store name or the file does not exist
+        """
+        match = _STORED_NAME_RE.match(filename)
+        if not match:
+            return None
+        path = self.path_for(kind, match.group(1), match.group(2))
+        return path if path.is_file() else None
+
+    def lookup(self, kind: str, key: str, ext: str) -> Optional[Path]:
+        """Stored file for key or None; counted in hit-rate metrics"""
+        path = self.path_for(kind, key, ext)
+        if path.is_file():
+            self.hits += 1
+            return path
+        self.misses += 1
+        return None
+
+    async def get_or_create(
+        self,
+        kind: str,
+        key: str,
+        ext: str,
+        produce: Callable[[Path], Awaitable[Any]],
+        owner_id: Optional[str] = None,
+        provider: Optional[str] = None,
+    ) -> Path:
+        """
+        Return the stored file for key, calling produce(path) only on a miss.
+
+        produce must write the file to the given path (atomically - e.g. via a
+        temporary file and os.replace), concurrent callers with the same key
+        wait for the first one. A produced file is recorded in the media
+        catalog with owner_id, provider and the generation latency.
+        """
+        path = self.path_for(kind, key, ext)
+        inflight_key = f"{kind}/{key}.{ext}"
+
+        while True:
+            if path.is_file():
+                self.hits += 1
+                return path
+
+            pending = self._inflight.get(inflight_key)
+            if pending is None:
+                break
+            try:
+                result = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Запрос-владелец отменен - генерируем сами
+                continue
+            self.coalesced += 1
+            return result
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = future
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            started = time.perf_counter()
+            await produce(path)
+            latency_ms = int((time.perf_counter() - started) * 1000)
+            if not path.is_file():
+                raise RuntimeError(f"Media producer did not create {path}")
+            await self._record(kind, path, owner_id, provider, latency_ms)
+            future.set_result(path)
+            return path
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Исключение получат ожидающие; для самого future помечаем его прочитанным
+                future.exception()
+            raise
+        finally:
+            self._inflight.pop(inflight_key, None)
+
+    async def catalog_entry(self, kind: str, filename: str) -> Optional[Dict[str, Any]]:
+        """
+        Media catalog row for a public file name, marking the access time.
+        Store files that are not in the catalog yet (streamed audio, files
+        from before the catalog) are recorded on first access; None for
+        unknown names.
+        """
+        media = await async_db.get_media(kind, filename)
+        if media is not None:
+            if is_touch_due(media):
+                # Время обращения - для вытеснения давно не используемых файлов (media_gc)
+                await async_db.touch_media(kind, filename)
+            return media
+
+        path = self.resolve(kind, filename)
+        if path is None:
+            return None
+        try:
+            return await async_db.record_media(kind, path)
+        except Exception as e:
+            logger.warning(f"Failed to record {filename} in media catalog: {str(e)}")
+            return {
+                "kind": kind,
+                "filename": filename,
+                "path": str(path),
+                "mime_type": MIME_TYPES.get(path.suffix.lstrip("."), "application/octet-stream"),
+                "checksum": None,
+            }
+
+    async def _record(
+        self,
+        kind: str,
+        path: Path,
+        owner_id: Optional[str],
+        provider: Optional[str],
+        latency_ms: Optional[int],
+    ) -> None:
+        # Файл уже создан - ошибка каталога не должна ломать генерацию
+        try:
+            await async_db.record_media(kind, path, owner_id=owner_id, provider=provider, latency_ms=latency_ms)
+        except Exception as e:
+            logger.warning(f"Failed to record {path.name} in media catalog: {str(e)}")
+
+    def write_bytes(self, path: Path, data: bytes) -> None:
+        """Atomic write helper for producers that already hold the whole file"""
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.part")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "inflight": len(self._inflight),
+        }
+
+
+media_store = MediaStore(settings.MEDIA_STORE_DIR)
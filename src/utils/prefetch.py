@@ -0,0 +1,100 @@
+"""
+Prefetcher - спекулятивное выполнение запросов к LLM в фоне
+
+После /vibe/generate пользователь почти всегда открывает одну из первых карточек,
+а это /vibe/profession-info, /vibe/validate и /vibe/questions - по 10-40 секунд
+LLM каждый. Prefetcher заранее выполняет эти запросы для лучших карточек, а
+результат попадает в кэш ответов агентов (response_cache). Последующий запрос
+пользователя получает его из кэша сразу, а если предзагрузка еще идет -
+присоединяется к ней (response_cache объединяет одинаковые вычисления).
+
+Спекулятивная работа не должна вытеснять настоящие запросы, поэтому:
+- одновременно выполняется не больше PREFETCH_MAX_CONCURRENCY задач на весь процесс
+- очередь ограничена PREFETCH_MAX_PENDING, лишние задачи отбрасываются
+- задача с тем же ключом, уже стоящая в очереди или выполняющаяся, не дублируется
+
+Использование:
+    prefetcher.submit(f"questions:{user_id}:{title}", agent.generate_questions)
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Runs speculative background work under a global concurrency budget"""
+
+    def __init__(self, max_concurrency: int = 2, max_pending: int = 100, enabled: bool = True):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.enabled = enabled
+
+        self._budget = asyncio.Semaphore(max_concurrency)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._running = 0
+
+        self.submitted = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, key: str, compute: Callable[[], Awaitable[Any]]) -> bool:
+        """Schedule compute in the background; False if it was skipped"""
+        if not self.enabled:
+            return False
+        if key in self._tasks:
+            self.duplicates += 1
+            return False
+        if len(self._tasks) >= self.max_pending:
+            self.dropped += 1
+            return False
+
+        task = asyncio.create_task(self._run(key, compute))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        self.submitted += 1
+        return True
+
+    async def _run(self, key: str, compute: Callable[[], Awaitable[Any]]) -> None:
+        async with self._budget:
+            self._running += 1
+            try:
+                await compute()
+                self.completed += 1
+            except Exception as e:
+                # Ошибку увидит пользователь, если откроет карточку - тогда запрос повторится
+                self.failed += 1
+                logger.warning(f"Prefetch {key} failed: {str(e)}")
+            finally:
+                self._running -= 1
+
+    async def aclose(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "pending": len(self._tasks) - self._running,
+            "submitted": self.submitted,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+prefetcher = Prefetcher(
+    max_concurrency=settings.PREFETCH_MAX_CONCURRENCY,
+    max_pending=settings.PREFETCH_MAX_PENDING,
+    enabled=settings.PREFETCH_ENABLED,
+)
@@ -0,0 +1,27 @@
+import json
+from typing import Any, Awaitable, Callable, Dict
+
+# Заголовки для Server-Sent Events: отключаем кэширование и буферизацию в nginx
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+# (событие, данные) - колбэк, через который генерация отдает события по ходу работы
+EventCallback = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Форматирование одного SSE события
+
+    Args:
+        event: Название события (поле event)
+        data: Данные события, сериализуются в JSON
+
+    Returns:
+        str: Готовый к отправке блок события
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
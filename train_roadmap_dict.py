@@ -0,0 +1,102 @@
+"""
+Обучение словаря сжатия roadmap_data (см. src/database/roadmap_codec.py)
+
+Берет последние сохраненные roadmaps, строит по ним словарь zlib и сохраняет
+его в compression_dicts. Новые roadmaps сжимаются новым словарем после
+перезапуска сервера; старые строки перепаковываются при чтении, а с
+--recompress - сразу все.
+
+Использование:
+    python train_roadmap_dict.py
+    python train_roadmap_dict.py --samples 500 --recompress
+    python train_roadmap_dict.py --dry-run         # только оценить степень сжатия
+"""
+import argparse
+import logging
+import zlib
+
+from src.database import init_database, get_db_connection
+from src.database.roadmap_codec import roadmap_codec, train_dictionary, dumps, DICT_NAME
+
+logger = logging.getLogger("train_roadmap_dict")
+
+
+def load_samples(limit: int):
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            "SELECT roadmap_data FROM roadmaps ORDER BY updated_at DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [dumps(roadmap_codec.decode(conn, row["roadmap_data"])) for row in rows]
+
+
+def compressed_size(samples, zdict: bytes, level: int) -> int:
+    total = 0
+    for sample in samples:
+        compressor = zlib.compressobj(level, zdict=zdict) if zdict else zlib.compressobj(level)
+        total += len(compressor.compress(sample) + compressor.flush())
+    return total
+
+
+def recompress_all() -> int:
+    """Перепаковать все строки текущим словарем"""
+    roadmap_codec.reset()
+    count = 0
+    with get_db_connection() as conn:
+        ids = [row["id"] for row in conn.execute("SELECT id FROM roadmaps")]
+        for roadmap_id in ids:
+            row = conn.execute("SELECT roadmap_data FROM roadmaps WHERE id = ?", (roadmap_id,)).fetchone()
+            if row is None or not roadmap_codec.needs_migration(conn, row["roadmap_data"]):
+                continue
+            data = roadmap_codec.decode(conn, row["roadmap_data"])
+            conn.execute(
+                "UPDATE roadmaps SET roadmap_data = ? WHERE id = ? AND roadmap_data = ?",
+                (roadmap_codec.encode(conn, data), roadmap_id, row["roadmap_data"])
+            )
+            conn.commit()
+            count += 1
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train the roadmap compression dictionary")
+    parser.add_argument("--samples", type=int, default=300, help="Сколько последних roadmaps использовать")
+    parser.add_argument("--recompress", action="store_true", help="Сразу перепаковать все roadmaps")
+    parser.add_argument("--dry-run", action="store_true", help="Не сохранять словарь")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    init_database()
+
+    samples = load_samples(args.samples)
+    if len(samples) < 2:
+        logger.error("❌ Недостаточно roadmaps для обучения словаря")
+        return
+
+    zdict = train_dictionary(samples)
+    raw = sum(len(sample) for sample in samples)
+    plain = compressed_size(samples, b"", roadmap_codec.level)
+    trained = compressed_size(samples, zdict, roadmap_codec.level)
+    logger.info(
+        f"{len(samples)} samples, {raw} bytes: zlib {plain} ({raw / plain:.1f}x), "
+        f"zlib+dict {trained} ({raw / trained:.1f}x), dictionary {len(zdict)} bytes"
+    )
+
+    if args.dry_run:
+        return
+
+    with get_db_connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO compression_dicts (name, data, sample_count) VALUES (?, ?, ?)",
+            (DICT_NAME, zdict, len(samples))
+        )
+        conn.commit()
+        logger.info(f"✅ Saved dictionary {cursor.lastrowid}")
+
+    if args.recompress:
+        logger.info(f"✅ Recompressed {recompress_all()} roadmaps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Воркер очереди задач генерации (roadmap, окружения с медиа)
+
+Запускается отдельно от API, можно несколько процессов на одной БД:
+задачи распределяются через аренду (см. src/utils/job_worker.py).
+
+Использование:
+    python worker.py
+    python worker.py --concurrency 4
+    python worker.py --kinds roadmap
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from src.config import settings
+from src.database import init_database
+from src.database.pool import db_pool
+from src.database.async_db import shutdown as shutdown_db_executor
+from src.agent.core.llm_client import llm_registry
+from src.agent.core.response_cache import response_cache
+from src.utils.fusion_brain import close_http_client as close_fusion_brain_client
+from src.utils.fusion_brain_jobs import fusion_brain_jobs
+from src.utils.elevenlabs import close_http_client as close_elevenlabs_client
+from src.utils.job_worker import JobWorker
+from src.routes.job_handlers import JOB_HANDLERS
+
+logger = logging.getLogger("worker")
+
+
+async def run(args: argparse.Namespace) -> None:
+    handlers = JOB_HANDLERS
+    if args.kinds:
+        unknown = set(args.kinds) - set(JOB_HANDLERS)
+        if unknown:
+            raise SystemExit(f"Unknown job kinds: {', '.join(sorted(unknown))}")
+        handlers = {kind: JOB_HANDLERS[kind] for kind in args.kinds}
+
+    init_database()
+    await llm_registry.startup()
+    await fusion_brain_jobs.start()
+
+    worker = JobWorker(
+        handlers,
+        concurrency=args.concurrency,
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        poll_interval=settings.JOB_POLL_INTERVAL,
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await worker.start()
+    try:
+        await stop.wait()
+    finally:
+        logger.info("🛑 Stopping worker...")
+        await worker.stop()
+        logger.info(f"✅ Worker stopped: {worker.stats()}")
+
+        await response_cache.aclose()
+        await fusion_brain_jobs.stop()
+        await close_fusion_brain_client()
+        await close_elevenlabs_client()
+        shutdown_db_executor()
+        db_pool.close()
+        await llm_registry.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run queued generation jobs")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--kinds", nargs="+", help=f"Типы задач (по умолчанию все: {', '.join(JOB_HANDLERS)})")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()